@@ -0,0 +1,799 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from compacto import RegistrosCompactos, SnapshotCompacto, gravar_compacto
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class SnapshotCorrompido(ValueError):
+    """O snapshot não pôde ser lido. Nada é carregado, para que a próxima compactação não grave por cima dele."""
+
+    def __init__(self, arquivo, erro):
+        super().__init__(f"O arquivo de dados {arquivo} está corrompido ({erro}); restaure uma cópia antes de continuar")
+
+
+class TravaArquivo:
+    """Trava exclusiva entre processos sobre um arquivo .lock (flock no Unix, msvcrt no Windows).
+
+    Há uma por arquivo em cada processo (do_arquivo); a mesma thread pode entrar
+    de novo, e as outras threads do processo esperam como os outros processos.
+    """
+
+    travas = {}
+    criacao = threading.Lock()
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.rlock = threading.RLock()
+        self.niveis = 0
+        self.arquivo = None
+        self.espera = 0.0  # Segundos esperando por outros processos (para o benchmark)
+
+    @classmethod
+    def do_arquivo(cls, caminho):
+        caminho = os.path.abspath(caminho)
+        with cls.criacao:
+            if caminho not in cls.travas:
+                cls.travas[caminho] = cls(caminho)
+            return cls.travas[caminho]
+
+    def __enter__(self):
+        self.rlock.acquire()
+        if self.niveis == 0:
+            try:
+                inicio = time.perf_counter()
+                self.arquivo = open(self.caminho, 'a+b')
+                if os.name == "nt":
+                    self.arquivo.seek(0)
+                    msvcrt.locking(self.arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                else:
+                    fcntl.flock(self.arquivo.fileno(), fcntl.LOCK_EX)
+                self.espera += time.perf_counter() - inicio
+            except BaseException:
+                if self.arquivo is not None:
+                    self.arquivo.close()
+                    self.arquivo = None
+                self.rlock.release()
+                raise
+        self.niveis += 1
+        return self
+
+    def __exit__(self, *erro):
+        self.niveis -= 1
+        if self.niveis == 0:
+            if os.name == "nt":
+                self.arquivo.seek(0)
+                msvcrt.locking(self.arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.arquivo.fileno(), fcntl.LOCK_UN)
+            self.arquivo.close()
+            self.arquivo = None
+        self.rlock.release()
+
+
+class EscritaCoordenada:
+    """Gravação coordenada entre processos que usam os mesmos dados (base dos armazenamentos).
+
+    Cada gravação segura a trava só o tempo de aplicar o que os outros gravaram
+    (alcancar) e acrescentar a sua alteração. Posições e IDs calculados dentro da
+    transação valem na gravação, então ninguém sobrescreve o registro de outro:
+    inclusões de todos são mantidas e, no mesmo registro, vale a última alteração.
+    """
+
+    @contextmanager
+    def transacao(self):
+        """Trava os dados e, ao entrar, aplica o que outros processos gravaram. Pode ser aninhada."""
+        with self.trava:
+            self.transacoes += 1
+            try:
+                if self.transacoes == 1:
+                    self.alcancar()
+                yield self
+            finally:
+                self.transacoes -= 1
+
+    def alcancar(self):
+        """Aplica às coleções o que outros processos gravaram.
+
+        Catalogo e NucleoOrcamento trocam este método pelo seu, que mantém
+        também os índices e os totais.
+        """
+        entradas = self.novas_entradas()
+        if entradas is None:
+            self.adotar(self.recarregado())
+        else:
+            for entrada in entradas:
+                aplicar_entrada(self.dados, entrada)
+
+
+class ArmazenamentoJournal(EscritaCoordenada):
+    """Armazena os dados em um snapshot JSON mais um journal de mutações (append-only).
+
+    Cada alteração é gravada como uma linha no journal, então o custo de salvar
+    não depende do tamanho do catálogo. De tempos em tempos o journal é compactado
+    em um novo snapshot. O seq de cada entrada é a versão dos dados: o snapshot
+    guarda o da última entrada que inclui.
+    """
+
+    COLECOES = ("produtos", "clientes", "orcamento_produtos", "vendas")
+
+    def __init__(self, arquivo_dados, compactar_a_cada=1000):
+        self.arquivo_dados = arquivo_dados
+        self.arquivo_journal = arquivo_dados + ".journal"
+        self.compactar_a_cada = compactar_a_cada
+        self.dados = {colecao: [] for colecao in self.COLECOES}
+        self.seq = 0  # Número da última mutação aplicada
+        self.entradas_journal = 0  # Mutações pendentes de compactação
+        self.posicao_journal = 0  # Até onde o journal já foi lido (novas_entradas continua daí)
+        self.assinatura = None  # Snapshot lido; muda quando outro processo compacta
+        self.gravacoes = 0  # Mutações feitas por este objeto
+        self.trava = TravaArquivo.do_arquivo(arquivo_dados + ".lock")
+        self.transacoes = 0
+
+    def carregar(self, reparar=True):
+        """Carrega o snapshot e reaplica as mutações do journal.
+
+        A leitura não trava os arquivos; só se outro processo compactar no meio
+        dela os dados são lidos de novo com a trava. Com reparar=False o journal
+        longo não é compactado, para ler sem gravar nada.
+        """
+        if not self._ler():
+            with self.trava:
+                self._ler()
+        if reparar and self.entradas_journal >= self.compactar_a_cada:
+            self.compactar()
+        return self.dados
+
+    def _ler(self):
+        """Lê o snapshot e o journal; False se eles não se encaixam (foram trocados durante a leitura)."""
+        self.dados = {colecao: [] for colecao in self.COLECOES}
+        self.seq = 0
+        self.entradas_journal = 0
+        self.posicao_journal = 0
+        self.assinatura = assinatura_arquivo(self.arquivo_dados)  # Antes de ler: uma troca durante a leitura é notada
+
+        if os.path.exists(self.arquivo_dados):
+            snapshot = self._ler_snapshot()
+            self.seq = snapshot.pop("seq", 0)
+            self.dados.update(snapshot)
+
+        if os.path.exists(self.arquivo_journal):
+            with open(self.arquivo_journal, 'rb') as journal:
+                for entrada, tamanho in ler_journal(journal):
+                    self.posicao_journal += tamanho
+                    if entrada["seq"] <= self.seq:
+                        continue  # Já incluída no snapshot
+                    if entrada["seq"] != self.seq + 1:
+                        return False  # Journal de outro snapshot
+                    self._aplicar(entrada)
+                    self.seq = entrada["seq"]
+                    self.entradas_journal += 1
+        return True
+
+    def _ler_snapshot(self):
+        try:
+            with open(self.arquivo_dados, 'r') as arquivo:
+                snapshot = json.load(arquivo)
+        except ValueError as e:  # JSON inválido ou texto que não é UTF-8
+            raise SnapshotCorrompido(self.arquivo_dados, e) from e
+        if not isinstance(snapshot, dict):
+            raise SnapshotCorrompido(self.arquivo_dados, "não é um objeto JSON")
+        return snapshot
+
+    def _gravar_snapshot(self, arquivo, snapshot):
+        with open(arquivo, 'w') as saida:
+            json.dump(snapshot, saida, indent=4)
+            saida.flush()
+            os.fsync(saida.fileno())
+
+    def _ler_colecao(self, colecao):
+        """Gera ("seq", n) e ("registro", item) do snapshot sem carregá-lo inteiro (ver iterar)."""
+        return ler_snapshot(self.arquivo_dados, colecao)
+
+    def arquivos_observados(self):
+        return [self.arquivo_dados, self.arquivo_journal]
+
+    def novas_entradas(self):
+        """Entradas que outro processo acrescentou ao journal desde a última leitura.
+
+        As entradas ainda não estão em self.dados: quem chama as aplica (com
+        aplicar_entrada ou Catalogo.aplicar_alteracao). Retorna None quando
+        outro processo compactou os dados com entradas que este objeto ainda não
+        tinha; aí é preciso recarregá-los.
+        """
+        with self.trava:  # Breve: só impede de ver o snapshot novo com o journal antigo
+            assinatura = assinatura_arquivo(self.arquivo_dados)
+            posicao = self.posicao_journal
+            entradas_journal = self.entradas_journal
+            trocado = assinatura != self.assinatura
+            if trocado:
+                # Outro processo compactou; se o snapshot novo não passa do que já temos, basta o journal novo
+                seq_snapshot = ler_seq_snapshot(self.arquivo_dados)
+                if seq_snapshot is None or seq_snapshot > self.seq:
+                    return None
+                posicao = 0
+                entradas_journal = 0
+            try:
+                tamanho_journal = os.path.getsize(self.arquivo_journal)
+            except OSError:
+                tamanho_journal = 0
+            if tamanho_journal < posicao:
+                return None
+
+            entradas = []
+            seq = self.seq
+            if tamanho_journal > posicao:
+                with open(self.arquivo_journal, 'rb') as journal:
+                    journal.seek(posicao)
+                    for entrada, tamanho in ler_journal(journal):
+                        posicao += tamanho
+                        if entrada["seq"] <= seq:
+                            entradas_journal += trocado  # Já aplicada; no journal novo ainda conta para compactar
+                            continue
+                        if entrada["seq"] != seq + 1:
+                            return None  # Faltam entradas: o journal foi trocado
+                        entradas.append(entrada)
+                        seq = entrada["seq"]
+            self.assinatura = assinatura
+            self.posicao_journal = posicao
+            self.seq = seq
+            self.entradas_journal = entradas_journal + len(entradas)
+            return entradas
+
+    def recarregado(self):
+        """Outro objeto com os dados atuais do disco, lidos sem gravar nada (pode rodar em outra thread)."""
+        armazenamento = type(self)(self.arquivo_dados, self.compactar_a_cada)
+        armazenamento.carregar(reparar=False)
+        return armazenamento
+
+    def adotar(self, recarregado):
+        """Passa a usar os dados de recarregado(), mantendo o orçamento em andamento deste objeto."""
+        recarregado.dados["orcamento_produtos"] = self.dados["orcamento_produtos"]
+        self.dados = recarregado.dados
+        self.seq = recarregado.seq
+        self.entradas_journal = recarregado.entradas_journal
+        self.posicao_journal = recarregado.posicao_journal
+        self.assinatura = recarregado.assinatura
+
+    def adicionar(self, colecao, registro):
+        """Adiciona um registro ao fim da coleção."""
+        self._registrar({"op": "adicionar", "colecao": colecao, "registro": registro})
+
+    def adicionar_varios(self, colecao, registros):
+        """Adiciona vários registros de uma vez, em uma única entrada do journal.
+
+        A entrada é gravada inteira ou descartada no carregamento, então todos
+        os registros são confirmados juntos.
+        """
+        self._registrar({"op": "adicionar_varios", "colecao": colecao, "registros": registros})
+
+    def remover(self, colecao, indice):
+        """Remove o registro na posição indicada."""
+        self._registrar({"op": "remover", "colecao": colecao, "indice": indice})
+
+    def atualizar(self, colecao, indice, registro):
+        """Substitui o registro na posição indicada."""
+        self._registrar({"op": "atualizar", "colecao": colecao, "indice": indice, "registro": registro})
+
+    def atualizar_varios(self, colecao, alteracoes):
+        """Substitui vários registros, dados como [(indice, registro), ...], em uma única entrada do journal."""
+        self._registrar({"op": "atualizar_varios", "colecao": colecao,
+                         "alteracoes": [[indice, registro] for indice, registro in alteracoes]})
+
+    def limpar(self, colecao):
+        """Remove todos os registros da coleção."""
+        self._registrar({"op": "limpar", "colecao": colecao})
+
+    def compactar(self):
+        """Grava um novo snapshot com todos os dados e esvazia o journal.
+
+        O snapshot é escrito sem a trava, que só é segurada para trocar os
+        arquivos; o que outros processos gravarem nesse meio tempo fica no journal.
+        """
+        with self.transacao():
+            seq = self.seq
+            assinatura = self.assinatura
+            snapshot = {"seq": seq, **self.dados}  # seq primeiro: ler_seq_snapshot só lê o começo
+        temporario = f"{self.arquivo_dados}.{os.getpid()}.tmp"
+        self._gravar_snapshot(temporario, snapshot)
+
+        with self.trava:
+            if assinatura_arquivo(self.arquivo_dados) != assinatura:
+                os.remove(temporario)  # Outro processo compactou enquanto este snapshot era escrito
+                return
+            restantes = []
+            if os.path.exists(self.arquivo_journal):
+                with open(self.arquivo_journal, 'rb') as journal:
+                    restantes = [entrada for entrada, _ in ler_journal(journal) if entrada["seq"] > seq]
+            os.replace(temporario, self.arquivo_dados)
+            self.assinatura = assinatura_arquivo(self.arquivo_dados)
+
+            # Se cair aqui, as entradas antigas do journal são ignoradas pelo seq do snapshot
+            temporario = f"{self.arquivo_journal}.{os.getpid()}.tmp"
+            with open(temporario, 'w') as journal:
+                journal.writelines(json.dumps(entrada) + "\n" for entrada in restantes)
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(temporario, self.arquivo_journal)
+            self.entradas_journal = len(restantes)
+            self.posicao_journal = 0  # As restantes são de outros processos: novas_entradas as lê
+
+    def _registrar(self, entrada):
+        """Aplica a mutação em memória e a grava no journal, depois das que outros processos gravaram."""
+        with self.transacao():
+            self._aplicar(entrada)
+            self.seq += 1
+            self.gravacoes += 1
+            entrada["seq"] = self.seq
+            linha = (json.dumps(entrada) + "\n").encode("utf-8")
+            with open(self.arquivo_journal, 'ab') as journal:
+                if journal.tell() > self.posicao_journal:
+                    journal.truncate(self.posicao_journal)  # Linha incompleta de uma gravação interrompida
+                journal.write(linha)
+                journal.flush()
+                os.fsync(journal.fileno())
+            self.posicao_journal += len(linha)
+            self.entradas_journal += 1
+
+        if self.entradas_journal >= self.compactar_a_cada:
+            self.compactar()
+            self.compactado()
+
+    def compactado(self):
+        """Chamado depois de cada compactação automática; NucleoOrcamento o troca para salvar os totais."""
+
+    def _aplicar(self, entrada):
+        aplicar_entrada(self.dados, entrada)
+
+    def iterar(self, colecao):
+        """Gera os registros da coleção lendo o disco aos poucos, sem carregar o snapshot inteiro.
+
+        As entradas do journal (limitadas pela compactação) são lidas antes. Se
+        alguma delas remover ou alterar registros da coleção, a coleção é montada
+        em memória para aplicá-las; inclusões são só emitidas depois do snapshot.
+        """
+        entradas = []
+        if os.path.exists(self.arquivo_journal):
+            with open(self.arquivo_journal, 'rb') as journal:
+                entradas = [entrada for entrada, _ in ler_journal(journal) if entrada["colecao"] == colecao]
+
+        seq = 0
+        so_inclusoes = all(entrada["op"] in ("adicionar", "adicionar_varios") for entrada in entradas)
+        registros = []
+        if os.path.exists(self.arquivo_dados):
+            for tipo, valor in self._ler_colecao(colecao):
+                if tipo == "seq":
+                    seq = valor
+                elif so_inclusoes:
+                    yield valor
+                else:
+                    registros.append(valor)
+
+        dados = {colecao: registros}
+        for entrada in entradas:
+            if entrada["seq"] > seq:
+                aplicar_entrada(dados, entrada)
+        yield from registros
+
+    def iterar_vendas(self, inicio=None, fim=None, cliente=None):
+        """Gera as vendas com inicio <= data < fim (texto ISO) e do cliente informado, direto do disco."""
+        for venda in self.iterar("vendas"):
+            if filtrar_venda(venda, inicio, fim, cliente):
+                yield venda
+
+
+def ler_journal(journal):
+    """Gera (entrada, tamanho em bytes) das linhas completas do journal aberto em modo binário."""
+    for linha in journal:
+        if not linha.endswith(b"\n"):
+            break  # Última linha incompleta (queda durante a gravação)
+        try:
+            entrada = json.loads(linha)
+        except ValueError:
+            break
+        yield entrada, len(linha)
+
+
+def ler_seq_snapshot(arquivo_dados):
+    """seq do snapshot lido só do começo do arquivo; None se não está lá (snapshot antigo ou ausente)."""
+    try:
+        with open(arquivo_dados, 'rb') as arquivo:
+            inicio = arquivo.read(64)
+    except OSError:
+        return None
+    encontrado = re.match(rb'\{\s*"seq":\s*(\d+)', inicio)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def assinatura_arquivo(arquivo):
+    """Muda quando o arquivo é trocado ou regravado; None se ele não existe."""
+    try:
+        estado = os.stat(arquivo)
+    except OSError:
+        return None
+    return estado.st_ino, estado.st_size, estado.st_mtime_ns
+
+
+def aplicar_entrada(dados, entrada):
+    """Aplica uma entrada do journal às coleções em dados."""
+    colecao = dados.setdefault(entrada["colecao"], [])
+    if entrada["op"] == "adicionar":
+        colecao.append(entrada["registro"])
+    elif entrada["op"] == "adicionar_varios":
+        colecao.extend(entrada["registros"])
+    elif entrada["op"] == "remover":
+        del colecao[entrada["indice"]]
+    elif entrada["op"] == "atualizar":
+        colecao[entrada["indice"]] = entrada["registro"]
+    elif entrada["op"] == "atualizar_varios":
+        for indice, registro in entrada["alteracoes"]:
+            colecao[indice] = registro
+    elif entrada["op"] == "limpar":
+        colecao.clear()
+
+
+def filtrar_venda(venda, inicio=None, fim=None, cliente=None):
+    """Vendas gravadas sem data ficam de fora quando há filtro de período."""
+    data = venda.get("data")
+    if (inicio is not None or fim is not None) and data is None:
+        return False
+    if inicio is not None and data < inicio:
+        return False
+    if fim is not None and data >= fim:
+        return False
+    return cliente is None or venda.get("cliente") == cliente
+
+
+def ler_snapshot(arquivo_dados, colecao, tamanho_bloco=1 << 16):
+    """Lê o snapshot JSON em blocos e gera ("registro", item) para cada item da coleção e ("seq", n).
+
+    Os itens das outras coleções são decodificados um a um e descartados, então
+    a memória usada não depende do tamanho do arquivo.
+    """
+    decodificador = json.JSONDecoder()
+    with open(arquivo_dados, 'r') as arquivo:
+        texto = ""
+        posicao = 0
+        fim_arquivo = False
+
+        def proximo():
+            # Avança até o próximo caractere que não é espaço, lendo mais se preciso
+            nonlocal texto, posicao, fim_arquivo
+            while True:
+                while posicao < len(texto) and texto[posicao].isspace():
+                    posicao += 1
+                if posicao < len(texto) or fim_arquivo:
+                    return texto[posicao:posicao + 1]
+                texto, posicao = "", 0
+                bloco = arquivo.read(tamanho_bloco)
+                fim_arquivo = not bloco
+                texto += bloco
+
+        def decodificar():
+            # Um valor JSON completo; um número no fim do bloco pode estar cortado
+            nonlocal texto, posicao, fim_arquivo
+            while True:
+                proximo()
+                try:
+                    valor, final = decodificador.raw_decode(texto, posicao)
+                    if final < len(texto) or fim_arquivo:
+                        posicao = final
+                        return valor
+                except json.JSONDecodeError:
+                    if fim_arquivo:
+                        raise
+                texto = texto[posicao:]
+                posicao = 0
+                bloco = arquivo.read(tamanho_bloco)
+                fim_arquivo = not bloco
+                texto += bloco
+
+        if proximo() != "{":
+            return
+        posicao += 1
+        while True:
+            caractere = proximo()
+            if caractere in ("}", ""):
+                return
+            if caractere == ",":
+                posicao += 1
+                continue
+            chave = decodificar()
+            proximo()
+            posicao += 1  # ":"
+            if proximo() != "[":
+                valor = decodificar()
+                if chave == "seq":
+                    yield "seq", valor
+                continue
+
+            posicao += 1
+            while True:
+                caractere = proximo()
+                if caractere == "]":
+                    posicao += 1
+                    break
+                if caractere == ",":
+                    posicao += 1
+                    continue
+                item = decodificar()
+                if chave == colecao:
+                    yield "registro", item
+
+
+class ArmazenamentoCompacto(ArmazenamentoJournal):
+    """ArmazenamentoJournal com o snapshot no formato compacto (compacto.py) em vez de JSON.
+
+    O snapshot é mapeado na memória. Produtos, clientes e orçamento são
+    decodificados na carga, porque o catálogo indexa cada registro; as vendas
+    ficam em RegistrosCompactos e só viram dicts quando alguém as lê.
+    """
+
+    PREGUICOSAS = ("vendas",)
+
+    def _ler_snapshot(self):
+        try:
+            snapshot = SnapshotCompacto(self.arquivo_dados)
+        except ValueError as e:
+            raise SnapshotCorrompido(self.arquivo_dados, e) from e
+        dados = {"seq": snapshot.seq}
+        for colecao in snapshot.colecoes():
+            registros = RegistrosCompactos(snapshot, colecao)
+            dados[colecao] = registros if colecao in self.PREGUICOSAS else registros.decodificar(0, len(registros))
+        return dados
+
+    def _gravar_snapshot(self, arquivo, snapshot):
+        gravar_compacto(arquivo, snapshot)
+
+    def _ler_colecao(self, colecao):
+        snapshot = SnapshotCompacto(self.arquivo_dados)
+        yield "seq", snapshot.seq
+        for registro in RegistrosCompactos(snapshot, colecao):
+            yield "registro", registro
+
+
+class ArmazenamentoSQLite(EscritaCoordenada):
+    """Armazena os dados em um banco SQLite, com índices nas chaves de busca.
+
+    Mantém a mesma interface do ArmazenamentoJournal: as coleções continuam
+    como listas em memória e cada mutação vira um INSERT/UPDATE/DELETE. O banco
+    já serializa as gravações; a trava das transações mantém as listas em
+    memória de cada processo na mesma ordem das linhas.
+    """
+
+    COLECOES = ArmazenamentoJournal.COLECOES
+
+    # Colunas extraídas de cada registro para permitir busca indexada
+    COLUNAS = {
+        "produtos": ("descricao", "largura", "espessura", "madeira"),
+        "clientes": ("nome", "cpf_cnpj"),
+        "orcamento_produtos": (),
+        "vendas": ("data", "cliente"),
+    }
+
+    INDICES = (
+        "CREATE INDEX IF NOT EXISTS idx_produtos_chave ON produtos (descricao, largura, espessura, madeira)",
+        "CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes (nome)",
+        "CREATE INDEX IF NOT EXISTS idx_clientes_cpf_cnpj ON clientes (cpf_cnpj)",
+        "CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (data)",
+        "CREATE INDEX IF NOT EXISTS idx_vendas_cliente ON vendas (cliente)",
+    )
+
+    def __init__(self, arquivo_banco, somente_leitura=False):
+        import sqlite3  # Só carregado quando o backend SQLite é escolhido
+
+        self.arquivo_banco = arquivo_banco
+        if somente_leitura:
+            # Sem criar tabelas nem trocar o modo do journal: o banco é da aplicação
+            self.conexao = sqlite3.connect(Path(arquivo_banco).resolve().as_uri() + "?mode=ro", uri=True)
+        else:
+            self.conexao = sqlite3.connect(arquivo_banco)
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            self.criar_tabelas()
+        self.dados = {colecao: [] for colecao in self.COLECOES}
+        self.ids = {colecao: [] for colecao in self.COLECOES}  # rowid de cada registro em memória
+        self.versao_dados = None  # PRAGMA data_version: muda quando outra conexão grava
+        self.versao_pendente = None  # Versão que pediu o recarregamento
+        self.gravacoes = 0
+        self.trava = TravaArquivo.do_arquivo(arquivo_banco + ".lock")
+        self.transacoes = 0
+
+    def criar_tabelas(self):
+        with self.conexao:
+            for colecao, colunas in self.COLUNAS.items():
+                definicao = "".join(f", {coluna}" for coluna in colunas)
+                self.conexao.execute(f"CREATE TABLE IF NOT EXISTS {colecao} (id INTEGER PRIMARY KEY{definicao}, dados TEXT NOT NULL)")
+            for indice in self.INDICES:
+                self.conexao.execute(indice)
+
+    def carregar(self, reparar=True):
+        """Carrega todas as coleções do banco (não há journal a compactar: reparar existe só pela interface comum)."""
+        self.versao_dados = self._versao_dados()
+        for colecao in self.COLECOES:
+            linhas = self.conexao.execute(f"SELECT id, dados FROM {colecao} ORDER BY id").fetchall()
+            self.ids[colecao] = [linha[0] for linha in linhas]
+            self.dados[colecao] = [json.loads(linha[1]) for linha in linhas]
+        return self.dados
+
+    def arquivos_observados(self):
+        return [self.arquivo_banco, self.arquivo_banco + "-wal"]
+
+    def novas_entradas(self):
+        """Sem journal para repassar: [] se nenhuma outra conexão gravou, senão None (recarregar)."""
+        versao = self._versao_dados()
+        if versao == self.versao_dados:
+            return []
+        self.versao_pendente = versao  # adotar() passa a comparar com esta
+        return None
+
+    def recarregado(self):
+        """Outro objeto com os dados atuais do banco, em uma conexão própria (pode rodar em outra thread)."""
+        armazenamento = ArmazenamentoSQLite(self.arquivo_banco)
+        armazenamento.carregar()
+        armazenamento.conexao.close()
+        return armazenamento
+
+    def adotar(self, recarregado):
+        """Passa a usar os dados de recarregado(), mantendo o orçamento em andamento deste objeto."""
+        for colecao in self.COLECOES:
+            if colecao != "orcamento_produtos":
+                self.dados[colecao] = recarregado.dados[colecao]
+                self.ids[colecao] = recarregado.ids[colecao]
+        self.versao_dados = self.versao_pendente if self.versao_pendente is not None else self._versao_dados()
+
+    def adicionar(self, colecao, registro):
+        """Adiciona um registro ao fim da coleção."""
+        self.adicionar_varios(colecao, [registro])
+
+    def adicionar_varios(self, colecao, registros):
+        """Adiciona vários registros em uma única transação."""
+        with self.transacao(), self.conexao:
+            for registro in registros:
+                cursor = self.conexao.execute(self._sql_inserir(colecao), self._valores(colecao, registro))
+                self.ids[colecao].append(cursor.lastrowid)
+        self.dados[colecao].extend(registros)
+        self.gravacoes += 1
+
+    def remover(self, colecao, indice):
+        """Remove o registro na posição indicada."""
+        with self.transacao(), self.conexao:
+            self.conexao.execute(f"DELETE FROM {colecao} WHERE id = ?", (self.ids[colecao][indice],))
+        del self.ids[colecao][indice]
+        del self.dados[colecao][indice]
+        self.gravacoes += 1
+
+    def atualizar(self, colecao, indice, registro):
+        """Substitui o registro na posição indicada."""
+        atribuicoes = "".join(f"{coluna} = ?, " for coluna in self.COLUNAS[colecao])
+        with self.transacao(), self.conexao:
+            self.conexao.execute(f"UPDATE {colecao} SET {atribuicoes}dados = ? WHERE id = ?",
+                                 self._valores(colecao, registro) + (self.ids[colecao][indice],))
+        self.dados[colecao][indice] = registro
+        self.gravacoes += 1
+
+    def atualizar_varios(self, colecao, alteracoes):
+        """Substitui vários registros, dados como [(indice, registro), ...], em uma única transação."""
+        atribuicoes = "".join(f"{coluna} = ?, " for coluna in self.COLUNAS[colecao])
+        with self.transacao(), self.conexao:
+            self.conexao.executemany(f"UPDATE {colecao} SET {atribuicoes}dados = ? WHERE id = ?",
+                                     [self._valores(colecao, registro) + (self.ids[colecao][indice],)
+                                      for indice, registro in alteracoes])
+        for indice, registro in alteracoes:
+            self.dados[colecao][indice] = registro
+        self.gravacoes += 1
+
+    def limpar(self, colecao):
+        """Remove todos os registros da coleção."""
+        with self.transacao(), self.conexao:
+            self.conexao.execute(f"DELETE FROM {colecao}")
+        self.ids[colecao].clear()
+        self.dados[colecao].clear()
+        self.gravacoes += 1
+
+    def compactar(self):
+        """Nada a compactar: cada mutação já é gravada no banco."""
+        self.conexao.commit()
+
+    def buscar_produto(self, descricao, largura, espessura, madeira):
+        """Busca um produto pela chave (descrição, largura, espessura, madeira)."""
+        linha = self.conexao.execute(
+            "SELECT dados FROM produtos WHERE descricao = ? AND largura = ? AND espessura = ? AND madeira = ?",
+            (descricao, largura, espessura, madeira)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def buscar_cliente(self, nome=None, cpf_cnpj=None):
+        """Busca um cliente pelo nome ou pelo CPF/CNPJ."""
+        if nome is not None:
+            linha = self.conexao.execute("SELECT dados FROM clientes WHERE nome = ?", (nome,)).fetchone()
+        else:
+            linha = self.conexao.execute("SELECT dados FROM clientes WHERE cpf_cnpj = ?", (cpf_cnpj,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def vendas_por_periodo(self, inicio, fim):
+        """Retorna as vendas com inicio <= data < fim (datas em texto ISO)."""
+        return self.iterar_vendas(inicio, fim)
+
+    def iterar_vendas(self, inicio=None, fim=None, cliente=None):
+        """Gera as vendas com inicio <= data < fim (texto ISO) e do cliente informado, sem carregar as demais."""
+        condicoes = []
+        parametros = []
+        for condicao, valor in (("data >= ?", inicio), ("data < ?", fim), ("cliente = ?", cliente)):
+            if valor is not None:
+                condicoes.append(condicao)
+                parametros.append(valor)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        # Um cursor próprio: as linhas são lidas do banco à medida que são consumidas
+        cursor = self.conexao.cursor()
+        for linha in cursor.execute(f"SELECT dados FROM vendas{where} ORDER BY id", parametros):
+            yield json.loads(linha[0])
+
+    def _versao_dados(self):
+        return self.conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sql_inserir(self, colecao):
+        colunas = self.COLUNAS[colecao] + ("dados",)
+        return f"INSERT INTO {colecao} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})"
+
+    def _valores(self, colecao, registro):
+        return tuple(registro.get(coluna) for coluna in self.COLUNAS[colecao]) + (json.dumps(registro),)
+
+
+def migrar_json_para_sqlite(arquivo_dados, arquivo_banco):
+    """Copia o conteúdo de dados.json (snapshot + journal) para um banco SQLite novo."""
+    dados = ArmazenamentoJournal(arquivo_dados).carregar()
+    banco = ArmazenamentoSQLite(arquivo_banco)
+    for colecao in banco.COLECOES:
+        banco.limpar(colecao)
+        banco.adicionar_varios(colecao, dados.get(colecao, []))
+    return banco
+
+
+def migrar_json_para_compacto(arquivo_dados, arquivo_compacto):
+    """Grava o conteúdo de dados.json (snapshot + journal) como snapshot compacto."""
+    origem = ArmazenamentoJournal(arquivo_dados)
+    dados = origem.carregar(reparar=False)
+    gravar_compacto(arquivo_compacto, dict(dados, seq=origem.seq))
+    return ArmazenamentoCompacto(arquivo_compacto)
+
+
+def criar_armazenamento(arquivo_dados, somente_leitura=False):
+    """Escolhe o armazenamento pela variável de ambiente MADEIREIRA_ARMAZENAMENTO (json, compacto ou sqlite).
+
+    Com somente_leitura nada é migrado nem criado (para scripts como o
+    exportacao.py): se a aplicação ainda não migrou, os dados são lidos do JSON.
+    """
+    tipo = os.environ.get("MADEIREIRA_ARMAZENAMENTO", "json")
+    if tipo == "sqlite":
+        arquivo_banco = os.path.splitext(arquivo_dados)[0] + ".db"
+        if not os.path.exists(arquivo_banco):
+            if somente_leitura:
+                return ArmazenamentoJournal(arquivo_dados)
+            return migrar_json_para_sqlite(arquivo_dados, arquivo_banco)
+        return ArmazenamentoSQLite(arquivo_banco, somente_leitura)
+    if tipo == "compacto":
+        arquivo_compacto = os.path.splitext(arquivo_dados)[0] + ".snap"
+        if not os.path.exists(arquivo_compacto):
+            if somente_leitura:
+                return ArmazenamentoJournal(arquivo_dados)
+            return migrar_json_para_compacto(arquivo_dados, arquivo_compacto)
+        return ArmazenamentoCompacto(arquivo_compacto)
+    return ArmazenamentoJournal(arquivo_dados)
+
+
+if __name__ == "__main__":
+    # Uso: python armazenamento.py dados.json dados.db
+    if len(sys.argv) != 3:
+        print("Uso: python armazenamento.py <dados.json> <dados.db>")
+        sys.exit(1)
+    banco = migrar_json_para_sqlite(sys.argv[1], sys.argv[2])
+    print(", ".join(f"{colecao}: {len(banco.dados[colecao])}" for colecao in banco.COLECOES))
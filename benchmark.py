@@ -0,0 +1,424 @@
+"""Medições de desempenho do sistema, sem interface gráfica.
+
+Uso: python benchmark.py [nome ...]   (sem nomes, roda todos)
+
+Nomes: armazenamento, orcamento, ticket, precificacao, reprecificacao, relatorios, busca, servidor,
+sincronizacao, concorrencia, snapshot.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+
+def medir(funcao, repeticoes):
+    """Executa funcao() repetidas vezes e retorna o tempo médio em milissegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def memoria_mb():
+    """(memória residente, pico) deste processo em MB, lidos de /proc; None fora do Linux."""
+    try:
+        with open("/proc/self/status") as status:
+            valores = dict(linha.split(":", 1) for linha in status)
+    except OSError:
+        return None
+    return int(valores["VmRSS"].split()[0]) / 1024, int(valores["VmHWM"].split()[0]) / 1024
+
+
+def ticket_exemplo(quantidade_itens=10):
+    from ticket import criar_ticket
+
+    cliente = {"nome": "CLIENTE TESTE", "endereco": "RUA BAHIA, 204", "cidade": "XAMBRE",
+               "cpf_cnpj": "07776143910", "telefone": "44998205264"}
+    itens = [{"descricao": f"TABUA - 3.0 X 25.0 - ROXINHO {numero}", "tamanho": 3.0, "quantidade": 4,
+              "vl_m": 10.0, "total": 120.0} for numero in range(quantidade_itens)]
+    ticket = criar_ticket(cliente, itens, "EVERSON OLSEN", "DINHEIRO", "A VISTA")
+    return ticket._replace(data=datetime(2026, 1, 1))
+
+
+def vendas_exemplo(quantidade_vendas):
+    return [{"descricao": f"TABUA {numero % 200} - 5.0 X 10.0 - ROXINHO", "tamanho": 3.0, "quantidade": 4,
+             "vl_m": 10.0, "total": 120.0, "lucro": 20.0, "cliente": f"CLIENTE {numero % 500}",
+             "data": f"2026-{numero % 12 + 1:02d}-{numero % 28 + 1:02d}T10:00:00"}
+            for numero in range(quantidade_vendas)]
+
+
+def benchmark_armazenamento():
+    """Salvar e carregar 1 mil, 10 mil e 100 mil vendas, nos três armazenamentos."""
+    from armazenamento import ArmazenamentoCompacto, ArmazenamentoJournal, ArmazenamentoSQLite
+
+    for quantidade_vendas in (1_000, 10_000, 100_000):
+        vendas = vendas_exemplo(quantidade_vendas)
+        for nome, criar in (("json", lambda pasta: ArmazenamentoJournal(os.path.join(pasta, "dados.json"))),
+                            ("compacto", lambda pasta: ArmazenamentoCompacto(os.path.join(pasta, "dados.snap"))),
+                            ("sqlite", lambda pasta: ArmazenamentoSQLite(os.path.join(pasta, "dados.db")))):
+            with tempfile.TemporaryDirectory() as pasta:
+                armazenamento = criar(pasta)
+                armazenamento.carregar()
+                gravar = medir(lambda: armazenamento.adicionar_varios("vendas", vendas), 1)
+                salvar = medir(armazenamento.compactar, 1)
+                carregar = medir(lambda: criar(pasta).carregar(), 3)
+                venda = medir(lambda: armazenamento.adicionar("vendas", vendas[0]), 20)
+                print(f"armazenamento {nome:>8} {quantidade_vendas:>6} vendas: gravar {gravar:.1f} ms, "
+                      f"salvar {salvar:.1f} ms, carregar {carregar:.1f} ms, mais uma venda {venda:.2f} ms")
+
+
+def benchmark_orcamento():
+    """Montar um orçamento pelo núcleo: cálculo de cada linha e inclusão no orçamento."""
+    from catalogo import rotulo_produto
+    from nucleo import NucleoOrcamento
+
+    with tempfile.TemporaryDirectory() as pasta:
+        nucleo = NucleoOrcamento(os.path.join(pasta, "dados.json"))
+        nucleo.carregar()
+        produtos = [nucleo.catalogo.adicionar_produto({"descricao": f"TABUA {numero}", "madeira": "ROXINHO",
+                                                       "largura": 5.0, "espessura": 10.0, "custo_m3": 2000.0})
+                    for numero in range(1000)]
+        rotulos = [rotulo_produto(produto) for produto in produtos]
+
+        calcular = medir(lambda: [nucleo.item_orcamento(rotulo, "2,5", "3", "20") for rotulo in rotulos], 5)
+        itens = [nucleo.item_orcamento(rotulo, "2,5", "3", "20") for rotulo in rotulos[:100]]
+        incluir = medir(lambda: [nucleo.adicionar_item_orcamento(item) for item in itens], 1)
+        print(f"orçamento: cálculo {calcular / len(rotulos) * 1000:.1f} µs por linha, "
+              f"inclusão {incluir / len(itens) * 1000:.1f} µs por linha")
+
+
+def benchmark_ticket():
+    """Renderização do ticket: desenho completo x template com as partes fixas em cache."""
+    from ticket import renderizar_ticket
+
+    with tempfile.TemporaryDirectory() as pasta:
+        nome_pdf = os.path.join(pasta, "ticket.pdf")
+        for quantidade_itens in (1, 10, 25):
+            ticket = ticket_exemplo(quantidade_itens)
+            direto = medir(lambda: renderizar_ticket(ticket, nome_pdf, usar_template=False), 200)
+            template = medir(lambda: renderizar_ticket(ticket, nome_pdf), 200)
+            print(f"ticket {quantidade_itens:>3} itens: direto {direto:.2f} ms, template {template:.2f} ms "
+                  f"({(1 - template / direto) * 100:.0f}% menos)")
+
+
+def benchmark_precificacao():
+    """Reprecificação de 100 mil linhas em centavos: motor em colunas x laço linha a linha."""
+    import random
+
+    import precificacao
+
+    random.seed(1)
+    quantidade_linhas = 100_000
+    # Colunas já no formato do motor: custo por metro e venda em centavos, tamanho em mm
+    colunas = (
+        [random.randint(500, 10_000) for _ in range(quantidade_linhas)],  # custo por metro linear
+        [random.randint(1000, 6000) for _ in range(quantidade_linhas)],  # tamanho
+        [random.randint(1, 50) for _ in range(quantidade_linhas)],  # quantidade
+        [random.randint(500, 4000) for _ in range(quantidade_linhas)],  # venda por metro
+    )
+
+    laco = medir(lambda: [precificacao.calcular_linha(*linha) for linha in zip(*colunas)], 5)
+    print(f"precificação {quantidade_linhas} linhas: laço {laco:.1f} ms", end="")
+    np = precificacao.carregar_numpy()
+    if np is not None:
+        vetorizado = medir(lambda: precificacao.precificar_centavos(*colunas), 5)
+        arrays = [np.asarray(coluna, dtype=np.int64) for coluna in colunas]
+        so_calculo = medir(lambda: precificacao.precificar_centavos(*arrays), 5)
+        print(f", NumPy {vetorizado:.1f} ms ({so_calculo:.1f} ms com as colunas já em arrays)")
+    else:
+        print(" (NumPy não instalado)")
+
+
+def benchmark_reprecificacao():
+    """Reajuste de uma madeira com 10 mil produtos: prévia em lote e gravação única."""
+    from armazenamento import ArmazenamentoJournal
+    from catalogo import Catalogo, rotulo_produto
+
+    with tempfile.TemporaryDirectory() as pasta:
+        armazenamento = ArmazenamentoJournal(os.path.join(pasta, "dados.json"))
+        armazenamento.adicionar_varios("produtos", [
+            {"descricao": f"TABUA {numero}", "madeira": "ROXINHO", "largura": 5.0, "espessura": 10.0,
+             "custo_m3": 2000.0, "id": numero + 1} for numero in range(10_000)])
+        catalogo = Catalogo(armazenamento)
+        catalogo.carregar(armazenamento.carregar())
+        precos_venda = {rotulo_produto(produto): 20.0 for produto in catalogo.produtos}
+
+        inicio = time.perf_counter()
+        previa = catalogo.previa_reprecificacao("ROXINHO", percentual=8, precos_venda=precos_venda)
+        meio = time.perf_counter()
+        catalogo.atualizar_produtos([(produto, novo) for produto, novo, _, _ in previa])
+        fim = time.perf_counter()
+        print(f"reajuste {len(previa)} produtos: prévia {(meio - inicio) * 1000:.1f} ms, "
+              f"gravação {(fim - meio) * 1000:.1f} ms (1 entrada no journal)")
+
+
+def benchmark_relatorios():
+    """Resumo por cliente/madeira/dia: soma do histórico inteiro x totais salvos (só as vendas novas)."""
+    from relatorios import AgregadosVendas
+
+    produtos = {f"TABUA {numero} - 5.0 X 10.0 - MADEIRA {numero % 8}": {"largura": 5.0, "espessura": 10.0,
+                                                                          "madeira": f"MADEIRA {numero % 8}"}
+                for numero in range(200)}
+    rotulos = list(produtos)
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "dados.json.relatorios")
+        for quantidade_vendas in (10_000, 100_000):
+            vendas = [{"descricao": rotulos[numero % 200], "tamanho": 3.0, "quantidade": 4, "vl_m": 10.0,
+                       "total": 120.0, "lucro": 20.0, "cliente": f"CLIENTE {numero % 500}",
+                       "data": f"2026-{numero % 12 + 1:02d}-{numero % 28 + 1:02d}T10:00:00"}
+                      for numero in range(quantidade_vendas)]
+            completo = medir(lambda: AgregadosVendas(arquivo, produtos.get).carregar(vendas), 1)
+            agregados = AgregadosVendas(arquivo, produtos.get)
+            agregados.carregar(vendas)
+            agregados.salvar()
+            incremental = medir(lambda: AgregadosVendas(arquivo, produtos.get).carregar(vendas), 5)
+            print(f"relatórios {quantidade_vendas} vendas: somando tudo {completo:.1f} ms, "
+                  f"com totais salvos {incremental:.1f} ms")
+            os.remove(arquivo)
+
+
+def benchmark_busca():
+    """Busca dos comboboxes com 20 mil produtos: tempo por tecla digitada."""
+    import random
+
+    from busca import IndiceBusca
+
+    random.seed(1)
+    madeiras = ["ROXINHO", "CEDRO", "IPÊ", "CUMARU", "ANGELIM", "PINUS", "EUCALIPTO", "JATOBÁ"]
+    descricoes = ["TABUA", "CAIBRO", "VIGA", "RIPA", "SARRAFO", "PRANCHA", "PONTALETE", "BATENTE"]
+    indice = IndiceBusca()
+    for numero in range(20_000):
+        indice.adicionar(f"{random.choice(descricoes)} {numero} - {random.choice([2.5, 5.0, 10.0])} X "
+                         f"{random.choice([10.0, 15.0, 25.0])} - {random.choice(madeiras)}")
+
+    montagem = medir(lambda: indice.buscar("t"), 1)  # A primeira busca monta o índice
+    print(f"busca 20000 produtos: montagem do índice {montagem:.0f} ms")
+    for tipo, consulta in (("começo", "tabua 19"), ("palavra", "ipe"), ("meio de palavra", "ngeli"),
+                           ("erro de digitação", "roxnho")):
+        tempos = [medir(lambda: indice.buscar(consulta[:tamanho]), 20) for tamanho in range(1, len(consulta) + 1)]
+        print(f"  {tipo} ({consulta!r}): pior tecla {max(tempos):.3f} ms")
+
+
+def benchmark_servidor():
+    """Vários balcões no servidor.py: cada um grava 200 vendas e cadastra 20 produtos ao mesmo tempo."""
+    import socket
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor
+
+    from remoto import NucleoRemoto
+
+    with socket.socket() as livre:
+        livre.bind(("127.0.0.1", 0))
+        porta = livre.getsockname()[1]
+    with tempfile.TemporaryDirectory() as pasta:
+        servidor = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "servidor.py"),
+                                     "--endereco", "127.0.0.1", "--porta", str(porta),
+                                     "--dados", os.path.join(pasta, "dados.json")], stdout=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try:
+                    socket.create_connection(("127.0.0.1", porta)).close()
+                    break
+                except OSError:
+                    time.sleep(0.05)
+
+            def balcao(rodada, numero):
+                nucleo = NucleoRemoto(f"http://127.0.0.1:{porta}")
+                nucleo.carregar()
+                latencias = []
+                for venda in range(200):
+                    inicio = time.perf_counter()
+                    if venda % 10 == 0:
+                        nucleo.registrar_produto({"descricao": f"TABUA {rodada}-{numero}-{venda}", "madeira": "ROXINHO",
+                                                  "largura": 10.0, "espessura": 2.5, "custo_m3": 2500.0})
+                    nucleo.registrar_vendas(vendas_exemplo(1))
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                return latencias
+
+            for balcoes in (1, 4, 8):
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(balcoes) as executor:
+                    latencias = sorted(latencia for resultado in executor.map(balcao, [balcoes] * balcoes, range(balcoes))
+                                       for latencia in resultado)
+                segundos = time.perf_counter() - inicio
+                print(f"servidor {balcoes} balcão(ões): {len(latencias) / segundos:.0f} gravações/s, "
+                      f"p50 {latencias[len(latencias) // 2]:.1f} ms, p99 {latencias[int(len(latencias) * 0.99)]:.1f} ms")
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+def benchmark_sincronizacao():
+    """Duas instâncias no mesmo dados.json (20 mil produtos, 100 mil vendas): ver a alteração da outra."""
+    from nucleo import NucleoOrcamento
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "dados.json")
+        outra = NucleoOrcamento(arquivo)
+        outra.carregar()
+        outra.catalogo.adicionar_produtos([{"descricao": f"TABUA {numero}", "madeira": "ROXINHO", "largura": 5.0,
+                                            "espessura": 10.0, "custo_m3": 2000.0} for numero in range(20_000)])
+        outra.registrar_vendas(vendas_exemplo(100_000))
+        outra.salvar()
+        nucleo = NucleoOrcamento(arquivo)
+        nucleo.carregar()
+
+        numeros = iter(range(1_000_000))
+        gravar = lambda: outra.registrar_produto({"descricao": f"VIGA {next(numeros)}", "madeira": "CEDRO",
+                                                  "largura": 5.0, "espessura": 5.0, "custo_m3": 2500.0})
+        incremental = medir(lambda: (gravar(), nucleo.sincronizar()), 20) - medir(gravar, 20)
+        completo = medir(lambda: NucleoOrcamento(arquivo).carregar(), 1)
+        outra.salvar()
+        recarga = medir(lambda: nucleo.adotar(nucleo.armazenamento.recarregado(), nucleo.armazenamento.gravacoes), 1)
+        print(f"sincronização: journal novo {incremental:.2f} ms, recarga após compactação {recarga:.0f} ms "
+              f"(em segundo plano), carregar tudo de novo {completo:.0f} ms")
+
+
+def escritor_concorrente(arquivo, numero, operacoes):
+    """Um processo do benchmark de concorrência: cadastra produtos e clientes, reajusta produtos e grava vendas.
+
+    Retorna as latências (ms) e o tempo total esperando pela trava (s).
+    """
+    import random
+
+    from armazenamento import ArmazenamentoJournal
+    from nucleo import NucleoOrcamento
+
+    nucleo = NucleoOrcamento(arquivo, ArmazenamentoJournal(arquivo, compactar_a_cada=50))
+    nucleo.carregar()
+    sorteio = random.Random(numero)
+    latencias = []
+    for operacao in range(operacoes):
+        inicio = time.perf_counter()
+        if operacao % 4 == 0:
+            nucleo.registrar_produto({"descricao": f"TABUA {numero}-{operacao}", "madeira": "ROXINHO",
+                                      "largura": 5.0, "espessura": 10.0, "custo_m3": 2000.0})
+        elif operacao % 4 == 1:
+            nucleo.catalogo.adicionar_cliente({"nome": f"CLIENTE {numero}-{operacao}", "cpf_cnpj": f"{numero}-{operacao}",
+                                               "endereco": "", "cidade": "", "telefone": ""})
+        elif operacao % 4 == 2 and nucleo.catalogo.produtos:
+            # Reajusta um produto qualquer, em geral de outro processo
+            produto = sorteio.choice(nucleo.catalogo.produtos)
+            nucleo.catalogo.atualizar_produto(produto, dict(produto, custo_m3=produto["custo_m3"] + 1))
+        else:
+            nucleo.registrar_vendas([dict(venda, cliente=f"ESCRITOR {numero}") for venda in vendas_exemplo(2)])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias, nucleo.armazenamento.trava.espera
+
+
+def benchmark_concorrencia():
+    """Vários processos gravando no mesmo dados.json, com compactações no meio: nenhum registro pode se perder."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    from armazenamento import ArmazenamentoJournal
+
+    operacoes = 400
+    for processos in (2, 4, 8):
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "dados.json")
+            inicio = time.perf_counter()
+            with ProcessPoolExecutor(processos) as executor:
+                resultados = list(executor.map(escritor_concorrente, [arquivo] * processos, range(processos),
+                                               [operacoes] * processos))
+            segundos = time.perf_counter() - inicio
+
+            dados = ArmazenamentoJournal(arquivo).carregar()
+            descricoes = {produto["descricao"] for produto in dados["produtos"]}
+            ids = {produto["id"] for produto in dados["produtos"]}
+            esperados = {f"TABUA {numero}-{operacao}" for numero in range(processos) for operacao in range(0, operacoes, 4)}
+            vendas = sum(2 for operacao in range(operacoes) if operacao % 4 == 3) * processos
+            clientes = len(range(1, operacoes, 4)) * processos
+            problemas = []
+            if descricoes != esperados or len(dados["produtos"]) != len(esperados):
+                problemas.append(f"{len(dados['produtos'])} de {len(esperados)} produtos")
+            if len(ids) != len(dados["produtos"]):
+                problemas.append(f"{len(dados['produtos']) - len(ids)} IDs repetidos")
+            if len(dados["clientes"]) != clientes:
+                problemas.append(f"{len(dados['clientes'])} de {clientes} clientes")
+            if len(dados["vendas"]) != vendas:
+                problemas.append(f"{len(dados['vendas'])} de {vendas} vendas")
+
+            latencias = sorted(latencia for resultado, _ in resultados for latencia in resultado)
+            espera = max(espera for _, espera in resultados)
+            print(f"concorrência {processos} processos: {len(latencias) / segundos:.0f} gravações/s, "
+                  f"p50 {latencias[len(latencias) // 2]:.1f} ms, p99 {latencias[int(len(latencias) * 0.99)]:.1f} ms, "
+                  f"pior espera pela trava {espera * 1000 / operacoes:.2f} ms por gravação, "
+                  f"{'nada perdido' if not problemas else 'PERDA: ' + ', '.join(problemas)}")
+
+
+def carga_isolada(formato, arquivo):
+    """Abre o núcleo em um processo novo, para medir a memória só da carga.
+
+    Retorna (ms para abrir, (MB a mais de memória residente, MB a mais no pico)
+    ou None, ms para ler uma venda, ms para percorrer todas as vendas).
+    """
+    from armazenamento import ArmazenamentoCompacto, ArmazenamentoJournal
+    from nucleo import NucleoOrcamento
+
+    classe = {"json": ArmazenamentoJournal, "compacto": ArmazenamentoCompacto}[formato]
+    antes = memoria_mb()
+    inicio = time.perf_counter()
+    nucleo = NucleoOrcamento(arquivo, classe(arquivo))
+    nucleo.carregar()
+    carga = (time.perf_counter() - inicio) * 1000
+    depois = memoria_mb()
+    memoria = (depois[0] - antes[0], depois[1] - antes[0]) if antes is not None else None
+
+    vendas = nucleo.armazenamento.dados["vendas"]
+    uma = medir(lambda: vendas[len(vendas) // 2], 100)
+    todas = medir(lambda: sum(1 for _ in vendas), 1)
+    return carga, memoria, uma, todas
+
+
+def benchmark_snapshot():
+    """Abrir o sistema com 20 mil produtos, 2 mil clientes e 100 mil vendas: snapshot JSON x compacto."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from armazenamento import ArmazenamentoCompacto, ArmazenamentoJournal
+    from nucleo import NucleoOrcamento
+
+    produtos = [{"descricao": f"TABUA {numero}", "madeira": ("ROXINHO", "IPE", "CEDRO", "ANGELIM")[numero % 4],
+                 "largura": 5.0 + numero % 20, "espessura": 10.0, "custo_m3": 2000.0} for numero in range(20_000)]
+    clientes = [{"nome": f"CLIENTE {numero}", "cpf_cnpj": f"{numero:011d}", "endereco": "RUA BAHIA, 204",
+                 "cidade": "XAMBRE", "telefone": "44998205264"} for numero in range(2_000)]
+    vendas = vendas_exemplo(100_000)
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato, classe, nome in (("json", ArmazenamentoJournal, "dados.json"),
+                                      ("compacto", ArmazenamentoCompacto, "dados.snap")):
+            arquivo = os.path.join(pasta, nome)
+            nucleo = NucleoOrcamento(arquivo, classe(arquivo))
+            nucleo.carregar()
+            nucleo.catalogo.adicionar_produtos(produtos)
+            nucleo.catalogo.adicionar_clientes(clientes)
+            nucleo.registrar_vendas(vendas)
+            nucleo.salvar()
+
+            # Processo novo (spawn): o pico de memória não inclui os dados montados aqui
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                carga, memoria, uma, todas = executor.submit(carga_isolada, formato, arquivo).result()
+            memoria = f"+{memoria[0]:.0f} MB (pico +{memoria[1]:.0f} MB)" if memoria is not None else "n/d"
+            print(f"snapshot {formato:>8}: arquivo {os.path.getsize(arquivo) / (1 << 20):.1f} MB, abrir {carga:.0f} ms, "
+                  f"memória {memoria}, ler uma venda {uma * 1000:.1f} µs, percorrer as vendas {todas:.0f} ms")
+
+
+BENCHMARKS = {
+    "armazenamento": benchmark_armazenamento,
+    "orcamento": benchmark_orcamento,
+    "ticket": benchmark_ticket,
+    "precificacao": benchmark_precificacao,
+    "reprecificacao": benchmark_reprecificacao,
+    "relatorios": benchmark_relatorios,
+    "busca": benchmark_busca,
+    "servidor": benchmark_servidor,
+    "sincronizacao": benchmark_sincronizacao,
+    "concorrencia": benchmark_concorrencia,
+    "snapshot": benchmark_snapshot,
+}
+
+
+if __name__ == "__main__":
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        BENCHMARKS[nome]()
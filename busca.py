@@ -0,0 +1,130 @@
+"""Busca por trecho de texto, sem diferenciar acentos nem maiúsculas ("xambre" encontra "XAMBRÊ")."""
+import heapq
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+def normalizar(texto):
+    """Remove acentos, passa para minúsculas e junta espaços repetidos."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return " ".join("".join(c for c in decomposto if not unicodedata.combining(c)).casefold().split())
+
+
+def trigramas(texto):
+    return {texto[posicao:posicao + 3] for posicao in range(len(texto) - 2)}
+
+
+def inicios_de_palavra(normalizado):
+    """O texto a partir de cada palavra: "tabua - ipe" -> "tabua - ipe", "- ipe", "ipe"."""
+    return [normalizado[posicao:] for posicao in range(len(normalizado))
+            if posicao == 0 or normalizado[posicao - 1] == " "]
+
+
+class IndiceBusca:
+    """Índice para a busca dos comboboxes, atualizado a cada inclusão e remoção.
+
+    A busca devolve primeiro os textos que começam com a consulta, depois os que
+    têm uma palavra começando com ela; os dois casos são faixas contíguas de uma
+    lista ordenada, então o custo não depende de quantos textos combinam. Trechos
+    no meio de palavras e erros de digitação usam um índice de trigramas e só são
+    procurados quando faltam resultados. Os índices são montados por montar() ou
+    na primeira busca, para que carregar o catálogo não pague por eles.
+    """
+
+    def __init__(self):
+        self.textos = {}  # texto original -> texto normalizado
+        self.ordenados = None  # [(texto normalizado, texto original)], ordenada
+        self.inicios = None  # [(texto normalizado a partir de cada palavra, texto original)], ordenada
+        self.por_trigrama = None
+
+    def adicionar(self, texto):
+        normalizado = normalizar(texto)
+        self.textos[texto] = normalizado
+        if self.inicios is not None:
+            self._indexar(texto, normalizado)
+            # As listas já estão ordenadas: cada entrada entra na sua posição
+            insort(self.ordenados, (normalizado, texto))
+            for entrada in self._entradas(texto, normalizado):
+                insort(self.inicios, entrada)
+
+    def remover(self, texto):
+        normalizado = self.textos.pop(texto, None)
+        if normalizado is None or self.inicios is None:
+            return
+        for trigrama in trigramas(normalizado):
+            self.por_trigrama[trigrama].discard(texto)
+        del self.ordenados[bisect_left(self.ordenados, (normalizado, texto))]
+        for entrada in self._entradas(texto, normalizado):
+            del self.inicios[bisect_left(self.inicios, entrada)]
+
+    def buscar(self, consulta, limite=20):
+        """Até limite textos que contêm a consulta.
+
+        Ordem: começo do texto, começo de palavra, meio de palavra e, para completar
+        o limite, os textos com mais trigramas em comum (erros de digitação).
+        """
+        consulta = normalizar(consulta)
+        if not consulta:
+            return []
+        if self.inicios is None:
+            self.montar()
+
+        encontrados = []
+        vistos = set()
+        # Começo do texto, depois começo de palavra: faixas das listas ordenadas
+        for lista in (self.ordenados, self.inicios):
+            posicao = bisect_left(lista, (consulta,))
+            while len(encontrados) < limite and posicao < len(lista) and lista[posicao][0].startswith(consulta):
+                texto = lista[posicao][1]
+                if texto not in vistos:
+                    vistos.add(texto)
+                    encontrados.append(texto)
+                posicao += 1
+
+        # Meio de palavra e erros de digitação: param assim que o limite é preenchido
+        consulta_trigramas = trigramas(consulta)
+        if len(encontrados) < limite and consulta_trigramas:
+            menor, *outras = sorted((self.por_trigrama.get(trigrama, set()) for trigrama in consulta_trigramas), key=len)
+            meio = (texto for texto in menor if texto not in vistos and all(texto in postagem for postagem in outras)
+                    and consulta in self.textos[texto])
+            novos = sorted(islice(meio, limite - len(encontrados)), key=self.textos.get)
+            vistos.update(novos)
+            encontrados += novos
+
+        if len(encontrados) < limite and len(consulta_trigramas) > 1:
+            # Quem tem metade dos trigramas tem algum dos mais raros: só esses são contados
+            minimo = (len(consulta_trigramas) + 1) // 2
+            raros = sorted(consulta_trigramas, key=lambda trigrama: len(self.por_trigrama.get(trigrama, ())))
+            candidatos = (texto for trigrama in raros[:len(raros) - minimo + 1]
+                          for texto in self.por_trigrama.get(trigrama, ()))
+            parecidos = {}
+            for texto in candidatos:
+                if texto in vistos or texto in parecidos:
+                    continue
+                quantidade = sum(trigrama in self.textos[texto] for trigrama in consulta_trigramas)
+                if quantidade >= minimo:
+                    parecidos[texto] = quantidade
+                    if len(parecidos) >= 4 * limite:
+                        break  # Folga suficiente para escolher os mais parecidos
+            melhores = heapq.nsmallest(limite - len(encontrados), parecidos,
+                                       key=lambda texto: (-parecidos[texto], self.textos[texto]))
+            encontrados += melhores
+        return encontrados
+
+    def montar(self):
+        """Monta os índices agora (senão, na primeira busca)."""
+        self.por_trigrama = {}
+        self.ordenados = sorted((normalizado, texto) for texto, normalizado in self.textos.items())
+        self.inicios = []
+        for texto, normalizado in self.textos.items():
+            self._indexar(texto, normalizado)
+            self.inicios.extend(self._entradas(texto, normalizado))
+        self.inicios.sort()
+
+    def _indexar(self, texto, normalizado):
+        for trigrama in trigramas(normalizado):
+            self.por_trigrama.setdefault(trigrama, set()).add(texto)
+
+    def _entradas(self, texto, normalizado):
+        return [(sufixo, texto) for sufixo in inicios_de_palavra(normalizado)]
@@ -0,0 +1,412 @@
+from decimal import Decimal
+
+from armazenamento import aplicar_entrada
+from busca import IndiceBusca
+from precificacao import centavos, custo_metro_produto, custo_por_metro, precificar_centavos, reais
+
+
+def rotulo_produto(produto):
+    """Texto exibido nas listas e comboboxes: "Descrição - Largura X Espessura - Tipo da Madeira"."""
+    return f"{produto['descricao']} - {produto['largura']} X {produto['espessura']} - {produto['madeira']}"
+
+
+def chave_produto(produto):
+    return (produto["descricao"], produto["largura"], produto["espessura"], produto["madeira"])
+
+
+def produto_completo(produto):
+    """Produtos antigos do dados.json não têm largura, espessura e madeira."""
+    return all(campo in produto for campo in ("descricao", "largura", "espessura", "madeira"))
+
+
+def com_custo_metro(produto):
+    """Guarda no produto o custo por metro linear (centavos), calculado uma vez no cadastro."""
+    if "custo_m3" in produto and produto_completo(produto):
+        return dict(produto, custo_metro=custo_por_metro(produto["largura"], produto["espessura"], produto["custo_m3"]))
+    return produto
+
+
+def reprecificado(produto, percentual=None, custo_m3=None):
+    """Cópia do produto com o custo por m³ reajustado em percentual ou substituído por custo_m3."""
+    if custo_m3 is None:
+        fator = (100 + Decimal(str(percentual))) / 100
+        custo_m3 = reais(centavos(Decimal(str(produto["custo_m3"])) * fator))
+    return com_custo_metro(dict(produto, custo_m3=custo_m3))
+
+
+class Catalogo:
+    """Produtos e clientes com índices em dicionário, mantidos a cada alteração.
+
+    As listas continuam sendo as do armazenamento; os índices só evitam
+    percorrê-las (ou reinterpretar o texto da combobox) a cada busca. Cada
+    gravação é feita em uma transação do armazenamento, que antes traz para as
+    listas e os índices o que outros processos gravaram (alcancar).
+    """
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self.produtos = []
+        self.clientes = []
+        self.produtos_por_id = {}
+        self.produtos_por_chave = {}
+        self.produtos_por_rotulo = {}
+        self.clientes_por_id = {}
+        self.clientes_por_nome = {}
+        self.clientes_por_documento = {}  # CPF/CNPJ não é único nos dados antigos: só para busca
+        self.busca_produtos = IndiceBusca()  # Rótulos, para a busca por trecho
+        self.busca_clientes = IndiceBusca()  # Nomes
+        self.posicoes = {"produtos": {}, "clientes": {}}  # id(registro) -> posição na lista (ver _posicao)
+        self.proximo_id = 1
+        self.proximo_id_cliente = 1
+        armazenamento.alcancar = self.alcancar
+
+    def carregar(self, dados, reparar=True):
+        """Monta os índices a partir das coleções carregadas do armazenamento.
+
+        Com reparar=False os registros antigos sem ID não recebem um, para ler sem gravar nada.
+        """
+        self.carregar_produtos(dados["produtos"], reparar)
+        self.carregar_clientes(dados["clientes"], reparar)
+
+    def carregar_produtos(self, produtos, reparar=True):
+        self.produtos = produtos
+        self.proximo_id = max((produto.get("id", 0) for produto in self.produtos), default=0) + 1
+        if reparar and any("id" not in produto for produto in produtos):
+            # Produtos gravados antes dos IDs recebem um na primeira carga, todos em uma gravação.
+            # Ao abrir a transação, self.produtos pode ter sido recarregado com o que outro processo gravou.
+            with self.armazenamento.transacao():
+                alteracoes = [(indice, dict(produto, id=self._gerar_id()))
+                              for indice, produto in enumerate(self.produtos) if "id" not in produto]
+                if alteracoes:
+                    self.armazenamento.atualizar_varios("produtos", alteracoes)
+
+        self.produtos_por_id.clear()
+        self.produtos_por_chave.clear()
+        self.produtos_por_rotulo.clear()
+        self.busca_produtos = IndiceBusca()
+        for produto in self.produtos:
+            if "custo_m3" in produto and "custo_metro" not in produto:
+                produto.update(com_custo_metro(produto))  # Só em memória; é derivado do custo_m3
+            self._indexar_produto(produto)
+
+    def carregar_clientes(self, clientes, reparar=True):
+        self.clientes = clientes
+        self.proximo_id_cliente = max((cliente.get("id", 0) for cliente in self.clientes), default=0) + 1
+        if reparar and any("id" not in cliente for cliente in clientes):
+            # Como nos produtos: os clientes antigos recebem um ID, todos em uma gravação
+            with self.armazenamento.transacao():
+                alteracoes = [(indice, dict(cliente, id=self._gerar_id_cliente()))
+                              for indice, cliente in enumerate(self.clientes) if "id" not in cliente]
+                if alteracoes:
+                    self.armazenamento.atualizar_varios("clientes", alteracoes)
+
+        self.clientes_por_id.clear()
+        self.clientes_por_nome.clear()
+        self.clientes_por_documento.clear()
+        self.busca_clientes = IndiceBusca()
+        for cliente in self.clientes:
+            self._indexar_cliente(cliente)
+
+    def alcancar(self):
+        """Aplica o que outros processos gravaram; chamado pelo armazenamento ao abrir uma transação."""
+        entradas = self.armazenamento.novas_entradas()
+        if entradas is None:
+            self.armazenamento.adotar(self.armazenamento.recarregado())
+            self.carregar(self.armazenamento.dados)
+        else:
+            for entrada in entradas:
+                self.aplicar_alteracao(self.armazenamento.dados, entrada)
+
+    def produto_atual(self, produto):
+        """O registro em vigor do produto (outro processo pode tê-lo substituído); None se foi excluído."""
+        return self.produtos_por_id.get(produto["id"])
+
+    def cliente_atual(self, cliente):
+        """O registro em vigor do cliente, pelo ID; None se foi excluído (ou não tem ID para conferir)."""
+        return self.clientes_por_id.get(cliente.get("id"))
+
+    def produto_por_id(self, produto_id):
+        return self.produtos_por_id.get(produto_id)
+
+    def produto_por_chave(self, descricao, largura, espessura, madeira):
+        return self.produtos_por_chave.get((descricao, largura, espessura, madeira))
+
+    def produto_por_rotulo(self, rotulo):
+        return self.produtos_por_rotulo.get(rotulo)
+
+    def cliente_por_nome(self, nome):
+        return self.clientes_por_nome.get(nome)
+
+    def cliente_por_documento(self, cpf_cnpj):
+        return self.clientes_por_documento.get(cpf_cnpj)
+
+    def rotulos_produtos(self):
+        return list(self.produtos_por_rotulo)
+
+    def buscar_produtos(self, consulta, limite=20):
+        """Rótulos de produtos que contêm a consulta, sem diferenciar acentos e maiúsculas."""
+        return self.busca_produtos.buscar(consulta, limite)
+
+    def buscar_clientes(self, consulta, limite=20):
+        return self.busca_clientes.buscar(consulta, limite)
+
+    def preparar_busca(self):
+        """Monta os índices de busca antes da primeira tecla digitada."""
+        self.busca_produtos.montar()
+        self.busca_clientes.montar()
+
+    def produtos_da_madeira(self, madeira):
+        """Produtos com custo por m³ cadastrado da madeira informada (sem diferenciar maiúsculas)."""
+        madeira = madeira.strip().casefold()
+        return [produto for produto in self.produtos if "custo_m3" in produto and produto_completo(produto)
+                and produto["madeira"].strip().casefold() == madeira]
+
+    def madeiras(self):
+        return sorted({produto["madeira"] for produto in self.produtos
+                       if "custo_m3" in produto and produto_completo(produto)})
+
+    def previa_reprecificacao(self, madeira, percentual=None, custo_m3=None, precos_venda=None):
+        """Calcula o reajuste de uma madeira sem gravar nada.
+
+        precos_venda associa o rótulo do produto ao valor de venda por metro
+        (reais); o lucro por metro antes e depois é calculado em lote para todos
+        os produtos. Retorna [(produto, novo, lucro_antes, lucro_depois), ...],
+        com os lucros em centavos, ou None quando o produto não tem preço de venda.
+        """
+        produtos = self.produtos_da_madeira(madeira)
+        novos = [reprecificado(produto, percentual, custo_m3) for produto in produtos]
+        precos_venda = precos_venda or {}
+        venda = [centavos(precos_venda.get(rotulo_produto(produto), 0)) for produto in produtos]
+        metro = [1000] * len(produtos)
+        quantidade = [1] * len(produtos)
+        antes = precificar_centavos([custo_metro_produto(produto, 0) for produto in produtos], metro, quantidade, venda)
+        depois = precificar_centavos([novo["custo_metro"] for novo in novos], metro, quantidade, venda)
+
+        tem_preco = [rotulo_produto(produto) in precos_venda for produto in produtos]
+        return [(produto, novo, int(lucro_antes) if preco else None, int(lucro_depois) if preco else None)
+                for produto, novo, lucro_antes, lucro_depois, preco
+                in zip(produtos, novos, antes["lucro"], depois["lucro"], tem_preco)]
+
+    def atualizar_produtos(self, alteracoes):
+        """Aplica [(produto, novos_dados), ...] em uma única gravação no armazenamento.
+
+        Produtos excluídos por outro processo ficam de fora do retorno.
+        """
+        with self.armazenamento.transacao():
+            atuais = [(self.produto_atual(produto), novos_dados) for produto, novos_dados in alteracoes]
+            atuais = [(produto, novos_dados) for produto, novos_dados in atuais if produto is not None]
+            novos = [com_custo_metro(dict(novos_dados, id=produto["id"])) for produto, novos_dados in atuais]
+            self.armazenamento.atualizar_varios("produtos", [(self._posicao("produtos", produto), novo)
+                                                             for (produto, _), novo in zip(atuais, novos)])
+            for (produto, _), novo in zip(atuais, novos):
+                self._substituir_posicao("produtos", produto, novo)
+                self._desindexar_produto(produto)
+                self._indexar_produto(novo)
+        return novos
+
+    def adicionar_produto(self, produto):
+        with self.armazenamento.transacao():  # O ID é gerado depois de ver os produtos dos outros processos
+            produto = com_custo_metro(dict(produto, id=self._gerar_id()))
+            self.armazenamento.adicionar("produtos", produto)
+            self._acrescentar_posicoes("produtos", [produto])
+            self._indexar_produto(produto)
+        return produto
+
+    def adicionar_produtos(self, produtos):
+        """Adiciona vários produtos em uma única gravação no armazenamento e retorna os adicionados.
+
+        Os que já estão cadastrados (talvez por outro processo, depois de o chamador
+        conferir) são descartados; repetições dentro de produtos não são conferidas.
+        """
+        with self.armazenamento.transacao():
+            produtos = [com_custo_metro(dict(produto, id=self._gerar_id())) for produto in produtos
+                        if chave_produto(produto) not in self.produtos_por_chave]
+            if produtos:
+                self.armazenamento.adicionar_varios("produtos", produtos)
+            self._acrescentar_posicoes("produtos", produtos)
+            for produto in produtos:
+                self._indexar_produto(produto)
+        return produtos
+
+    def atualizar_produto(self, produto, novos_dados):
+        """Substitui o produto; ValueError se outro processo o excluiu."""
+        with self.armazenamento.transacao():
+            produto = self.produto_atual(produto)
+            if produto is None:
+                raise ValueError("Produto excluído por outro usuário!")
+            novo = com_custo_metro(dict(novos_dados, id=produto["id"]))
+            self.armazenamento.atualizar("produtos", self._posicao("produtos", produto), novo)
+            self._substituir_posicao("produtos", produto, novo)
+            self._desindexar_produto(produto)
+            self._indexar_produto(novo)
+        return novo
+
+    def remover_produto(self, produto):
+        with self.armazenamento.transacao():
+            produto = self.produto_atual(produto)
+            if produto is not None:  # Senão outro processo já o excluiu
+                self.armazenamento.remover("produtos", self._posicao("produtos", produto))
+                self._desindexar_produto(produto)
+
+    def adicionar_cliente(self, cliente):
+        with self.armazenamento.transacao():  # O ID é gerado depois de ver os clientes dos outros processos
+            cliente = dict(cliente, id=self._gerar_id_cliente())
+            self.armazenamento.adicionar("clientes", cliente)
+            self._acrescentar_posicoes("clientes", [cliente])
+            self._indexar_cliente(cliente)
+        return cliente
+
+    def adicionar_clientes(self, clientes):
+        """Como adicionar_produtos: descarta os clientes com nome ou CPF/CNPJ já cadastrado."""
+        with self.armazenamento.transacao():
+            clientes = [dict(cliente, id=self._gerar_id_cliente()) for cliente in clientes
+                        if cliente["nome"] not in self.clientes_por_nome
+                        and cliente["cpf_cnpj"] not in self.clientes_por_documento]
+            if clientes:
+                self.armazenamento.adicionar_varios("clientes", clientes)
+            self._acrescentar_posicoes("clientes", clientes)
+            for cliente in clientes:
+                self._indexar_cliente(cliente)
+        return clientes
+
+    def atualizar_cliente(self, cliente, novo):
+        """Substitui o cliente; ValueError se outro processo o excluiu."""
+        with self.armazenamento.transacao():
+            cliente = self.cliente_atual(cliente)
+            if cliente is None:
+                raise ValueError("Cliente excluído por outro usuário!")
+            novo = dict(novo, id=cliente["id"])
+            self.armazenamento.atualizar("clientes", self._posicao("clientes", cliente), novo)
+            self._substituir_posicao("clientes", cliente, novo)
+            self._desindexar_cliente(cliente)
+            self._indexar_cliente(novo)
+        return novo
+
+    def remover_cliente(self, cliente):
+        with self.armazenamento.transacao():
+            cliente = self.cliente_atual(cliente)
+            if cliente is not None:
+                self.armazenamento.remover("clientes", self._posicao("clientes", cliente))
+                self._desindexar_cliente(cliente)
+
+    def aplicar_alteracao(self, dados, entrada):
+        """Aplica uma alteração feita por outro processo (no formato do journal) às coleções e aos índices.
+
+        Retorna (antigos, novos): os registros que saíram e os que entraram na coleção.
+        """
+        lista = dados.setdefault(entrada["colecao"], [])
+        operacao = entrada["op"]
+        if operacao in ("remover", "atualizar"):
+            antigos = [lista[entrada["indice"]]]
+        elif operacao == "atualizar_varios":
+            antigos = [lista[indice] for indice, _ in entrada["alteracoes"]]
+        elif operacao == "limpar":
+            antigos = list(lista)
+        else:
+            antigos = []
+        tamanho = len(lista)
+        aplicar_entrada(dados, entrada)
+
+        if operacao in ("adicionar", "adicionar_varios"):
+            novos = lista[tamanho:]
+        elif operacao == "atualizar":
+            novos = [entrada["registro"]]
+        elif operacao == "atualizar_varios":
+            novos = [registro for _, registro in entrada["alteracoes"]]
+        else:
+            novos = []
+
+        if entrada["colecao"] in self.posicoes:
+            posicoes = self.posicoes[entrada["colecao"]]
+            if operacao in ("adicionar", "adicionar_varios"):
+                posicoes.update((id(registro), indice) for indice, registro in enumerate(novos, tamanho))
+            elif operacao == "atualizar":
+                posicoes[id(entrada["registro"])] = entrada["indice"]
+            elif operacao == "atualizar_varios":
+                posicoes.update((id(registro), indice) for indice, registro in entrada["alteracoes"])
+
+        if entrada["colecao"] == "produtos":
+            for produto in antigos:
+                self._desindexar_produto(produto)
+            for produto in novos:
+                if "custo_m3" in produto and "custo_metro" not in produto:
+                    produto.update(com_custo_metro(produto))
+                self._indexar_produto(produto)
+                self.proximo_id = max(self.proximo_id, produto.get("id", 0) + 1)
+        elif entrada["colecao"] == "clientes":
+            for cliente in antigos:
+                self._desindexar_cliente(cliente)
+            for cliente in novos:
+                self._indexar_cliente(cliente)
+                self.proximo_id_cliente = max(self.proximo_id_cliente, cliente.get("id", 0) + 1)
+        return antigos, novos
+
+    def _gerar_id(self):
+        produto_id = self.proximo_id
+        self.proximo_id += 1
+        return produto_id
+
+    def _gerar_id_cliente(self):
+        cliente_id = self.proximo_id_cliente
+        self.proximo_id_cliente += 1
+        return cliente_id
+
+    def _posicao(self, colecao, registro):
+        """Posição do registro na lista de produtos ou clientes, por identidade (registros iguais são distintos).
+
+        A posição guardada é conferida na lista antes de ser usada. Inclusões e
+        edições mantêm o dicionário em dia; depois de uma exclusão (que desloca
+        os registros seguintes) ele é refeito na próxima consulta, em O(n) como a
+        própria exclusão na lista.
+        """
+        lista = self.produtos if colecao == "produtos" else self.clientes
+        posicoes = self.posicoes[colecao]
+        indice = posicoes.get(id(registro))
+        if indice is None or indice >= len(lista) or lista[indice] is not registro:
+            posicoes.clear()
+            posicoes.update((id(item), indice) for indice, item in enumerate(lista))
+            indice = posicoes[id(registro)]
+        return indice
+
+    def _acrescentar_posicoes(self, colecao, registros):
+        """Guarda as posições de registros recém-acrescentados ao fim da lista."""
+        inicio = len(self.produtos if colecao == "produtos" else self.clientes) - len(registros)
+        self.posicoes[colecao].update((id(registro), indice) for indice, registro in enumerate(registros, inicio))
+
+    def _substituir_posicao(self, colecao, antigo, novo):
+        posicoes = self.posicoes[colecao]
+        if id(antigo) in posicoes:
+            posicoes[id(novo)] = posicoes.pop(id(antigo))
+
+    def _indexar_produto(self, produto):
+        if "id" in produto:
+            self.produtos_por_id[produto["id"]] = produto
+        if produto_completo(produto):
+            self.produtos_por_chave[chave_produto(produto)] = produto
+            self.produtos_por_rotulo[rotulo_produto(produto)] = produto
+            self.busca_produtos.adicionar(rotulo_produto(produto))
+
+    def _desindexar_produto(self, produto):
+        self.produtos_por_id.pop(produto["id"], None)
+        if produto_completo(produto):
+            if self.produtos_por_chave.get(chave_produto(produto)) is produto:
+                del self.produtos_por_chave[chave_produto(produto)]
+            if self.produtos_por_rotulo.get(rotulo_produto(produto)) is produto:
+                del self.produtos_por_rotulo[rotulo_produto(produto)]
+                self.busca_produtos.remover(rotulo_produto(produto))
+
+    def _indexar_cliente(self, cliente):
+        if "id" in cliente:
+            self.clientes_por_id[cliente["id"]] = cliente
+        self.clientes_por_nome[cliente["nome"]] = cliente
+        self.busca_clientes.adicionar(cliente["nome"])
+        self.clientes_por_documento[cliente["cpf_cnpj"]] = cliente
+
+    def _desindexar_cliente(self, cliente):
+        if self.clientes_por_id.get(cliente.get("id")) is cliente:
+            del self.clientes_por_id[cliente["id"]]
+        if self.clientes_por_nome.get(cliente["nome"]) is cliente:
+            del self.clientes_por_nome[cliente["nome"]]
+            self.busca_clientes.remover(cliente["nome"])
+        if self.clientes_por_documento.get(cliente["cpf_cnpj"]) is cliente:
+            del self.clientes_por_documento[cliente["cpf_cnpj"]]
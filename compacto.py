@@ -0,0 +1,236 @@
+"""Snapshot em formato compacto: colunas binárias e textos internados, decodificados sob demanda.
+
+O arquivo começa com uma linha JSON (seq, tipos e posições das colunas), e o
+resto são blocos binários. Cada coleção é guardada por coluna: números em
+float64/int64, textos como índices em uma tabela onde cada texto aparece uma
+vez (nomes de clientes, madeiras e descrições se repetem em milhares de
+vendas). O arquivo é mapeado na memória, então carregar não copia nem
+decodifica nada; um registro vira dict quando é lido.
+"""
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import MutableSequence
+
+VERSAO = 1
+AUSENTE = 0xFFFFFFFF  # Índice de texto das colunas "j" para registros sem a chave
+ALINHAMENTO = 8
+TIPOS_ARRAY = {"d": "d", "q": "q", "s": "I", "j": "I"}  # d: float, q: int, s: texto, j: qualquer valor em JSON
+TAMANHO_BLOCO = 4096  # Registros decodificados de uma vez ao percorrer uma coleção
+
+_ausente = object()
+
+
+def tipo_coluna(valores):
+    """O tipo mais compacto que representa exatamente todos os valores da coluna."""
+    tipos = {type(valor) for valor in valores}
+    if tipos == {float}:
+        return "d"
+    if tipos == {int} and all(-2 ** 63 <= valor < 2 ** 63 for valor in valores):
+        return "q"
+    if tipos == {str}:
+        return "s"
+    return "j"
+
+
+def gravar_compacto(arquivo, snapshot):
+    """Grava {"seq": n, coleção: [registros], ...} no formato compacto (com fsync)."""
+    textos = {}  # texto -> índice na tabela
+    blocos = []
+    tamanho = 0
+
+    def bloco(conteudo):
+        nonlocal tamanho
+        inicio = tamanho
+        blocos.append(conteudo)
+        preenchimento = -len(conteudo) % ALINHAMENTO
+        blocos.append(b"\0" * preenchimento)
+        tamanho += len(conteudo) + preenchimento
+        return inicio
+
+    colecoes = {}
+    for nome, registros in snapshot.items():
+        if nome == "seq":
+            continue
+        registros = list(registros)
+        chaves = {}
+        for registro in registros:
+            chaves.update(dict.fromkeys(registro))
+        colunas = []
+        for chave in chaves:
+            valores = [registro.get(chave, _ausente) for registro in registros]
+            tipo = tipo_coluna(valores)
+            if tipo == "s":
+                valores = [textos.setdefault(valor, len(textos)) for valor in valores]
+            elif tipo == "j":
+                valores = [AUSENTE if valor is _ausente else textos.setdefault(json.dumps(valor), len(textos))
+                           for valor in valores]
+            colunas.append([chave, tipo, bloco(array(TIPOS_ARRAY[tipo], valores).tobytes())])
+        colecoes[nome] = {"quantidade": len(registros), "colunas": colunas}
+
+    codificados = [texto.encode("utf-8") for texto in textos]
+    posicoes = array("I", [0])
+    for codificado in codificados:
+        posicoes.append(posicoes[-1] + len(codificado))
+    tabela = [len(codificados), bloco(posicoes.tobytes()), bloco(b"".join(codificados))]
+
+    cabecalho = json.dumps({"seq": snapshot.get("seq", 0), "formato": "compacto", "versao": VERSAO,
+                            "ordem": sys.byteorder, "textos": tabela, "colecoes": colecoes}).encode("utf-8")
+    # Espaços antes da quebra de linha alinham o começo dos blocos binários
+    cabecalho += b" " * (-(len(cabecalho) + 1) % ALINHAMENTO) + b"\n"
+    with open(arquivo, 'wb') as saida:
+        saida.write(cabecalho)
+        saida.writelines(blocos)
+        saida.flush()
+        os.fsync(saida.fileno())
+
+
+class SnapshotCompacto:
+    """Um arquivo no formato compacto, mapeado na memória.
+
+    No Windows o arquivo é lido para a memória em vez de mapeado, porque lá um
+    arquivo mapeado não pode ser trocado pela compactação de outro processo.
+    """
+
+    def __init__(self, arquivo):
+        with open(arquivo, 'rb') as entrada:
+            if os.name == "nt" or os.fstat(entrada.fileno()).st_size == 0:
+                self.conteudo = entrada.read()
+            else:
+                self.conteudo = mmap.mmap(entrada.fileno(), 0, access=mmap.ACCESS_READ)
+        fim = self.conteudo.find(b"\n")
+        if fim < 0:
+            raise ValueError("Snapshot compacto sem cabeçalho")
+        self.cabecalho = json.loads(self.conteudo[:fim])
+        if self.cabecalho.get("formato") != "compacto" or self.cabecalho.get("versao") != VERSAO:
+            raise ValueError("Formato de snapshot desconhecido")
+        self.visao = memoryview(self.conteudo)
+        self.corpo = fim + 1
+        self.seq = self.cabecalho["seq"]
+
+        quantidade, inicio_posicoes, inicio_textos = self.cabecalho["textos"]
+        self.posicoes = self.coluna("s", inicio_posicoes, quantidade + 1)
+        self.bytes_textos = self.visao[self.corpo + inicio_textos:]
+        self.textos = {}  # Índice -> texto já decodificado: repetições viram o mesmo objeto
+
+    def colecoes(self):
+        return list(self.cabecalho["colecoes"])
+
+    def coluna(self, tipo, inicio, quantidade):
+        """Os valores brutos de uma coluna, sem cópia quando a ordem dos bytes é a desta máquina."""
+        codigo = TIPOS_ARRAY[tipo]
+        tamanho = array(codigo).itemsize
+        dados = self.visao[self.corpo + inicio:self.corpo + inicio + quantidade * tamanho]
+        if self.cabecalho["ordem"] == sys.byteorder:
+            return dados.cast(codigo)
+        valores = array(codigo)
+        valores.frombytes(dados)
+        valores.byteswap()
+        return valores
+
+    def texto(self, indice):
+        texto = self.textos.get(indice)
+        if texto is None:
+            texto = self.textos[indice] = str(self.bytes_textos[self.posicoes[indice]:self.posicoes[indice + 1]],
+                                              "utf-8")
+        return texto
+
+
+class RegistrosCompactos(MutableSequence):
+    """Registros de uma coleção do snapshot compacto, decodificados só quando lidos.
+
+    Inclusões ficam em uma lista à parte; outras alterações (raras no histórico
+    de vendas) decodificam a coleção inteira para uma lista comum.
+    """
+
+    def __init__(self, snapshot, nome):
+        informacoes = snapshot.cabecalho["colecoes"].get(nome, {"quantidade": 0, "colunas": []})
+        self.snapshot = snapshot
+        self.quantidade = informacoes["quantidade"]
+        self.colunas = [(chave, tipo, snapshot.coluna(tipo, inicio, self.quantidade))
+                        for chave, tipo, inicio in informacoes["colunas"]]
+        self.acrescimos = []
+        self.lista = None  # Depois de uma alteração no meio, todos os registros decodificados
+
+    def decodificar(self, inicio, fim):
+        """Os registros inicio:fim do snapshot como dicts, decodificados coluna a coluna."""
+        texto = self.snapshot.texto
+        chaves = []
+        colunas = []
+        tem_ausentes = False
+        for chave, tipo, coluna in self.colunas:
+            valores = coluna[inicio:fim].tolist()
+            if tipo == "s":
+                valores = [texto(valor) for valor in valores]
+            elif tipo == "j":
+                tem_ausentes = tem_ausentes or AUSENTE in valores
+                valores = [_ausente if valor == AUSENTE else json.loads(texto(valor)) for valor in valores]
+            chaves.append(chave)
+            colunas.append(valores)
+        if tem_ausentes:
+            return [{chave: valor for chave, valor in zip(chaves, linha) if valor is not _ausente}
+                    for linha in zip(*colunas)]
+        return [dict(zip(chaves, linha)) for linha in zip(*colunas)] if colunas else [{} for _ in range(fim - inicio)]
+
+    def __len__(self):
+        if self.lista is not None:
+            return len(self.lista)
+        return self.quantidade + len(self.acrescimos)
+
+    def __getitem__(self, indice):
+        if self.lista is not None:
+            return self.lista[indice]
+        if isinstance(indice, slice):
+            inicio, fim, passo = indice.indices(len(self))
+            if passo != 1:
+                return [self[posicao] for posicao in range(inicio, fim, passo)]
+            fim = max(inicio, fim)
+            return (self.decodificar(min(inicio, self.quantidade), min(fim, self.quantidade))
+                    + self.acrescimos[max(inicio - self.quantidade, 0):max(fim - self.quantidade, 0)])
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("índice fora da coleção")
+        if indice >= self.quantidade:
+            return self.acrescimos[indice - self.quantidade]
+        return self.decodificar(indice, indice + 1)[0]
+
+    def __iter__(self):
+        if self.lista is not None:
+            yield from self.lista
+            return
+        for inicio in range(0, self.quantidade, TAMANHO_BLOCO):
+            yield from self.decodificar(inicio, min(inicio + TAMANHO_BLOCO, self.quantidade))
+        yield from self.acrescimos
+
+    def __eq__(self, outro):
+        if isinstance(outro, (list, RegistrosCompactos)):
+            return len(self) == len(outro) and list(self) == list(outro)
+        return NotImplemented
+
+    def append(self, registro):
+        (self.lista if self.lista is not None else self.acrescimos).append(registro)
+
+    def extend(self, registros):
+        (self.lista if self.lista is not None else self.acrescimos).extend(registros)
+
+    def clear(self):
+        self.lista = []
+        self.acrescimos = []
+
+    def __setitem__(self, indice, registro):
+        self._materializar()[indice] = registro
+
+    def __delitem__(self, indice):
+        del self._materializar()[indice]
+
+    def insert(self, indice, registro):
+        self._materializar().insert(indice, registro)
+
+    def _materializar(self):
+        if self.lista is None:
+            self.lista = self.decodificar(0, self.quantidade) + self.acrescimos
+            self.acrescimos = []
+        return self.lista
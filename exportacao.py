@@ -0,0 +1,96 @@
+"""Exporta o histórico de vendas em CSV ou Parquet, sem abrir a interface.
+
+Uso: python exportacao.py [--mes AAAA-MM | --inicio AAAA-MM-DD --fim AAAA-MM-DD] [--cliente NOME]
+                          [--formato csv|parquet] [--saida ARQUIVO] [--dados dados.json]
+
+As vendas são lidas do armazenamento aos poucos e gravadas à medida que são
+lidas, então a memória usada não cresce com o histórico. Sem --saida, o CSV
+vai para a saída padrão (útil no cron). Parquet precisa do pyarrow.
+"""
+import argparse
+import csv
+import sys
+from datetime import date, timedelta
+from itertools import islice
+
+from armazenamento import criar_armazenamento
+
+COLUNAS = ("data", "cliente", "descricao", "tamanho", "quantidade", "vl_m", "total", "lucro")
+TAMANHO_LOTE = 10_000
+
+
+def exportar_csv(vendas, saida, separador=";"):
+    """Grava as vendas em CSV; retorna quantas foram gravadas."""
+    escritor = csv.DictWriter(saida, COLUNAS, delimiter=separador, extrasaction="ignore")
+    escritor.writeheader()
+    quantidade = 0
+    for venda in vendas:
+        escritor.writerow(venda)
+        quantidade += 1
+    return quantidade
+
+
+def exportar_parquet(vendas, arquivo, tamanho_lote=TAMANHO_LOTE):
+    """Grava as vendas em Parquet, um row group por lote; retorna quantas foram gravadas."""
+    import pyarrow as pa  # Dependência opcional, só para Parquet
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([("data", pa.string()), ("cliente", pa.string()), ("descricao", pa.string()),
+                         ("tamanho", pa.float64()), ("quantidade", pa.int64()), ("vl_m", pa.float64()),
+                         ("total", pa.float64()), ("lucro", pa.float64())])
+    quantidade = 0
+    vendas = iter(vendas)
+    with pq.ParquetWriter(arquivo, esquema) as escritor:
+        while True:
+            lote = list(islice(vendas, tamanho_lote))
+            if not lote:
+                break
+            colunas = {coluna: [venda.get(coluna) for venda in lote] for coluna in COLUNAS}
+            colunas["quantidade"] = [int(valor) for valor in colunas["quantidade"]]
+            escritor.write_table(pa.table(colunas, schema=esquema))
+            quantidade += len(lote)
+    return quantidade
+
+
+def periodo(mes=None, inicio=None, fim=None):
+    """Converte as opções de data em (inicio, fim) ISO, com fim exclusivo."""
+    if mes is not None:
+        primeiro_dia = date.fromisoformat(mes + "-01")
+        proximo_mes = (primeiro_dia + timedelta(days=32)).replace(day=1)
+        return primeiro_dia.isoformat(), proximo_mes.isoformat()
+    if fim is not None:
+        fim = (date.fromisoformat(fim) + timedelta(days=1)).isoformat()  # --fim inclui o dia informado
+    return inicio, fim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta as vendas em CSV ou Parquet.")
+    parser.add_argument("--mes", help="mês a exportar (AAAA-MM)")
+    parser.add_argument("--inicio", help="primeiro dia (AAAA-MM-DD)")
+    parser.add_argument("--fim", help="último dia, incluído (AAAA-MM-DD)")
+    parser.add_argument("--cliente", help="somente as vendas deste cliente")
+    parser.add_argument("--formato", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--saida", help="arquivo de saída (padrão: saída padrão, só para CSV)")
+    parser.add_argument("--separador", default=";", help="separador do CSV (padrão: ;)")
+    parser.add_argument("--dados", default="dados.json", help="arquivo de dados do sistema")
+    args = parser.parse_args()
+
+    if args.formato == "parquet" and not args.saida:
+        parser.error("--saida é obrigatório para Parquet")
+
+    inicio, fim = periodo(args.mes, args.inicio, args.fim)
+    # Só lê: migrar ou compactar os dados fica com a aplicação
+    vendas = criar_armazenamento(args.dados, somente_leitura=True).iterar_vendas(inicio, fim, args.cliente)
+
+    if args.formato == "parquet":
+        quantidade = exportar_parquet(vendas, args.saida)
+    elif args.saida:
+        with open(args.saida, 'w', newline='', encoding='utf-8') as saida:
+            quantidade = exportar_csv(vendas, saida, args.separador)
+    else:
+        quantidade = exportar_csv(vendas, sys.stdout, args.separador)
+    print(f"{quantidade} vendas exportadas", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
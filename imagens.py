@@ -0,0 +1,50 @@
+import hashlib
+import os
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+PASTA_CACHE = ".cache_imagens"
+
+
+def pixmap_escalado(caminho, largura=0, altura=0):
+    """Carrega a imagem já reduzida para largura x altura (0 = proporcional).
+
+    A versão reduzida é gravada em PASTA_CACHE, identificada pelo caminho, data
+    de modificação e tamanho do arquivo original (sem lê-lo), pelo tamanho pedido
+    e pela densidade de pixels da tela, e mantida no QPixmapCache. Nas próximas
+    execuções a imagem grande não é lida nem decodificada.
+    """
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return QtGui.QPixmap()
+
+    origem = f"{os.path.abspath(caminho)}:{estado.st_mtime_ns}:{estado.st_size}"
+    hash_origem = hashlib.sha1(origem.encode("utf-8")).hexdigest()
+    app = QtWidgets.QApplication.instance()
+    escala = app.devicePixelRatio() if app is not None else 1.0
+    chave = f"{hash_origem}_{largura}x{altura}@{escala:g}"
+
+    pixmap = QtGui.QPixmapCache.find(chave)
+    if pixmap is not None and not pixmap.isNull():
+        return pixmap
+
+    pixmap = QtGui.QPixmap()
+
+    arquivo_cache = os.path.join(PASTA_CACHE, chave + ".png")
+    if not pixmap.load(arquivo_cache):
+        imagem = QtGui.QImage(caminho)
+        if largura and altura:
+            imagem = imagem.scaled(int(largura * escala), int(altura * escala),
+                                   QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        elif altura:
+            imagem = imagem.scaledToHeight(int(altura * escala), QtCore.Qt.SmoothTransformation)
+        elif largura:
+            imagem = imagem.scaledToWidth(int(largura * escala), QtCore.Qt.SmoothTransformation)
+        os.makedirs(PASTA_CACHE, exist_ok=True)
+        imagem.save(arquivo_cache, "PNG")
+        pixmap = QtGui.QPixmap.fromImage(imagem)
+
+    pixmap.setDevicePixelRatio(escala)
+    QtGui.QPixmapCache.insert(chave, pixmap)
+    return pixmap
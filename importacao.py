@@ -0,0 +1,190 @@
+"""Importa produtos e clientes de planilhas CSV ou XLSX, sem abrir a interface.
+
+Uso: python importacao.py produtos|clientes ARQUIVO [--dados dados.json] [--rejeitados rejeitados.csv]
+
+A primeira linha da planilha traz os nomes das colunas:
+    produtos: descricao, madeira, largura, espessura, custo_m3
+    clientes: nome, cpf_cnpj, endereco, cidade, telefone
+A planilha é lida em lotes, cada linha passa pelas mesmas regras do formulário
+e as linhas aceitas são gravadas de uma vez no final. Arquivos XLSX precisam
+do openpyxl.
+"""
+import argparse
+import csv
+import os
+import time
+from collections import namedtuple
+from itertools import islice
+
+from armazenamento import criar_armazenamento
+from catalogo import Catalogo, chave_produto
+from validacao import CAMPOS_CLIENTE, erro_cliente, erro_produto, somente_digitos
+
+TAMANHO_LOTE = 5000
+
+# rejeitados: [(número da linha na planilha, motivo), ...]
+ResultadoImportacao = namedtuple("ResultadoImportacao", "lidos importados rejeitados segundos")
+
+
+def _texto(valor):
+    # Células numéricas do XLSX chegam como int/float
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _numero(texto):
+    """Aceita "1234.56", "1234,56" e "1.234,56"."""
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+
+def ler_planilha(arquivo):
+    """Gera um dicionário por linha de dados (colunas em minúsculas), sem carregar o arquivo inteiro."""
+    if os.path.splitext(arquivo)[1].lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook  # Dependência opcional, só para XLSX
+
+        pasta = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = pasta.active.iter_rows(values_only=True)
+            colunas = [_texto(coluna).lower() for coluna in next(linhas, ())]
+            for linha in linhas:
+                yield dict(zip(colunas, map(_texto, linha)))
+        finally:
+            pasta.close()
+        return
+
+    with open(arquivo, 'r', newline='', encoding='utf-8-sig') as entrada:
+        # Planilhas salvas pelo Excel em português usam ";" como separador
+        try:
+            dialeto = csv.Sniffer().sniff(entrada.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        entrada.seek(0)
+        leitor = csv.reader(entrada, dialeto)
+        colunas = [coluna.strip().lower() for coluna in next(leitor, [])]
+        for linha in leitor:
+            yield dict(zip(colunas, (valor.strip() for valor in linha)))
+
+
+def converter_produto(linha):
+    produto = {"descricao": linha.get("descricao", ""), "madeira": linha.get("madeira", "")}
+    try:
+        for campo in ("largura", "espessura", "custo_m3"):
+            produto[campo] = _numero(linha.get(campo, ""))
+    except ValueError:
+        raise ValueError(f"Valor numérico inválido em {campo}: {linha.get(campo, '')!r}")
+    erro = erro_produto(produto)
+    if erro is not None:
+        raise ValueError(erro)
+    return produto
+
+
+def converter_cliente(linha):
+    cliente = {campo: linha.get(campo, "") for campo in CAMPOS_CLIENTE}
+    # Mesmo filtro dos campos do formulário: só dígitos no documento e no telefone
+    cliente["cpf_cnpj"] = somente_digitos(cliente["cpf_cnpj"])
+    cliente["telefone"] = somente_digitos(cliente["telefone"])
+    erro = erro_cliente(cliente)
+    if erro is not None:
+        raise ValueError(erro)
+    return cliente
+
+
+def importar(catalogo, tipo, arquivo, tamanho_lote=TAMANHO_LOTE, progresso=None, destino=None):
+    """Importa "produtos" ou "clientes" da planilha para o catálogo, com uma única gravação no final.
+
+    Registros já cadastrados (ou repetidos na própria planilha) são rejeitados.
+    progresso(linhas_lidas) é chamado a cada lote. A gravação é feita por
+    destino.adicionar_produtos/adicionar_clientes (padrão: o próprio catálogo).
+    """
+    inicio = time.perf_counter()
+    if tipo == "produtos":
+        converter = converter_produto
+        chaves = [chave_produto]
+        existentes = [catalogo.produtos_por_chave]
+        motivos_duplicado = ["Produto já registrado!"]
+    else:
+        converter = converter_cliente
+        chaves = [lambda cliente: cliente["nome"], lambda cliente: cliente["cpf_cnpj"]]
+        existentes = [catalogo.clientes_por_nome, catalogo.clientes_por_documento]
+        motivos_duplicado = ["Já existe um cliente com este nome!", "Já existe um cliente com este CPF/CNPJ!"]
+    vistos = [set() for _ in chaves]
+
+    aceitos = []  # [(número da linha, registro)]
+    rejeitados = []
+    lidos = 0
+    linhas = ler_planilha(arquivo)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        for numero, linha in enumerate(lote, start=lidos + 2):  # +2: cabeçalho e contagem a partir de 1
+            try:
+                registro = converter(linha)
+            except ValueError as e:
+                rejeitados.append((numero, str(e)))
+                continue
+
+            valores = [chave(registro) for chave in chaves]
+            duplicado = next((motivo for valor, indice, visto, motivo
+                              in zip(valores, existentes, vistos, motivos_duplicado)
+                              if valor in indice or valor in visto), None)
+            if duplicado is not None:
+                rejeitados.append((numero, duplicado))
+                continue
+            for valor, visto in zip(valores, vistos):
+                visto.add(valor)
+            aceitos.append((numero, registro))
+
+        lidos += len(lote)
+        if progresso is not None:
+            progresso(lidos)
+
+    importados = 0
+    if aceitos:
+        destino = destino or catalogo
+        adicionar = destino.adicionar_produtos if tipo == "produtos" else destino.adicionar_clientes
+        # A conferência acima foi sem trava: a gravação descarta o que outra instância cadastrou nesse meio tempo
+        gravados = {chaves[0](registro) for registro in adicionar([registro for _, registro in aceitos])}
+        importados = len(gravados)
+        rejeitados += [(numero, "Cadastrado por outro usuário durante a importação!")
+                       for numero, registro in aceitos if chaves[0](registro) not in gravados]
+        rejeitados.sort()
+    return ResultadoImportacao(lidos, importados, rejeitados, time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa produtos ou clientes de uma planilha CSV/XLSX.")
+    parser.add_argument("tipo", choices=("produtos", "clientes"))
+    parser.add_argument("arquivo", help="planilha CSV ou XLSX")
+    parser.add_argument("--dados", default="dados.json", help="arquivo de dados do sistema")
+    parser.add_argument("--rejeitados", help="grava as linhas rejeitadas e os motivos neste CSV")
+    args = parser.parse_args()
+
+    armazenamento = criar_armazenamento(args.dados)
+    catalogo = Catalogo(armazenamento)
+    catalogo.carregar(armazenamento.carregar())
+    resultado = importar(catalogo, args.tipo, args.arquivo)
+    armazenamento.compactar()
+
+    print(f"{resultado.lidos} linhas em {resultado.segundos:.2f} s "
+          f"({resultado.lidos / max(resultado.segundos, 1e-9):.0f} linhas/s): "
+          f"{resultado.importados} importadas, {len(resultado.rejeitados)} rejeitadas")
+    for numero, motivo in resultado.rejeitados[:20]:
+        print(f"  linha {numero}: {motivo}")
+    if len(resultado.rejeitados) > 20:
+        print(f"  ... e mais {len(resultado.rejeitados) - 20}")
+
+    if args.rejeitados:
+        with open(args.rejeitados, 'w', newline='', encoding='utf-8') as saida:
+            escritor = csv.writer(saida)
+            escritor.writerow(("linha", "motivo"))
+            escritor.writerows(resultado.rejeitados)
+
+
+if __name__ == "__main__":
+    main()
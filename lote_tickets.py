@@ -0,0 +1,94 @@
+"""Gera vários tickets de venda em PDF de uma vez, sem abrir a interface.
+
+Uso: python lote_tickets.py orcamentos.json [--saida PASTA] [--processos N]
+
+orcamentos.json é uma lista de orçamentos no formato:
+    {"cliente": "NOME" ou {...}, "itens": [{"descricao", "tamanho", "quantidade", "vl_m"}, ...],
+     "vendedor": "...", "forma_pagamento": "...", "condicao_pagamento": "..."}
+Clientes informados pelo nome são buscados no dados.json.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from armazenamento import criar_armazenamento
+from catalogo import Catalogo
+from ticket import criar_ticket, renderizar_ticket
+
+
+def montar_tickets(orcamentos, catalogo):
+    """Converte os orçamentos salvos em snapshots de ticket."""
+    tickets = []
+    for orcamento in orcamentos:
+        cliente = orcamento["cliente"]
+        if isinstance(cliente, str):
+            cliente = catalogo.cliente_por_nome(cliente)
+            if cliente is None:
+                raise ValueError(f"Cliente não encontrado: {orcamento['cliente']}")
+
+        itens = [dict(item, total=item.get("total", item["vl_m"] * item["tamanho"] * int(item["quantidade"])))
+                 for item in orcamento["itens"]]
+        tickets.append(criar_ticket(cliente, itens,
+                                    orcamento.get("vendedor", "EVERSON OLSEN"),
+                                    orcamento.get("forma_pagamento", "DINHEIRO"),
+                                    orcamento.get("condicao_pagamento", "")))
+    return tickets
+
+
+def _renderizar(tarefa):
+    ticket, nome_pdf = tarefa
+    inicio = time.perf_counter()
+    renderizar_ticket(ticket, nome_pdf)
+    return nome_pdf, time.perf_counter() - inicio
+
+
+def percentil(valores_ordenados, p):
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def gerar_lote(tickets, pasta_saida, processos=None):
+    """Renderiza os tickets em paralelo e retorna [(nome_pdf, segundos), ...].
+
+    O PID no nome impede que dois lotes rodando no mesmo segundo sobrescrevam os PDFs um do outro.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    lote = os.getpid()
+    tarefas = [(ticket, os.path.join(pasta_saida, f"Ticket_Venda_{ticket.data:%Y%m%d_%H%M%S}_{lote}_{numero}.pdf"))
+               for numero, ticket in enumerate(tickets, start=1)]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_renderizar, tarefas, chunksize=max(1, len(tarefas) // 64)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera tickets de venda em lote.")
+    parser.add_argument("orcamentos", help="arquivo JSON com a lista de orçamentos")
+    parser.add_argument("--saida", default="tickets", help="pasta onde os PDFs serão gravados")
+    parser.add_argument("--processos", type=int, default=None, help="número de processos (padrão: CPUs)")
+    parser.add_argument("--dados", default="dados.json", help="arquivo de dados com os clientes")
+    args = parser.parse_args()
+
+    with open(args.orcamentos, 'r') as arquivo:
+        orcamentos = json.load(arquivo)
+
+    armazenamento = criar_armazenamento(args.dados, somente_leitura=True)  # Só lê os clientes, como o exportacao.py
+    catalogo = Catalogo(armazenamento)
+    catalogo.carregar(armazenamento.carregar(reparar=False), reparar=False)
+    tickets = montar_tickets(orcamentos, catalogo)
+    if not tickets:
+        print("Nenhum orçamento para gerar.")
+        return
+
+    inicio = time.perf_counter()
+    resultados = gerar_lote(tickets, args.saida, args.processos)
+    decorrido = time.perf_counter() - inicio
+
+    tempos = sorted(segundos for _, segundos in resultados)
+    print(f"{len(resultados)} tickets em {decorrido:.2f} s ({len(resultados) / decorrido:.1f} tickets/s)")
+    print(f"Renderização: p50 {percentil(tempos, 50) * 1000:.1f} ms, p95 {percentil(tempos, 95) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,22 @@
-import subprocess
+import time
+INICIO = time.perf_counter()  # Startup instrumentation, see relatorio_inicializacao
 import sys
-import json
 import os
 from PyQt5 import QtWidgets, QtGui, QtCore
-from fpdf import FPDF
-from datetime import datetime
-
-def install(package):
-    """Install a package using pip."""
-    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-
-# List of required packages
-required_packages = ['PyQt5', 'fpdf']
-
-# Check and install required packages
-for package in required_packages:
-    try:
-        __import__(package)
-    except ImportError:
-        print(f"Installing {package}...")
-        install(package)
+from catalogo import produto_completo, rotulo_produto
+from imagens import pixmap_escalado
+from nucleo import criar_nucleo
+from precificacao import calcular_linha, centavos, custo_por_metro, formatar, milimetros, valores_venda
+from relatorios import ITENS, LUCRO, M3, QUANTIDADE, TOTAL
+# fpdf (via ticket) is imported on the first gerar_pdf; dependencies come from requirements.txt
+FIM_IMPORTACOES = time.perf_counter()
+
+def relatorio_inicializacao(tela_criada, primeira_pintura):
+    """Print the startup timings when MADEIREIRA_TEMPOS is set."""
+    if os.environ.get("MADEIREIRA_TEMPOS"):
+        print(f"Importações: {(FIM_IMPORTACOES - INICIO) * 1000:.1f} ms, "
+              f"criação da tela: {(tela_criada - FIM_IMPORTACOES) * 1000:.1f} ms, "
+              f"primeira pintura: {(primeira_pintura - INICIO) * 1000:.1f} ms", file=sys.stderr)
 
 class ProdutosDialog(QtWidgets.QDialog):
     def __init__(self, produtos, on_edit, on_delete):
@@ -36,9 +33,9 @@ class ProdutosDialog(QtWidgets.QDialog):
         else:
             self.produtos_list = QtWidgets.QListWidget()
             for produto in produtos:
-                # Format: "Descrição - Largura X Espessura - Tipo da Madeira"
-                formatted_desc = f"{produto['descricao']} - {produto['largura']} X {produto['espessura']} - {produto['madeira']}"
-                self.produtos_list.addItem(formatted_desc)
+                if produto_completo(produto):
+                    # Format: "Descrição - Largura X Espessura - Tipo da Madeira"
+                    self.produtos_list.addItem(rotulo_produto(produto))
             layout.addWidget(self.produtos_list)
 
             # Buttons for editing and deleting
@@ -129,8 +126,152 @@ class ClientesDialog(QtWidgets.QDialog):
                 QtWidgets.QMessageBox.information(self, "Sucesso", f"Cliente '{selected_client}' excluído com sucesso!")
                 self.accept()  # Close the dialog after deletion
 
+class RegistrosTableModel(QtCore.QAbstractTableModel):
+    """Table model over a list of record dicts; cells are formatted only when the view asks for them."""
+    def __init__(self, colunas, registros=None):
+        super().__init__()
+        self.colunas = colunas  # List of (header, function(record) -> display text)
+        self.registros = registros if registros is not None else []
+        self.linhas = len(self.registros)  # Rows the views know about (a shared list may grow first)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.linhas
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.colunas)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and index.isValid():
+            return self.colunas[index.column()][1](self.registros[index.row()])
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.colunas[section][0]
+        return super().headerData(section, orientation, role)
+
+    def redefinir(self, registros):
+        """Point the model at another record list."""
+        self.beginResetModel()
+        self.registros = registros
+        self.linhas = len(registros)
+        self.endResetModel()
+
+    def adicionar(self, registro, aplicar=None):
+        """Append a record; aplicar(registro) performs the append when the list is owned elsewhere."""
+        linha = self.linhas
+        self.beginInsertRows(QtCore.QModelIndex(), linha, linha)
+        (aplicar or self.registros.append)(registro)
+        self.linhas += 1
+        self.endInsertRows()
+
+    def adicionar_varios(self, registros):
+        """Append several records with a single row insertion."""
+        if not registros:
+            return
+        linha = self.linhas
+        self.beginInsertRows(QtCore.QModelIndex(), linha, linha + len(registros) - 1)
+        self.registros.extend(registros)
+        self.linhas += len(registros)
+        self.endInsertRows()
+
+    def exibir_acrescimos(self, registros):
+        """Show the rows the owner of a shared list (e.g. the sales history) has already appended.
+
+        registros is the list as it is now; it may be a reloaded copy of the one shown so far.
+        """
+        novas = len(registros) - self.linhas
+        if novas < 0:
+            self.redefinir(registros)  # Reloaded with fewer records: start over
+            return
+        self.registros = registros
+        if novas > 0:
+            self.beginInsertRows(QtCore.QModelIndex(), self.linhas, self.linhas + novas - 1)
+            self.linhas += novas
+            self.endInsertRows()
+
+    def remover(self, linha, aplicar=None):
+        """Remove the record at linha; aplicar(linha) performs the removal when the list is owned elsewhere."""
+        self.beginRemoveRows(QtCore.QModelIndex(), linha, linha)
+        if aplicar is not None:
+            aplicar(linha)
+        else:
+            del self.registros[linha]
+        self.linhas -= 1
+        self.endRemoveRows()
+
+def criar_tabela(modelo):
+    """Create a read-only, row-selecting QTableView for the model."""
+    tabela = QtWidgets.QTableView()
+    tabela.setModel(modelo)
+    tabela.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+    tabela.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)  # Avoid measuring every row
+    tabela.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)  # Não permite edição
+    tabela.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+    return tabela
+
+def instalar_busca(combobox, buscar):
+    """Replace the editable combobox's prefix completion with the catalog search (accents and case ignored)."""
+    modelo = QtCore.QStringListModel(combobox)
+    completer = QtWidgets.QCompleter(modelo, combobox)
+    completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)  # The index already filtered
+    combobox.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+    combobox.setCompleter(completer)
+
+    def atualizar(texto):
+        modelo.setStringList(buscar(texto))  # Top matches only, one index lookup per keystroke
+        completer.complete()
+
+    combobox.lineEdit().textEdited.connect(atualizar)
+
+def substituir_item(combobox, antigo=None, novo=None):
+    """Add, rename or remove a single combobox entry instead of rebuilding the whole list."""
+    indice = combobox.findText(antigo, QtCore.Qt.MatchExactly) if antigo is not None else -1
+    if indice >= 0 and novo is not None:
+        combobox.setItemText(indice, novo)
+    elif indice >= 0:
+        combobox.removeItem(indice)
+    elif novo is not None:
+        combobox.addItem(novo)
+
+INTERVALO_SINCRONIZACAO_MS = 5000  # Polling fallback: network shares and the server send no file events
+ATRASO_SINCRONIZACAO_MS = 200  # Coalesces the burst of file events of a single save
+
+# Columns of the budget grid and of the sales report
+COLUNAS_ORCAMENTO = [
+    ("PRODUTO", lambda r: r["descricao"]),
+    ("QUANTIDADE", lambda r: str(r["quantidade"])),
+    ("VALOR POR METRO", lambda r: f"R$ {r['vl_m']:.2f}"),  # Selling price
+    ("VALOR UNITÁRIO", lambda r: formatar(valores_venda(centavos(r["vl_m"]), milimetros(r["tamanho"]), 1)[0])),  # Unit price
+    ("VALOR TOTAL", lambda r: f"R$ {r['total']:.2f}"),
+    ("LUCRO", lambda r: f"R$ {r['lucro']:.2f}"),
+]
+
+COLUNAS_RELATORIO = [
+    ("PRODUTOS", lambda r: r["descricao"]),
+    ("QUANTIDADE", lambda r: str(r["quantidade"])),
+    ("VALOR POR METRO", lambda r: f"R$ {r.get('vl_m', 0):.2f}"),  # Value per meter
+    ("VALOR UNITÁRIO", lambda r: f"R$ {r.get('vl_m', 0):.2f}"),  # Unit price (selling price)
+    ("VALOR TOTAL", lambda r: f"R$ {r['total']:.2f}"),
+    ("LUCRO", lambda r: f"R$ {r.get('lucro', 0):.2f}"),  # Sales recorded before profit was stored show 0
+]
+
+# Columns of the grouped report (record = (group key, totals))
+COLUNAS_AGREGADOS = [
+    ("GRUPO", lambda r: r[0] or "(não informado)"),
+    ("ITENS", lambda r: str(r[1][ITENS])),
+    ("QUANTIDADE", lambda r: str(r[1][QUANTIDADE])),
+    ("M³", lambda r: f"{r[1][M3]:.3f}"),
+    ("FATURAMENTO", lambda r: formatar(r[1][TOTAL])),
+    ("LUCRO", lambda r: formatar(r[1][LUCRO])),
+]
+
+AGRUPAMENTOS = [("Vendas", None), ("Por Produto", "produto"), ("Por Cliente", "cliente"),
+                ("Por Madeira", "madeira"), ("Por Dia", "dia"), ("Por Mês", "mes")]
+
 class RelatorioDialog(QtWidgets.QDialog):
-    def __init__(self, orcamento_produtos):
+    """Sales report over the live sales history; with the compact format, rows are decoded only when shown."""
+    def __init__(self, vendas, agregados=None):
         super().__init__()
         self.setWindowTitle("Relatório de Vendas")
         self.setGeometry(200, 200, 1500, 600)
@@ -143,43 +284,301 @@ class RelatorioDialog(QtWidgets.QDialog):
         titulo.setStyleSheet("font-size: 18px; font-weight: bold;")
         layout.addWidget(titulo)
 
-        # Configuração da Tabela
-        self.tabela = QtWidgets.QTableWidget()
-        self.tabela.setColumnCount(6)  # Increased column count for total value
-        self.tabela.setHorizontalHeaderLabels(["PRODUTOS", "QUANTIDADE", "VALOR POR METRO", "VALOR UNITÁRIO", "VALOR TOTAL", "LUCRO"])
-        self.tabela.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
-        self.tabela.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)  # Não permite edição
+        # Grouping selector; grouped views read the pre-aggregated totals
+        self.agregados = agregados
+        self.agrupamento_combobox = QtWidgets.QComboBox()
+        for rotulo, dimensao in AGRUPAMENTOS:
+            if dimensao is None or agregados is not None:
+                self.agrupamento_combobox.addItem(rotulo, dimensao)
+        self.agrupamento_combobox.currentIndexChanged.connect(self.atualizar_agrupamento)
+        layout.addWidget(self.agrupamento_combobox)
 
-        if not orcamento_produtos:
-            self.tabela.setRowCount(1)
-            self.tabela.setItem(0, 0, QtWidgets.QTableWidgetItem("Nenhuma venda registrada."))
-        else:
-            self.orcamento_produtos = orcamento_produtos
-            self.exibir_dados(orcamento_produtos)
+        # Configuração da Tabela (model/view: only visible rows are formatted)
+        self.modelo = RegistrosTableModel(COLUNAS_RELATORIO)
+        self.modelo_agregados = RegistrosTableModel(COLUNAS_AGREGADOS)
+        self.tabela = criar_tabela(self.modelo)
+
+        self.sem_vendas = QtWidgets.QLabel("Nenhuma venda registrada.")
+        layout.addWidget(self.sem_vendas)
+
+        # Running totals, updated as sales arrive
+        self.totais_label = QtWidgets.QLabel()
+        self.totais_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+
+        self.exibir_dados(vendas)
 
         layout.addWidget(self.tabela)
+        layout.addWidget(self.totais_label)
         self.setLayout(layout)
 
     def exibir_dados(self, dados):
-        self.tabela.setRowCount(len(dados))
-        for row, produto in enumerate(dados):
-            descricao = produto["descricao"]
-            quantidade = produto["quantidade"]
-            vlr_m = produto["vl_m"]
-            total = produto["total"]
-            lucro = produto["lucro"]
-
-            # Preenche os dados na tabela
-            self.tabela.setItem(row, 0, QtWidgets.QTableWidgetItem(descricao))
-            self.tabela.setItem(row, 1, QtWidgets.QTableWidgetItem(str(quantidade)))
-            self.tabela.setItem(row, 2, QtWidgets.QTableWidgetItem(f"R$ {vlr_m:.2f}"))  # Display value per meter
-            self.tabela.setItem(row, 3, QtWidgets.QTableWidgetItem(f"R$ {vlr_m:.2f}"))  # Display unit price (selling price)
-            self.tabela.setItem(row, 4, QtWidgets.QTableWidgetItem(f"R$ {total:.2f}"))  # Display total
-            self.tabela.setItem(row, 5, QtWidgets.QTableWidgetItem(f"R$ {lucro:.2f}"))  # Display profit
+        self.modelo.redefinir(dados)
+        self.total_quantidade = 0
+        self.total_faturamento = 0  # Centavos, so the running sums stay exact
+        self.total_lucro = 0
+        if self.agregados is not None and self.agregados.vendas == len(dados):
+            # Every sale is in exactly one month: the saved totals spare decoding the whole history
+            for valores in self.agregados.grupos["mes"].values():
+                self.total_quantidade += valores[QUANTIDADE]
+                self.total_faturamento += valores[TOTAL]
+                self.total_lucro += valores[LUCRO]
+            self.somar_totais([])
+        else:
+            self.somar_totais(dados)
+
+    def adicionar_vendas(self, vendas, historico):
+        """Show sales the history (historico, the store's live sequence) already received."""
+        self.modelo.exibir_acrescimos(historico)
+        self.somar_totais(vendas)
+        if self.agrupamento_combobox.currentData() is not None:
+            self.atualizar_agrupamento()  # The shared totals already include these sales
+
+    def atualizar_agrupamento(self):
+        """Show the raw sales or the totals of the chosen grouping."""
+        dimensao = self.agrupamento_combobox.currentData()
+        if dimensao is None:
+            self.tabela.setModel(self.modelo)
+        else:
+            self.modelo_agregados.redefinir(self.agregados.linhas(dimensao))
+            self.tabela.setModel(self.modelo_agregados)
+
+    def somar_totais(self, vendas):
+        for venda in vendas:
+            self.total_quantidade += int(venda["quantidade"])
+            self.total_faturamento += centavos(venda["total"])
+            self.total_lucro += centavos(venda.get("lucro", 0))
+        self.sem_vendas.setVisible(not self.modelo.linhas)
+        self.totais_label.setText(f"Quantidade: {self.total_quantidade}    "
+                                  f"Faturamento: {formatar(self.total_faturamento)}    "
+                                  f"Lucro: {formatar(self.total_lucro)}")
+
+COLUNAS_REPRECIFICACAO = [
+    ("PRODUTO", lambda r: rotulo_produto(r[0])),
+    ("CUSTO/M³ ANTES", lambda r: formatar(centavos(r[0]["custo_m3"]))),
+    ("CUSTO/M³ DEPOIS", lambda r: formatar(centavos(r[1]["custo_m3"]))),
+    ("LUCRO/M ANTES", lambda r: "-" if r[2] is None else formatar(r[2])),  # "-" when the product was never sold
+    ("LUCRO/M DEPOIS", lambda r: "-" if r[3] is None else formatar(r[3])),
+]
+
+class ReprecificacaoDialog(QtWidgets.QDialog):
+    """Reprice every product of a wood type at once, with a before/after profit preview."""
+    def __init__(self, nucleo, precos_venda):
+        super().__init__()
+        self.setWindowTitle("Reajustar Preços por Madeira")
+        self.setGeometry(200, 200, 1000, 500)
+        self.nucleo = nucleo
+        self.catalogo = catalogo = nucleo.catalogo
+        self.precos_venda = precos_venda  # Product label -> last selling price per meter
+        self.previa = []
+
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.madeira_combobox = QtWidgets.QComboBox()
+        self.madeira_combobox.addItems(catalogo.madeiras())
+        layout.addWidget(self.madeira_combobox)
+
+        modo_layout = QtWidgets.QHBoxLayout()
+        self.modo_percentual = QtWidgets.QRadioButton("Reajuste (%)")
+        self.modo_percentual.setChecked(True)
+        self.modo_custo = QtWidgets.QRadioButton("Novo Custo por Metro Cúbico")
+        modo_layout.addWidget(self.modo_percentual)
+        modo_layout.addWidget(self.modo_custo)
+        layout.addLayout(modo_layout)
+
+        self.valor_entry = QtWidgets.QLineEdit()
+        self.valor_entry.setPlaceholderText("Ex.: 8 para +8%, -5 para -5%")
+        layout.addWidget(self.valor_entry)
+
+        self.btn_previa = QtWidgets.QPushButton("Pré-visualizar")
+        self.btn_previa.clicked.connect(self.atualizar_previa)
+        layout.addWidget(self.btn_previa)
+
+        self.modelo = RegistrosTableModel(COLUNAS_REPRECIFICACAO)
+        layout.addWidget(criar_tabela(self.modelo))
+
+        self.resumo_label = QtWidgets.QLabel()
+        layout.addWidget(self.resumo_label)
+
+        self.btn_aplicar = QtWidgets.QPushButton("Aplicar Reajuste")
+        self.btn_aplicar.clicked.connect(self.aplicar)
+        layout.addWidget(self.btn_aplicar)
+
+        self.setLayout(layout)
+
+    def atualizar_previa(self):
+        """Recompute the preview for the chosen wood type; nothing is saved."""
+        try:
+            valor = float(self.valor_entry.text().replace(',', '.'))
+            if self.modo_custo.isChecked() and valor <= 0:
+                raise ValueError("o custo deve ser maior que zero")
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Erro", f"Entrada inválida: {e}")
+            return False
+
+        if self.modo_percentual.isChecked():
+            self.previa = self.catalogo.previa_reprecificacao(self.madeira_combobox.currentText(), percentual=valor,
+                                                              precos_venda=self.precos_venda)
+        else:
+            self.previa = self.catalogo.previa_reprecificacao(self.madeira_combobox.currentText(), custo_m3=valor,
+                                                              precos_venda=self.precos_venda)
+        self.modelo.redefinir(self.previa)
+
+        vendidos = [linha for linha in self.previa if linha[2] is not None]
+        self.resumo_label.setText(f"{len(self.previa)} produto(s). Lucro por metro somado "
+                                  f"(produtos já vendidos): {formatar(sum(linha[2] for linha in vendidos))} → "
+                                  f"{formatar(sum(linha[3] for linha in vendidos))}")
+        return True
+
+    def aplicar(self):
+        if not self.atualizar_previa():
+            return
+        if not self.previa:
+            QtWidgets.QMessageBox.warning(self, "Erro", "Nenhum produto com custo cadastrado para esta madeira!")
+            return
+
+        reply = QtWidgets.QMessageBox.question(self, 'Confirmar Reajuste',
+                                               f"Reajustar {len(self.previa)} produto(s) de "
+                                               f"'{self.madeira_combobox.currentText()}'?",
+                                               QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                                               QtWidgets.QMessageBox.No)
+        if reply == QtWidgets.QMessageBox.Yes:
+            # Single write: one journal entry (or one SQLite transaction) for the whole wood type
+            try:
+                self.nucleo.atualizar_produtos([(produto, novo) for produto, novo, _, _ in self.previa])
+            except ValueError as e:  # Also raised when the server is unreachable
+                QtWidgets.QMessageBox.warning(self, "Erro", str(e))
+                return
+            QtWidgets.QMessageBox.information(self, "Sucesso", f"{len(self.previa)} produto(s) reajustado(s)!")
+            self.accept()
+
+class TicketWorkerSinais(QtCore.QObject):
+    progresso = QtCore.pyqtSignal(str, int, int)  # nome_pdf, item atual, total de itens
+    concluido = QtCore.pyqtSignal(object, str)  # ticket, nome_pdf
+    erro = QtCore.pyqtSignal(str, str)  # nome_pdf, mensagem
+
+class TicketWorker(QtCore.QRunnable):
+    """Renders a ticket snapshot to PDF on a QThreadPool thread."""
+    def __init__(self, ticket, nome_pdf):
+        super().__init__()
+        self.ticket = ticket
+        self.nome_pdf = nome_pdf
+        self.sinais = TicketWorkerSinais()
+
+    def run(self):
+        from ticket import renderizar_ticket  # Already loaded by gerar_pdf
+        try:
+            renderizar_ticket(self.ticket, self.nome_pdf,
+                              lambda atual, total: self.sinais.progresso.emit(self.nome_pdf, atual, total))
+        except Exception as e:
+            self.sinais.erro.emit(self.nome_pdf, str(e))
+        else:
+            self.sinais.concluido.emit(self.ticket, self.nome_pdf)
+
+class RecarregamentoWorkerSinais(QtCore.QObject):
+    concluido = QtCore.pyqtSignal(object, int)  # armazenamento recarregado, gravações quando a leitura começou
+    erro = QtCore.pyqtSignal(str)
+
+class RecarregamentoWorker(QtCore.QRunnable):
+    """Reads the whole data file again on a QThreadPool thread, after another instance compacted it."""
+    def __init__(self, armazenamento):
+        super().__init__()
+        self.armazenamento = armazenamento
+        self.gravacoes = armazenamento.gravacoes
+        self.sinais = RecarregamentoWorkerSinais()
+
+    def run(self):
+        try:
+            recarregado = self.armazenamento.recarregado()  # A separate object: the live one is untouched
+        except Exception as e:
+            self.sinais.erro.emit(str(e))
+        else:
+            self.sinais.concluido.emit(recarregado, self.gravacoes)
+
+class ObservadorDados(QtCore.QObject):
+    """Brings in what other instances saved to the shared data (file or server) and signals what changed.
+
+    Appended journal lines are applied right away; after another instance
+    compacts the file, the data is read again in the background and only the
+    collections that differ are swapped.
+    """
+    produtos_alterados = QtCore.pyqtSignal(object, object)  # old, new records (both None: whole list reloaded)
+    clientes_alterados = QtCore.pyqtSignal(object, object)
+    vendas_adicionadas = QtCore.pyqtSignal(list)
+    erro = QtCore.pyqtSignal(str)
+
+    def __init__(self, nucleo, parent=None):
+        super().__init__(parent)
+        self.nucleo = nucleo
+        self.recarregando = False
+        self.nucleo.alteracoes_pendentes()  # Everything loaded so far is already on screen
+
+        self.atraso = QtCore.QTimer(self)
+        self.atraso.setSingleShot(True)
+        self.atraso.setInterval(ATRASO_SINCRONIZACAO_MS)
+        self.atraso.timeout.connect(self.verificar)
+
+        self.arquivos = []
+        if hasattr(nucleo.armazenamento, "arquivos_observados"):
+            self.arquivos = [os.path.abspath(arquivo) for arquivo in nucleo.armazenamento.arquivos_observados()]
+            self.watcher = QtCore.QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.agendar)
+            self.watcher.directoryChanged.connect(self.agendar)  # Files created or replaced (compaction)
+            self.watcher.addPath(os.path.dirname(self.arquivos[0]))
+            self.observar_arquivos()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.verificar)
+        self.timer.start(INTERVALO_SINCRONIZACAO_MS)
+
+    def observar_arquivos(self):
+        # A file replaced by os.replace stops being watched, so the paths are added again after each event
+        faltando = [arquivo for arquivo in self.arquivos if arquivo not in self.watcher.files() and os.path.exists(arquivo)]
+        if faltando:
+            self.watcher.addPaths(faltando)
+
+    def agendar(self, caminho=None):
+        if self.arquivos:
+            self.observar_arquivos()
+        self.atraso.start()
+
+    def verificar(self):
+        if self.recarregando:
+            return
+        try:
+            em_dia = self.nucleo.sincronizar()
+        except (OSError, ValueError) as e:
+            self.erro.emit(str(e))
+            return
+        if not em_dia:
+            self.recarregando = True
+            worker = RecarregamentoWorker(self.nucleo.armazenamento)
+            worker.sinais.concluido.connect(self.adotar)
+            worker.sinais.erro.connect(self.falha_recarregamento)
+            QtCore.QThreadPool.globalInstance().start(worker)
+        self.emitir()
+
+    def adotar(self, recarregado, gravacoes):
+        self.recarregando = False
+        if not self.nucleo.adotar(recarregado, gravacoes):
+            self.agendar()  # This instance saved something meanwhile: read again
+        self.emitir()
+
+    def falha_recarregamento(self, mensagem):
+        self.recarregando = False
+        self.erro.emit(mensagem)
+
+    def emitir(self):
+        for colecao, antigos, novos in self.nucleo.alteracoes_pendentes():
+            if colecao == "produtos":
+                self.produtos_alterados.emit(antigos, novos)
+            elif colecao == "clientes":
+                self.clientes_alterados.emit(antigos, novos)
+            elif novos is not None:
+                self.vendas_adicionadas.emit(novos)
 
 class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
-    # Define a signal to notify when a sale is added
-    sale_added = QtCore.pyqtSignal()
+    # Define a signal to notify when sales are committed (carries the new sale records)
+    sale_added = QtCore.pyqtSignal(list)
 
     def __init__(self):
         super().__init__()
@@ -209,6 +608,14 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.clientes = []
         self.orcamento_produtos = []  # List to hold products added to the budget
         self.arquivo_dados = "dados.json"
+        self.nucleo = criar_nucleo(self.arquivo_dados)  # Business rules (local or on the server); the slots only handle widgets
+        self.armazenamento = self.nucleo.armazenamento
+        self.catalogo = self.nucleo.catalogo
+        self.relatorios = self.nucleo.relatorios
+        self.produto_em_edicao = None  # Product loaded in the form by edit_product
+        self.cliente_em_edicao = None  # Client loaded in the form by edit_client
+        self.numero_ticket = 0  # Sequence used to give each ticket PDF its own file name
+        self.tickets_pendentes = 0  # Tickets queued or rendering in the background
 
         # Create interfaces
         self.criar_interface_produtos()
@@ -218,6 +625,13 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         # Load saved data
         self.carregar_dados()
 
+        # Changes saved by other instances (same data file or same server)
+        self.observador = ObservadorDados(self.nucleo, self)
+        self.observador.produtos_alterados.connect(self.atualizar_produtos_externos)
+        self.observador.clientes_alterados.connect(self.atualizar_clientes_externos)
+        self.observador.erro.connect(lambda mensagem: self.statusBar().showMessage(
+            f"Não foi possível atualizar os dados: {mensagem}", 5000))
+
         # Set style
         self.setStyleSheet("""
             QMainWindow {
@@ -319,6 +733,16 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.btn_mostrar_produtos.clicked.connect(self.mostrar_produtos_registrados)
         layout.addWidget(self.btn_mostrar_produtos)
 
+        # Button to reprice all products of a wood type
+        self.btn_reprecificar = QtWidgets.QPushButton("Reajustar Preços por Madeira")
+        self.btn_reprecificar.clicked.connect(self.reprecificar_madeira)
+        layout.addWidget(self.btn_reprecificar)
+
+        # Button to import a supplier price list
+        self.btn_importar_produtos = QtWidgets.QPushButton("Importar Produtos (CSV/XLSX)")
+        self.btn_importar_produtos.clicked.connect(lambda: self.importar_planilha("produtos"))
+        layout.addWidget(self.btn_importar_produtos)
+
         # Stretch to fill space
         layout.addStretch()
 
@@ -326,24 +750,15 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         """Calcula e exibe o lucro baseado no custo e no valor de venda."""
         try:
             vlr_m = float(self.produto_vlr_m.text())  # Custo por metro cúbico
-            largura = float(self.produto_largura.text()) / 100  # Convertendo para metros
-            espessura = float(self.produto_espessura.text()) / 100  # Convertendo para metros
-
-            # Calcular a área da seção transversal
-            area = largura * espessura  # Área em metros quadrados
-
-            # Calcular o volume de 1 metro linear
-            volume_linear = area * 1  # Volume em metros cúbicos para 1 metro linear
-
-            # Calcular o custo do metro linear
-            custo_metro_linear = volume_linear * vlr_m  # Custo por metro linear
+            largura = float(self.produto_largura.text())  # Em cm
+            espessura = float(self.produto_espessura.text())  # Em cm
 
             # Obter o valor de venda
             vlr_venda = float(self.produto_venda.text())
 
-            # Calcular lucro
-            lucro = vlr_venda - custo_metro_linear
-            self.lucro_label.setText(f"Lucro: R$ {lucro:.2f}")
+            # Lucro de 1 metro linear (1 peça de 1000 mm), em centavos
+            _, _, lucro = calcular_linha(custo_por_metro(largura, espessura, vlr_m), 1000, 1, centavos(vlr_venda))
+            self.lucro_label.setText(f"Lucro: {formatar(lucro)}")
         except ValueError:
             self.lucro_label.setText("Lucro: R$ 0.00")  # Reset if input is invalid
 
@@ -397,6 +812,11 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.btn_mostrar_clientes.clicked.connect(self.mostrar_clientes_registrados)
         layout.addWidget(self.btn_mostrar_clientes)
 
+        # Button to import a customer list
+        self.btn_importar_clientes = QtWidgets.QPushButton("Importar Clientes (CSV/XLSX)")
+        self.btn_importar_clientes.clicked.connect(lambda: self.importar_planilha("clientes"))
+        layout.addWidget(self.btn_importar_clientes)
+
         # Stretch to fill space
         layout.addStretch()
 
@@ -448,6 +868,7 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.produto_combobox = QtWidgets.QComboBox()
         self.produto_combobox.setEditable(True)  # Make it editable
         self.produto_combobox.setPlaceholderText("Selecione um Produto")
+        instalar_busca(self.produto_combobox, self.catalogo.buscar_produtos)
         layout.addWidget(self.produto_combobox)
 
         # Size input
@@ -467,10 +888,8 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         layout.addWidget(self.btn_adicionar_orcamento)
 
         # List to display added products
-        self.produtos_adicionados_list = QtWidgets.QTableWidget()
-        self.produtos_adicionados_list.setColumnCount(6)
-        self.produtos_adicionados_list.setHorizontalHeaderLabels(["PRODUTO", "QUANTIDADE", "VALOR POR METRO", "VALOR UNITÁRIO", "VALOR TOTAL", "LUCRO"])
-        self.produtos_adicionados_list.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.orcamento_model = RegistrosTableModel(COLUNAS_ORCAMENTO)
+        self.produtos_adicionados_list = criar_tabela(self.orcamento_model)
         layout.addWidget(self.produtos_adicionados_list)
 
         # Button to remove selected product from budget
@@ -487,6 +906,7 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.cliente_combobox = QtWidgets.QComboBox()
         self.cliente_combobox.setEditable(True)  # Make it editable
         self.cliente_combobox.setPlaceholderText("Selecione um cliente")
+        instalar_busca(self.cliente_combobox, self.catalogo.buscar_clientes)
         layout.addWidget(self.cliente_combobox)
 
         # Vendor entry (set to "EVERSON OLSEN" and disabled)
@@ -526,34 +946,110 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         self.cliente_combobox.addItems([cliente["nome"] for cliente in self.clientes])
 
     def carregar_dados(self):
-        """Carrega os dados de produtos e clientes do arquivo JSON."""
-        if os.path.exists(self.arquivo_dados):
-            with open(self.arquivo_dados, 'r') as arquivo:
-                dados = json.load(arquivo)
-                self.produtos = dados.get("produtos", [])
-                self.clientes = dados.get("clientes", [])
-        
+        """Carrega os dados de produtos e clientes (snapshot JSON + journal)."""
+        self.nucleo.carregar()  # The budget left over from the last session is discarded here
+        self.produtos = self.catalogo.produtos
+        self.clientes = self.catalogo.clientes
+        self.orcamento_produtos = self.nucleo.orcamento_produtos
+        self.orcamento_model.redefinir(self.orcamento_produtos)
+
         # Atualizar as listas e comboboxes
         self.atualizar_combobox_orcamento()
         self.atualizar_combobox_clientes()
-
-        # Populate the product ComboBox
-        self.produto_combobox.clear()
-        self.produto_combobox.addItems([f"{produto['descricao']} - {produto['largura']} X {produto['espessura']} - {produto['madeira']}" for produto in self.produtos])
+        QtCore.QTimer.singleShot(0, self.catalogo.preparar_busca)  # Build the search index once the UI is idle
+
+    def atualizar_produtos_externos(self, antigos, novos):
+        """Apply products changed by another instance to the combobox and to the product being edited."""
+        self.produtos = self.catalogo.produtos  # A reload replaces the list
+        if self.produto_em_edicao is not None:
+            self.produto_em_edicao = self.catalogo.produto_por_id(self.produto_em_edicao["id"])
+        self.atualizar_itens(self.produto_combobox, self.atualizar_combobox_orcamento, antigos, novos, rotulo_produto)
+        if antigos is None:
+            QtCore.QTimer.singleShot(0, self.catalogo.preparar_busca)
+
+    def atualizar_clientes_externos(self, antigos, novos):
+        """Apply clients changed by another instance to the combobox and to the client being edited."""
+        self.clientes = self.catalogo.clientes
+        if self.cliente_em_edicao is not None:
+            self.cliente_em_edicao = self.catalogo.cliente_atual(self.cliente_em_edicao)
+        self.atualizar_itens(self.cliente_combobox, self.atualizar_combobox_clientes, antigos, novos,
+                             lambda cliente: cliente["nome"])
+        if antigos is None:
+            QtCore.QTimer.singleShot(0, self.catalogo.preparar_busca)
+
+    def atualizar_itens(self, combobox, recarregar, antigos, novos, texto):
+        """Rename, add or remove only the changed entries; rebuild the list when it was reloaded or changed a lot."""
+        atual = combobox.currentText()
+        if antigos is None or len(antigos) + len(novos) > 200:
+            recarregar()
+            combobox.setCurrentText(atual)  # Keep what the user was typing
+            return
+        # Idempotent: with the server backend, this window's own changes come back here too
+        for antigo, novo in zip(antigos, novos):  # Updates: same position, new text
+            if combobox.findText(texto(novo), QtCore.Qt.MatchExactly) < 0:
+                substituir_item(combobox, texto(antigo), texto(novo))
+            elif texto(antigo) != texto(novo):
+                substituir_item(combobox, antigo=texto(antigo))
+        for antigo in antigos[len(novos):]:
+            substituir_item(combobox, antigo=texto(antigo))
+        for novo in novos[len(antigos):]:
+            if combobox.findText(texto(novo), QtCore.Qt.MatchExactly) < 0:
+                substituir_item(combobox, novo=texto(novo))
 
     def atualizar_combobox_orcamento(self):
         self.produto_combobox.clear()
         # Add only products to the combo box for budget
-        for produto in self.produtos:
-            if 'descricao' in produto and 'largura' in produto and 'espessura' in produto and 'madeira' in produto:
-                produto_nome = f"{produto['descricao']} - {produto['largura']} X {produto['espessura']} - {produto['madeira']}"
-                self.produto_combobox.addItem(produto_nome)
+        self.produto_combobox.addItems(self.catalogo.rotulos_produtos())
 
     def mostrar_produtos_registrados(self):
         """Show all registered products in a new window."""
         dialog = ProdutosDialog(self.produtos, self.edit_product, self.delete_product)
         dialog.exec_()  # Open the dialog
 
+    def reprecificar_madeira(self):
+        """Open the bulk repricing dialog; the preview uses each product's last selling price."""
+        precos_venda = {venda["descricao"]: venda["vl_m"] for venda in self.armazenamento.dados["vendas"] if "vl_m" in venda}
+        dialog = ReprecificacaoDialog(self.nucleo, precos_venda)
+        if dialog.exec_():
+            if self.produto_em_edicao is not None:
+                # The edited product was replaced by its repriced copy
+                self.produto_em_edicao = self.catalogo.produto_por_id(self.produto_em_edicao["id"])
+            self.atualizar_combobox_orcamento()
+
+    def importar_planilha(self, tipo):
+        """Import products or clients from a spreadsheet, saving all accepted rows at once."""
+        arquivo, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Importar Planilha", "",
+                                                           "Planilhas (*.csv *.xlsx);;Todos os arquivos (*)")
+        if not arquivo:
+            return
+
+        from importacao import importar
+
+        def progresso(lidas):
+            self.statusBar().showMessage(f"Importando {tipo}: {lidas} linhas lidas...")
+            QtWidgets.QApplication.processEvents()
+
+        try:
+            resultado = importar(self.catalogo, tipo, arquivo, progresso=progresso, destino=self.nucleo)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self, "Erro", f"Não foi possível importar a planilha: {e}")
+            return
+
+        if tipo == "produtos":
+            self.atualizar_combobox_orcamento()
+        else:
+            self.atualizar_combobox_clientes()
+
+        mensagem = QtWidgets.QMessageBox(self)
+        mensagem.setWindowTitle("Importação Concluída")
+        mensagem.setText(f"{resultado.importados} de {resultado.lidos} linhas importadas em "
+                         f"{resultado.segundos:.2f} s ({resultado.lidos / max(resultado.segundos, 1e-9):.0f} linhas/s).\n"
+                         f"{len(resultado.rejeitados)} linhas rejeitadas.")
+        if resultado.rejeitados:
+            mensagem.setDetailedText("\n".join(f"Linha {numero}: {motivo}" for numero, motivo in resultado.rejeitados))
+        mensagem.exec_()
+        self.statusBar().clearMessage()
+
     def mostrar_clientes_registrados(self):
         """Show all registered clients in a new window."""
         dialog = ClientesDialog(self.clientes, self.edit_client, self.delete_client)
@@ -562,58 +1058,60 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
     def edit_product(self, product_name):
         """Edit the selected product."""
         # Find the product and populate the fields for editing
-        for produto in self.produtos:
-            if produto["descricao"] == product_name.split(" - ")[0]:  # Match only the description part
-                self.produto_desc.setText(produto["descricao"])
-                self.produto_madeira.setText(produto.get("madeira", ""))  # Get the wood type
-                self.produto_largura.setText(str(produto.get("largura", "")))  # Get the width
-                self.produto_espessura.setText(str(produto.get("espessura", "")))  # Get the thickness
-                self.produto_vlr_m.setText(str(produto.get("vl_m", "")))  # Get the value per cubic meter
-                break
+        produto = self.catalogo.produto_por_rotulo(product_name)
+        if produto is None:
+            return
+
+        self.produto_em_edicao = produto  # "Registrar Produto" now updates this product
+        self.produto_desc.setText(produto["descricao"])
+        self.produto_madeira.setText(produto.get("madeira", ""))  # Get the wood type
+        self.produto_largura.setText(str(produto.get("largura", "")))  # Get the width
+        self.produto_espessura.setText(str(produto.get("espessura", "")))  # Get the thickness
+        self.produto_vlr_m.setText(str(produto.get("custo_m3", produto.get("vl_m", ""))))  # Get the cost per cubic meter
 
     def delete_product(self, product_name):
         """Delete the selected product."""
-        # Extract the description, width, thickness, and wood type from the selected product name
-        selected_product_parts = product_name.split(" - ")
-        if len(selected_product_parts) < 3:
-            return  # Invalid format, do nothing
-
-        descricao = selected_product_parts[0]
-        largura_espessura = selected_product_parts[1].split(" X ")
-        if len(largura_espessura) < 2:
-            return  # Invalid format, do nothing
-
-        largura = float(largura_espessura[0])
-        espessura = float(largura_espessura[1])
-        madeira = selected_product_parts[2]
-
-        # Filter the products based on all attributes
-        self.produtos = [produto for produto in self.produtos if not (
-            produto["descricao"] == descricao and
-            produto["largura"] == largura and
-            produto["espessura"] == espessura and
-            produto["madeira"] == madeira
-        )]
-
-        self.salvar_dados()
+        produto = self.catalogo.produto_por_rotulo(product_name)
+        if produto is None:
+            return
+
+        try:
+            self.nucleo.remover_produto(produto)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Erro", str(e))
+            return
+        if self.produto_em_edicao is produto:
+            self.produto_em_edicao = None
+        substituir_item(self.produto_combobox, antigo=product_name)
 
     def edit_client(self, client_name):
         """Edit the selected client."""
         # Find the client and populate the fields for editing
-        for cliente in self.clientes:
-            if cliente["nome"] == client_name:
-                self.cliente_nome.setText(cliente["nome"])
-                self.cliente_cpf.setText(cliente["cpf_cnpj"])
-                self.cliente_endereco.setText(cliente["endereco"])
-                self.cliente_cidade.setText(cliente["cidade"])
-                self.cliente_telefone.setText(cliente["telefone"])
-                break
+        cliente = self.catalogo.cliente_por_nome(client_name)
+        if cliente is None:
+            return
+
+        self.cliente_em_edicao = cliente  # "Registrar Cliente" now updates this client
+        self.cliente_nome.setText(cliente["nome"])
+        self.cliente_cpf.setText(cliente["cpf_cnpj"])
+        self.cliente_endereco.setText(cliente["endereco"])
+        self.cliente_cidade.setText(cliente["cidade"])
+        self.cliente_telefone.setText(cliente["telefone"])
 
     def delete_client(self, client_name):
         """Delete the selected client."""
-        self.clientes = [cliente for cliente in self.clientes if cliente["nome"] != client_name]
-        self.salvar_dados()
-        self.atualizar_combobox_clientes()  # Update the client combo box after deletion
+        cliente = self.catalogo.cliente_por_nome(client_name)
+        if cliente is None:
+            return
+
+        try:
+            self.nucleo.remover_cliente(cliente)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Erro", str(e))
+            return
+        if self.cliente_em_edicao is cliente:
+            self.cliente_em_edicao = None
+        substituir_item(self.cliente_combobox, antigo=client_name)  # Update the client combo box after deletion
 
     def adicionar_produto(self):
         descricao = self.produto_desc.text()
@@ -624,18 +1122,19 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
             vlr_m = float(self.produto_vlr_m.text())  # Get the cost per cubic meter
             largura = float(largura)  # Convert to float
             espessura = float(espessura)  # Convert to float
-            if not descricao or vlr_m <= 0 or largura <= 0 or espessura <= 0:
-                raise ValueError("Preencha os campos corretamente!")
-
-            self.produtos.append({"descricao": descricao, "madeira": madeira, "largura": largura, "espessura": espessura})  # Store description, wood type, width, thickness
-            self.atualizar_combobox_orcamento()
+            novo_produto = {"descricao": descricao, "madeira": madeira, "largura": largura, "espessura": espessura, "custo_m3": vlr_m}  # Store description, wood type, width, thickness, cost per m³
+            self.nucleo.registrar_produto(novo_produto, self.produto_em_edicao)
+            if self.produto_em_edicao is not None:
+                substituir_item(self.produto_combobox, rotulo_produto(self.produto_em_edicao), rotulo_produto(novo_produto))
+                self.produto_em_edicao = None
+            else:
+                substituir_item(self.produto_combobox, novo=rotulo_produto(novo_produto))
             self.produto_desc.clear()
             self.produto_madeira.clear()
             self.produto_largura.clear()
             self.produto_espessura.clear()
             self.produto_vlr_m.clear()  # Clear cost per cubic meter input
 
-            self.salvar_dados()
             QtWidgets.QMessageBox.information(self, "Sucesso", "Produto adicionado com sucesso!")
         except ValueError as e:
             QtWidgets.QMessageBox.warning(self, "Erro", f"Entrada inválida: {e}")
@@ -647,324 +1146,149 @@ class SistemaOrcamentoMadeireira(QtWidgets.QMainWindow):
         cidade = self.cliente_cidade.text()
         telefone = self.cliente_telefone.text()
 
-        if not nome or not cpf or not endereco or not cidade or not telefone:
-            QtWidgets.QMessageBox.warning(self, "Erro", "Preencha todos os campos para adicionar um cliente!")
-            return
-
-        # Validate name (allow spaces)
-        if not all(char.isalpha() or char.isspace() for char in nome):
-            QtWidgets.QMessageBox.warning(self, "Erro", "O nome não pode conter números ou símbolos!")
-            return
-
-        # Validate CPF ou CNPJ
-        if self.radio_cpf.isChecked():
-            if not cpf.isdigit() or len(cpf) != 11:
-                QtWidgets.QMessageBox.warning(self, "Erro", "CPF deve conter apenas números e ter 11 dígitos!")
-                return
-        elif self.radio_cnpj.isChecked():
-            if not cpf.isdigit() or len(cpf) != 14:
-                QtWidgets.QMessageBox.warning(self, "Erro", "CNPJ deve conter apenas números e ter 14 dígitos!")
-                return
-
-        # Validate phone (only digits)
-        if not telefone.isdigit():
-            QtWidgets.QMessageBox.warning(self, "Erro", "Telefone deve conter apenas números!")
-            return
-
-        self.clientes.append({
+        novo_cliente = {
             "nome": nome,
             "cpf_cnpj": cpf,
             "endereco": endereco,
             "cidade": cidade,
             "telefone": telefone
-        })
-        
-        self.atualizar_combobox_orcamento()
+        }
+        try:
+            self.nucleo.registrar_cliente(novo_cliente, "CPF" if self.radio_cpf.isChecked() else "CNPJ",
+                                          self.cliente_em_edicao)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Erro", str(e))
+            return
+
+        if self.cliente_em_edicao is not None:
+            substituir_item(self.cliente_combobox, self.cliente_em_edicao["nome"], nome)
+            self.cliente_em_edicao = None
+        else:
+            substituir_item(self.cliente_combobox, novo=nome)  # Update the client combo box after adding
+
         self.cliente_nome.clear()
         self.cliente_cpf.clear()
         self.cliente_endereco.clear()
         self.cliente_cidade.clear()
         self.cliente_telefone.clear()
 
-        self.salvar_dados()
-        self.atualizar_combobox_clientes()  # Update the client combo box after adding
         QtWidgets.QMessageBox.information(self, "Sucesso", "Cliente adicionado com sucesso!")
 
     def adicionar_produto_orcamento(self):
         """Add selected product to the budget list."""
-        produto_desc = self.produto_combobox.currentText()
-        produto_tam = self.produto_tamanho.text().replace(',', '.')  # Replace comma with dot for float conversion
-        quantidade = self.quantidade_entry.text()
-
-        if not produto_desc or not produto_tam or not quantidade:
-            QtWidgets.QMessageBox.warning(self, "Erro", "Preencha todos os campos para adicionar um produto ao orçamento!")
-            return
-
-        # Validate size input
         try:
-            produto_tam = float(produto_tam)  # Convert to float to allow decimal values
-            quantidade = int(quantidade)  # Convert quantidade to int
-        except ValueError:
-            QtWidgets.QMessageBox.warning(self, "Erro", "O tamanho e a quantidade devem ser números válidos!")
+            # Pricing and validation live in the core; the selling price comes from the products tab
+            registro = self.nucleo.item_orcamento(self.produto_combobox.currentText(), self.produto_tamanho.text(),
+                                                  self.quantidade_entry.text(), self.produto_venda.text())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Erro", str(e))
             return
 
-        # Get the value per meter for the selected product
-        produto = next((p for p in self.produtos if p["descricao"] == produto_desc.split(" - ")[0]), None)  # Match only the description part
-        if produto:
-            vlr_m = float(self.produto_venda.text())  # Get the selling price per meter
-            valor_unitario = vlr_m * produto_tam  # Calculate the unit price based on selling price
-            total = valor_unitario * quantidade  # Calculate total based on quantity
-
-            # Calculate profit
-            lucro = (vlr_m - (vlr_m * (produto["largura"] * produto["espessura"] / 10000))) * produto_tam * quantidade  # Adjusted profit calculation
-
-            # Add product details to the list
-            row_position = self.produtos_adicionados_list.rowCount()
-            self.produtos_adicionados_list.insertRow(row_position)
-            self.produtos_adicionados_list.setItem(row_position, 0, QtWidgets.QTableWidgetItem(produto_desc))
-            self.produtos_adicionados_list.setItem(row_position, 1, QtWidgets.QTableWidgetItem(str(quantidade)))
-            self.produtos_adicionados_list.setItem(row_position, 2, QtWidgets.QTableWidgetItem(f"R$ {vlr_m:.2f}"))  # Display selling price
-            self.produtos_adicionados_list.setItem(row_position, 3, QtWidgets.QTableWidgetItem(f"R$ {valor_unitario:.2f}"))  # Display unit price
-            self.produtos_adicionados_list.setItem(row_position, 4, QtWidgets.QTableWidgetItem(f"R$ {total:.2f}"))  # Display total
-            self.produtos_adicionados_list.setItem(row_position, 5, QtWidgets.QTableWidgetItem(f"R$ {lucro:.2f}"))  # Display profit
-
-            self.orcamento_produtos.append({
-                "descricao": produto_desc,
-                "tamanho": produto_tam,
-                "quantidade": quantidade,
-                "vl_m": vlr_m,
-                "total": total,
-                "lucro": lucro  # Store calculated profit
-            })
-
-            # Clear inputs
-            self.produto_combobox.setCurrentIndex(-1)
-            self.produto_tamanho.clear()
-            self.quantidade_entry.clear()  # Clear quantity input
-
-            self.salvar_dados()
-
-            # Emit the signal after adding a product
-            self.sale_added.emit()
-        else:
-            QtWidgets.QMessageBox.warning(self, "Erro", "Produto não encontrado!")
+        # Add product details to the budget (the grid reads it through the model)
+        self.orcamento_model.adicionar(registro, self.nucleo.adicionar_item_orcamento)
+
+        # Clear inputs
+        self.produto_combobox.setCurrentIndex(-1)
+        self.produto_tamanho.clear()
+        self.quantidade_entry.clear()  # Clear quantity input
 
     def remover_produto_orcamento(self):
         """Remove selected product from the budget list."""
-        selected_items = self.produtos_adicionados_list.selectedItems()
-        if selected_items:
-            for item in selected_items:
-                row = self.produtos_adicionados_list.row(item)
-                self.produtos_adicionados_list.removeRow(row)  # Remove from list widget
-                del self.orcamento_produtos[row]  # Remove from the budget list
+        selected_rows = self.produtos_adicionados_list.selectionModel().selectedRows()
+        if selected_rows:
+            for row in sorted((index.row() for index in selected_rows), reverse=True):
+                # Remove from the budget list; the model updates the grid
+                self.orcamento_model.remover(row, self.nucleo.remover_item_orcamento)
         else:
             QtWidgets.QMessageBox.warning(self, "Erro", "Selecione um produto para remover!")
 
     def gerar_pdf(self):
         try:
-            # Coletar dados do cliente
-            cliente_nome = self.cliente_combobox.currentText()  # Get selected client from combo box
-            cliente = next((c for c in self.clientes if c["nome"] == cliente_nome), None)
-
-            if cliente is None:
-                QtWidgets.QMessageBox.warning(self, "Erro", "Selecione um cliente válido!")
+            # Snapshot of the selected client and the budget (loads fpdf on first use)
+            try:
+                ticket = self.nucleo.criar_ticket(self.cliente_combobox.currentText(), self.vendedor_entry.text(),
+                                                  self.forma_pagamento_entry.text(), self.condicao_pagamento_entry.text())
+            except ValueError as e:
+                QtWidgets.QMessageBox.warning(self, "Erro", str(e))
                 return
 
-            cliente_endereco = cliente["endereco"]
-            cliente_cidade = cliente["cidade"]
-            cliente_cpf = cliente["cpf_cnpj"]
-            cliente_telefone = cliente["telefone"]
-
-            # Criar PDF
-            pdf = FPDF(orientation='L', unit='mm', format=(500, 350))  # Landscape orientation
-            pdf.add_page()
-            pdf.set_font("Arial", size=10)
-
-            # Cabeçalho
-            pdf.set_font("Arial", style="B", size=12)
-            pdf.cell(0, 5, "TICKET DE VENDA", ln=True, align="C")
-            pdf.set_font("Arial", size=10)
-            pdf.cell(0, 5, "TIGELA MADEIRAS E ARTEFATOS LTDA", ln=True, align="C")
-            pdf.cell(0, 5, "TIGELA MADEIREIRA E ARTEFATOS", ln=True, align="C")
-            pdf.cell(0, 5, "Telefone: (44) 9754-8463 - Celular:", ln=True, align="C")
-            pdf.cell(0, 5, "Endereco: AVENIDA BRASIL, No 1621, DISTRITO CASA BRANCA, XAMBRE - PR", ln=True, align="C")
-            pdf.cell(0, 5, "CNPJ: 39.594.567/0001-79    IE: 9086731905", ln=True, align="C")
-            pdf.ln(5)
-
-            # Dados do cliente
-            pdf.set_font("Arial", style="", size=10)
-            pdf.cell(0, 5, f"Cliente: {cliente_nome}", ln=True)
-            pdf.cell(0, 5, f"Endereco: {cliente_endereco}", ln=True)
-            pdf.cell(0, 5, f"Cidade: {cliente_cidade}", ln=True)
-            pdf.cell(0, 5, f"CPF/CNPJ: {cliente_cpf}", ln=True)
-            pdf.cell(0, 5, f"Telefone: {cliente_telefone}", ln=True)
-            pdf.ln(5)
-
-            pdf.set_fill_color(200, 200, 200)
-            pdf.cell(10, 7, txt="N\u00ba", border=1, align="C", fill=True)
-            pdf.cell(80, 7, txt="Produto", border=1, align="C", fill=True)
-            pdf.cell(30, 7, txt="Un. Com.", border=1, align="C", fill=True)  # Add "Un. Com." column
-            pdf.cell(30, 7, txt="Vlr. Frete", border=1, align="C", fill=True)
-            pdf.cell(30, 7, txt="Vlr. Outros", border=1, align="C", fill=True)
-            pdf.cell(30, 7, txt="Vlr. Seguro", border=1, align="C", fill=True)
-            pdf.cell(20, 7, txt="Qtd", border=1, align="C", fill=True)  # Quantity
-            pdf.cell(20, 7, txt="Vlr. M.", border=1, align="C", fill=True)  # Add "Vlr. M." column
-            pdf.cell(30, 7, txt="Vlr UN.", border=1, align="C", fill=True)  # Unit Price
-            pdf.cell(30, 7, txt="Vlr Total", border=1, align="C", fill=True)  # Total
-            pdf.ln()
-
-            total_final = 0  # Initialize total
-
-            # Loop through added products and add to PDF
-            for index, produto in enumerate(self.orcamento_produtos):
-                produto_desc = produto["descricao"]
-                produto_tam = produto["tamanho"]
-                quantidade = produto["quantidade"]
-                vlr_m = produto["vl_m"]
-                valor_unitario = vlr_m * produto_tam  # Calculate unit price
-                total = int(quantidade) * valor_unitario  # Calculate total based on quantity and unit price
-
-                # Preenchendo produtos com o novo formato
-                pdf.cell(10, 7, txt=str(index + 1), border=1, align="C")
-                pdf.cell(80, 7, txt=f"{produto_desc} - {produto_tam}M", border=1, align="L")  # Concatenate description and size
-                pdf.cell(30, 7, txt="UNID", border=1, align="C")  # Display "Un. Com."
-                pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
-                pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
-                pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
-                pdf.cell(20, 7, txt=str(quantidade), border=1, align="C")  # Display quantity
-                pdf.cell(20, 7, txt=f"R$ {vlr_m:.2f}", border=1, align="C")  # Display value per meter
-                pdf.cell(30, 7, txt=f"R$ {valor_unitario:.2f}", border=1, align="C")  # Display calculated unit price
-                pdf.cell(30, 7, txt=f"R$ {total:.2f}", border=1, align="C")  # Display total
-                pdf.ln(10)
-
-                total_final += total  # Add to final total
-
-            # Totais e informações adicionais
-            pdf.cell(17, 5, txt=f"Vendedor:", border=0, align="L")
-            pdf.cell(29, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"{self.vendedor_entry.text()}", border=0, align="L")
-            pdf.cell(130, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"Outros:", border=0, align="L")
-            pdf.cell(30, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.cell(30, 5, txt=f"Total:", border=0, align="L")  # Total at the end
-            pdf.cell(10, 5, txt=f"R$ {total_final:.2f}", border=0, align="L")  # Total after discount
-            pdf.ln(6)
-
-            pdf.cell(36, 5, txt=f"Forma de Pagamento:", border=0, align="L")
-            pdf.cell(10, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"{self.forma_pagamento_entry.text()}", border=0, align="L")
-            pdf.cell(130, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"Seguro:", border=0, align="L")
-            pdf.cell(30, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.cell(30, 5, txt=f"Acréscimos:", border=0, align="L")  # Total at the end
-            pdf.cell(10, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.ln(6)
-
-            pdf.cell(36, 5, txt=f"Condição de Pagamento:", border=0, align="L")
-            pdf.cell(10, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"{self.condicao_pagamento_entry.text()}", border=0, align="L")
-            pdf.cell(130, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"Frete:", border=0, align="L")
-            pdf.cell(30, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.cell(30, 5, txt=f"Descontos:", border=0, align="L")  # Total at the end
-            pdf.cell(10, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.ln(6)
-
-            pdf.cell(43, 5, txt=f"Limite de Crédito Utilizado:", border=0, align="L")
-            pdf.cell(3, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"R$ 00.00", border=0, align="L")
-            pdf.cell(190, 5, txt="", border=0)  # Espaço vazio
-            pdf.cell(30, 5, txt=f"Total Líquido:", border=0, align="L")  # Total at the end
-            pdf.cell(10, 5, txt=f"R$ {total_final:.2f}", border=0, align="L")
-            pdf.ln(6)
-
-            pdf.set_font("Arial", style="B", size=10)
-            pdf.cell(40, 5, "Composição Pgto", border=0, align="L")
-            pdf.cell(30, 5, "Parcela", border=0, align="L")
-            pdf.cell(50, 5, "Numerário", border=0, align="L")
-            pdf.cell(30, 5, "Valor", border=0, align="L")
-            pdf.cell(30, 5, "Data Pgto", border=0, align="L")
-            pdf.ln()
-            
-            pdf.set_font("Arial", size=10)
-            pdf.cell(40, 5, "", border=0, align="L")  # Empty space for "Composição Pgto"
-            pdf.cell(30, 5, "1", border=0, align="L")  # Parcela
-            pdf.cell(50, 5, "Dinheiro", border=0, align="L")  # Numerário
-            pdf.cell(30, 5, f"R$ {total_final:.2f}", border=0, align="L")  # Valor
-            pdf.cell(30, 5, datetime.now().strftime("%d/%m/%Y"), border=0, align="L")
-
-            # Salvar PDF
-            nome_pdf = "Ticket_Venda_Exemplo.pdf"
-            pdf.output(nome_pdf)
-
-            # Abrir PDF automaticamente
-            os.startfile(nome_pdf)
+            self.numero_ticket += 1
+            nome_pdf = f"Ticket_Venda_{ticket.data:%Y%m%d_%H%M%S}_{self.numero_ticket}.pdf"
 
-            # Save the sales data to the JSON file
-            self.salvar_dados_vendas()
+            # Render in the background; several tickets may be queued at once
+            worker = TicketWorker(ticket, nome_pdf)
+            worker.sinais.progresso.connect(self.progresso_ticket)
+            worker.sinais.concluido.connect(self.ticket_concluido)
+            worker.sinais.erro.connect(self.ticket_erro)
+            self.tickets_pendentes += 1
+            QtCore.QThreadPool.globalInstance().start(worker)
+            self.statusBar().showMessage(f"Gerando {self.tickets_pendentes} ticket(s)...")
 
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Erro", f"Ocorreu um erro ao gerar o PDF: {str(e)}")
 
-    def salvar_dados_vendas(self):
-        """Append the sales data to the JSON file."""
-        for produto in self.orcamento_produtos:
-            dados_vendas = {
-                "descricao": produto["descricao"],
-                "tamanho": produto["tamanho"],
-                "quantidade": produto["quantidade"],
-                "total": produto["total"],
-                "cliente": self.cliente_combobox.currentText()
-            }
+    def progresso_ticket(self, nome_pdf, atual, total):
+        self.statusBar().showMessage(f"Gerando {nome_pdf}: item {atual} de {total}")
 
-            # Load existing sales data
-            if os.path.exists(self.arquivo_dados):
-                with open(self.arquivo_dados, 'r') as arquivo:
-                    dados = json.load(arquivo)
-                    if "vendas" not in dados:
-                        dados["vendas"] = []
-                    dados["vendas"].append(dados_vendas)
-            else:
-                dados = {"vendas": [dados_vendas]}
+    def ticket_concluido(self, ticket, nome_pdf):
+        self.tickets_pendentes -= 1
 
-            # Save updated sales data
-            with open(self.arquivo_dados, 'w') as arquivo:
-                json.dump(dados, arquivo, indent=4)
+        # Record the sale first: failing to open the PDF must not lose it
+        self.salvar_dados_vendas(ticket)
+
+        # Abrir PDF automaticamente
+        try:
+            os.startfile(nome_pdf)
+        except (OSError, AttributeError) as e:  # No PDF handler, or not on Windows (no os.startfile)
+            QtWidgets.QMessageBox.warning(self, "Aviso", f"O PDF {nome_pdf} foi gerado, mas não pôde ser aberto: {e}")
+
+    def ticket_erro(self, nome_pdf, mensagem):
+        self.tickets_pendentes -= 1
+        QtWidgets.QMessageBox.critical(self, "Erro", f"Ocorreu um erro ao gerar o PDF {nome_pdf}: {mensagem}")
+
+    def salvar_dados_vendas(self, ticket):
+        """Append all sales lines of the ticket to the journal in a single commit."""
+        inicio = time.perf_counter()
+        while True:
+            try:
+                dados_vendas = self.nucleo.registrar_venda(ticket)
+                break
+            except ValueError as e:
+                # The PDF is already printed: don't drop the sale because the server is unreachable
+                resposta = QtWidgets.QMessageBox.critical(
+                    self, "Erro", f"A venda do ticket não foi gravada: {e}\n\nTentar novamente?",
+                    QtWidgets.QMessageBox.Retry | QtWidgets.QMessageBox.Cancel, QtWidgets.QMessageBox.Retry)
+                if resposta != QtWidgets.QMessageBox.Retry:
+                    return
+        if dados_vendas:
+            self.sale_added.emit(dados_vendas)  # Emit the signal after committing the sales
+
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        self.statusBar().showMessage(f"{len(dados_vendas)} itens de venda gravados em {latencia_ms:.1f} ms", 5000)
 
     def salvar_dados(self):
-        """Salva os dados de produtos e clientes no arquivo JSON."""
-        dados = {
-            "produtos": self.produtos,
-            "clientes": self.clientes,
-            "orcamento_produtos": self.orcamento_produtos
-        }
-        with open(self.arquivo_dados, 'w') as arquivo:
-            json.dump(dados, arquivo, indent=4)
+        """Salva todos os dados em um novo snapshot JSON e esvazia o journal."""
+        self.nucleo.salvar()
 
-def carregar_dados_orcamento(arquivo_dados):
-    """Carrega os dados de vendas do arquivo JSON."""
-    if os.path.exists(arquivo_dados):
-        try:
-            with open(arquivo_dados, 'r') as arquivo:
-                dados = json.load(arquivo)
-                return dados.get("vendas", [])  # Change to "vendas" to get sales data
-        except json.JSONDecodeError:
-            return []
-    return []
+    def closeEvent(self, event):
+        self.salvar_dados()  # Compact the journal on exit
+        super().closeEvent(event)
 
 class WelcomeScreen(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("MADEREIRA CASA BRANCA")
         self.setGeometry(100, 100, 1000, 600)  # Increased window size
+        self.relatorio = None  # Long-lived sales report, created on the first sale
+        self.sistema_orcamento = None  # Shared main window, warmed after the first paint
 
         # Layout principal
         layout = QtWidgets.QVBoxLayout(self)  # Layout vertical principal
 
         # Parte superior: Imagem do logo
         self.logo_label = QtWidgets.QLabel()
-        logo_pixmap = QtGui.QPixmap("Imgs/logo.png")  # Substitua pelo caminho correto da imagem
-        self.logo_label.setPixmap(logo_pixmap.scaledToHeight(200, QtCore.Qt.SmoothTransformation))  # Ajusta a altura
+        logo_pixmap = pixmap_escalado("Imgs/logo.png", altura=200)  # Substitua pelo caminho correto da imagem
+        self.logo_label.setPixmap(logo_pixmap)  # Já reduzido para 200 de altura (cache em disco)
         self.logo_label.setAlignment(QtCore.Qt.AlignCenter)
         layout.addWidget(self.logo_label, stretch=1)  # Adiciona a imagem com prioridade de espaço
 
@@ -990,10 +1314,21 @@ class WelcomeScreen(QtWidgets.QWidget):
         # Define o layout principal
         self.setLayout(layout)
 
+        self.tela_criada = time.perf_counter()
+        self.primeira_pintura = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.primeira_pintura is None:
+            self.primeira_pintura = time.perf_counter()
+            relatorio_inicializacao(self.tela_criada, self.primeira_pintura)
+            # Build the main window while the user is still looking at the welcome screen
+            QtCore.QTimer.singleShot(0, self.obter_sistema)
+
     def create_button(self, text, icon_path, callback):
         """Cria um botão com ícone e efeito de hover."""
         button = QtWidgets.QPushButton(text)
-        button.setIcon(QtGui.QIcon(icon_path))
+        button.setIcon(QtGui.QIcon(pixmap_escalado(icon_path, 80, 80)))  # Pre-scaled, cached icon
         button.setIconSize(QtCore.QSize(80, 80))  # Aumenta o tamanho do ícone
         button.setFont(QtGui.QFont("Arial", 28))  # Aumenta o tamanho da fonte
         button.setStyleSheet(self.button_hover_effect())
@@ -1015,34 +1350,51 @@ class WelcomeScreen(QtWidgets.QWidget):
             }
         """
 
-    def open_clientes(self):
-        self.sistema_orcamento = SistemaOrcamentoMadeireira()
-        self.sistema_orcamento.showMaximized()  # Open in maximized state
-        self.sistema_orcamento.tabs.setCurrentIndex(1)  # Set to "Clientes" tab
+    def obter_sistema(self):
+        """Return the single main window, creating it (and loading the data) on first use; None if loading fails."""
+        if self.sistema_orcamento is None:
+            try:
+                self.sistema_orcamento = SistemaOrcamentoMadeireira()
+            except ValueError as e:  # Corrupted data file or unreachable server: nothing was loaded or overwritten
+                QtWidgets.QMessageBox.critical(self, "Erro", f"Não foi possível carregar os dados: {e}")
+                return None
+            self.sistema_orcamento.sale_added.connect(self.update_relatorio)  # Connect the signal
+            self.sistema_orcamento.observador.vendas_adicionadas.connect(self.atualizar_relatorio_aberto)
+        return self.sistema_orcamento
+
+    def abrir_sistema(self, aba):
+        sistema = self.obter_sistema()
+        if sistema is None:
+            return
+        sistema.tabs.setCurrentIndex(aba)
+        sistema.showMaximized()  # Open in maximized state
         self.close()  # Close the welcome screen
 
+    def open_clientes(self):
+        self.abrir_sistema(1)  # Set to "Clientes" tab
+
     def open_produtos(self):
-        self.sistema_orcamento = SistemaOrcamentoMadeireira()
-        self.sistema_orcamento.showMaximized()  # Open in maximized state
-        self.sistema_orcamento.tabs.setCurrentIndex(0)  # Set to "Produtos" tab
-        self.close()  # Close the welcome screen
+        self.abrir_sistema(0)  # Set to "Produtos" tab
 
     def open_orcamento(self):
-        self.sistema_orcamento = SistemaOrcamentoMadeireira()
-        self.sistema_orcamento.showMaximized()  # Open in maximized state
-        self.sistema_orcamento.tabs.setCurrentIndex(2)  # Set to "Orçamento" tab
-        self.sistema_orcamento.sale_added.connect(self.update_relatorio)  # Connect the signal
-        self.close()  # Close the welcome screen
+        self.abrir_sistema(2)  # Set to "Orçamento" tab
+
+    def update_relatorio(self, vendas):
+        historico = self.sistema_orcamento.armazenamento.dados["vendas"]
+        if self.relatorio is None:
+            # The live history, not a copy: it already includes the sales just committed
+            self.relatorio = RelatorioDialog(historico, self.sistema_orcamento.relatorios)
+        else:
+            self.relatorio.adicionar_vendas(vendas, historico)  # Append only the new rows
+        self.relatorio.show()  # Non-modal, stays open across sales
 
-    def update_relatorio(self):
-        # Reload the report dialog with updated data
-        arquivo_dados = "dados.json"
-        orcamento_produtos = carregar_dados_orcamento(arquivo_dados)
-        relatorio_dialog = RelatorioDialog(orcamento_produtos)
-        relatorio_dialog.exec_()  # Show the updated report dialog
+    def atualizar_relatorio_aberto(self, vendas):
+        """Sales saved by another instance only update the report if it is already open."""
+        if self.relatorio is not None:
+            self.relatorio.adicionar_vendas(vendas, self.sistema_orcamento.armazenamento.dados["vendas"])
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     welcome_screen = WelcomeScreen()
     welcome_screen.show()  # Show the welcome screen
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""Regras do sistema de orçamento sem interface gráfica.
+
+A janela (madereira-master.py) só lê os campos, chama estes métodos e mostra
+o resultado ou a mensagem do ValueError. Os mesmos métodos servem para scripts,
+para o benchmark.py e para o servidor.py, sem QApplication.
+"""
+import os
+
+from armazenamento import criar_armazenamento
+from catalogo import Catalogo
+from precificacao import calcular_linha, centavos, custo_metro_produto, milimetros, reais
+from relatorios import AgregadosVendas, com_medidas
+from validacao import erro_cliente, erro_produto
+
+
+def vendas_do_ticket(ticket):
+    """Registros de venda (um por item) de um ticket emitido."""
+    data = ticket.data.isoformat(timespec="seconds")
+    return [{
+        "descricao": item.descricao,
+        "tamanho": item.tamanho,
+        "quantidade": item.quantidade,
+        "vl_m": item.vl_m,
+        "total": item.total,
+        "lucro": item.lucro,
+        "cliente": ticket.cliente.nome,
+        "data": data,
+        "ticket": ticket.id
+    } for item in ticket.itens]
+
+
+class NucleoOrcamento:
+    """Catálogo, orçamento em andamento, vendas e persistência de um arquivo de dados."""
+
+    def __init__(self, arquivo_dados="dados.json", armazenamento=None):
+        self.arquivo_dados = arquivo_dados
+        self.armazenamento = armazenamento or criar_armazenamento(arquivo_dados)
+        self.catalogo = Catalogo(self.armazenamento)
+        self.relatorios = AgregadosVendas(arquivo_dados + ".relatorios", self.catalogo.produto_por_rotulo)
+        self.orcamento_produtos = []
+        self.pendentes = []  # [(coleção, antigos, novos)] vindos de outras instâncias, ver alteracoes_pendentes
+        self.armazenamento.alcancar = self.alcancar
+
+    def carregar(self):
+        """Carrega os dados salvos.
+
+        O orçamento em andamento fica só em memória: é de cada instância e não
+        sobrevive entre sessões (o de versões antigas, gravado nos dados, é descartado).
+        """
+        dados = self.armazenamento.carregar()
+        self.catalogo.carregar(dados)
+        self.orcamento_produtos = []
+        if dados["orcamento_produtos"]:
+            self.armazenamento.limpar("orcamento_produtos")
+        self.relatorios.carregar(dados["vendas"])  # Só as vendas posteriores aos totais salvos são somadas
+        self.armazenamento.compactado = self.relatorios.salvar  # Agora que os totais estão carregados
+        return dados
+
+    def registrar_produto(self, produto, em_edicao=None):
+        """Cadastra o produto, ou substitui em_edicao por ele; ValueError com o motivo se for inválido."""
+        erro = erro_produto(produto)
+        if erro is not None:
+            raise ValueError(erro)
+        with self.armazenamento.transacao():  # A verificação vê o que outras instâncias acabaram de gravar
+            if em_edicao is not None:
+                em_edicao = self.catalogo.produto_atual(em_edicao)
+                if em_edicao is None:
+                    raise ValueError("Produto excluído por outro usuário!")
+            existente = self.catalogo.produto_por_chave(produto["descricao"], produto["largura"], produto["espessura"],
+                                                        produto["madeira"])
+            if existente is not None and existente is not em_edicao:
+                raise ValueError("Produto já registrado!")
+            if em_edicao is not None:
+                return self.catalogo.atualizar_produto(em_edicao, produto)
+            return self.catalogo.adicionar_produto(produto)
+
+    def registrar_cliente(self, cliente, tipo_documento=None, em_edicao=None):
+        """Cadastra o cliente, ou substitui em_edicao por ele; ValueError com o motivo se for inválido."""
+        erro = erro_cliente(cliente, tipo_documento)
+        if erro is not None:
+            raise ValueError(erro)
+        with self.armazenamento.transacao():
+            if em_edicao is not None:
+                em_edicao = self.catalogo.cliente_atual(em_edicao)
+                if em_edicao is None:
+                    raise ValueError("Cliente excluído por outro usuário!")
+            existente = self.catalogo.cliente_por_nome(cliente["nome"])
+            if existente is not None and existente is not em_edicao:
+                raise ValueError("Já existe um cliente com este nome!")
+            if em_edicao is not None:
+                return self.catalogo.atualizar_cliente(em_edicao, cliente)
+            return self.catalogo.adicionar_cliente(cliente)
+
+    def remover_produto(self, produto):
+        self.catalogo.remover_produto(produto)
+
+    def remover_cliente(self, cliente):
+        self.catalogo.remover_cliente(cliente)
+
+    def atualizar_produtos(self, alteracoes):
+        """Grava de uma vez [(produto, novos_dados), ...], como no reajuste por madeira."""
+        return self.catalogo.atualizar_produtos(alteracoes)
+
+    def adicionar_produtos(self, produtos):
+        return self.catalogo.adicionar_produtos(produtos)
+
+    def adicionar_clientes(self, clientes):
+        return self.catalogo.adicionar_clientes(clientes)
+
+    def item_orcamento(self, rotulo, tamanho, quantidade, venda_m):
+        """Calcula a linha do orçamento (sem gravar) para o produto do rótulo.
+
+        tamanho em metros ("2,5" é aceito), venda_m em reais por metro linear.
+        """
+        if not rotulo or not str(tamanho) or not str(quantidade):
+            raise ValueError("Preencha todos os campos para adicionar um produto ao orçamento!")
+        try:
+            tamanho = float(str(tamanho).replace(',', '.'))
+            quantidade = int(quantidade)
+        except ValueError:
+            raise ValueError("O tamanho e a quantidade devem ser números válidos!")
+        produto = self.catalogo.produto_por_rotulo(rotulo)
+        if produto is None:
+            raise ValueError("Produto não encontrado!")
+        try:
+            venda_m = float(str(venda_m).replace(',', '.'))
+        except ValueError:
+            raise ValueError("Informe o valor de venda por metro linear!")
+
+        # Total e lucro em centavos exatos; o custo por metro do produto fica no catálogo
+        _, total, lucro = calcular_linha(custo_metro_produto(produto, venda_m), milimetros(tamanho), quantidade,
+                                         centavos(venda_m))
+        return {
+            "descricao": rotulo,
+            "tamanho": tamanho,
+            "quantidade": quantidade,
+            "vl_m": venda_m,
+            "total": reais(total),
+            "lucro": reais(lucro),
+        }
+
+    def adicionar_item_orcamento(self, item):
+        self.orcamento_produtos.append(item)
+
+    def remover_item_orcamento(self, indice):
+        del self.orcamento_produtos[indice]
+
+    def criar_ticket(self, nome_cliente, vendedor, forma_pagamento, condicao_pagamento):
+        """Snapshot do orçamento atual para o cliente informado."""
+        cliente = self.catalogo.cliente_por_nome(nome_cliente)
+        if cliente is None:
+            raise ValueError("Selecione um cliente válido!")
+        from ticket import criar_ticket  # Carrega o fpdf só quando um ticket é gerado
+
+        return criar_ticket(cliente, self.orcamento_produtos, vendedor, forma_pagamento, condicao_pagamento)
+
+    def registrar_venda(self, ticket):
+        """Grava todos os itens do ticket como vendas, em uma única entrada, e retorna os registros."""
+        return self.registrar_vendas(vendas_do_ticket(ticket))
+
+    def registrar_vendas(self, vendas):
+        vendas = self.com_medidas(vendas)
+        if vendas:
+            self.armazenamento.adicionar_varios("vendas", vendas)
+            self.relatorios.adicionar(vendas)
+        return vendas
+
+    def com_medidas(self, vendas):
+        """As vendas com a madeira e o volume dos produtos vendidos, que os relatórios somam."""
+        return [com_medidas(venda, self.catalogo.produto_por_rotulo(venda["descricao"])) for venda in vendas]
+
+    def sincronizar(self):
+        """Aplica o que outras instâncias gravaram no mesmo arquivo de dados.
+
+        Retorna False quando outro processo compactou os dados: então é preciso
+        ler armazenamento.recarregado() (pode ser em outra thread) e passá-lo a adotar().
+        """
+        entradas = self.armazenamento.novas_entradas()
+        if entradas is None:
+            return False
+        self._aplicar_alteracoes(entradas)
+        return True
+
+    def alcancar(self):
+        """Chamado pelo armazenamento ao abrir uma transação: aplica antes o que outras instâncias gravaram."""
+        if not self.sincronizar():
+            self.adotar(self.armazenamento.recarregado(), self.armazenamento.gravacoes)
+
+    def adotar(self, recarregado, gravacoes):
+        """Troca pelas de recarregado só as coleções que mudaram.
+
+        gravacoes é o armazenamento.gravacoes de quando a leitura começou; se
+        esta instância gravou algo depois, nada é trocado e o retorno é False.
+        """
+        if self.armazenamento.gravacoes != gravacoes:
+            return False
+        anteriores = {colecao: self.armazenamento.dados[colecao] for colecao in ("produtos", "clientes", "vendas")}
+        self.armazenamento.adotar(recarregado)
+        dados = self.armazenamento.dados
+
+        for colecao, carregar in (("produtos", self.catalogo.carregar_produtos),
+                                  ("clientes", self.catalogo.carregar_clientes)):
+            if dados[colecao] == anteriores[colecao]:
+                dados[colecao] = anteriores[colecao]  # Mantém a lista (e os índices) que a janela já usa
+            else:
+                carregar(dados[colecao])
+                self.pendentes.append((colecao, None, None))  # Seção inteira recarregada
+
+        vendas = anteriores["vendas"]
+        if len(dados["vendas"]) >= len(vendas):
+            novas = dados["vendas"][len(vendas):]  # O histórico de vendas só cresce
+            self.relatorios.adicionar(novas)
+            if novas:
+                self.pendentes.append(("vendas", [], novas))
+        else:
+            self.relatorios.carregar(dados["vendas"])
+            self.pendentes.append(("vendas", None, None))
+        return True
+
+    def alteracoes_pendentes(self):
+        """[(coleção, antigos, novos), ...] aplicados desde a última chamada, para a interface se atualizar.
+
+        antigos e novos são None quando a coleção inteira foi recarregada.
+        """
+        pendentes, self.pendentes = self.pendentes, []
+        return pendentes
+
+    def _aplicar_alteracoes(self, entradas):
+        dados = self.armazenamento.dados
+        for entrada in entradas:
+            if entrada["colecao"] not in ("produtos", "clientes", "vendas"):
+                continue  # O orçamento em andamento é de cada instância
+            antigos, novos = self.catalogo.aplicar_alteracao(dados, entrada)
+            if entrada["colecao"] == "vendas":
+                self.relatorios.adicionar(novos)
+            self.pendentes.append((entrada["colecao"], antigos, novos))
+
+    def salvar(self):
+        """Grava um novo snapshot (esvaziando o journal) e os totais dos relatórios."""
+        self.armazenamento.compactar()
+        self.relatorios.salvar()
+
+
+def criar_nucleo(arquivo_dados="dados.json"):
+    """Núcleo local, ou ligado ao servidor da variável MADEIREIRA_SERVIDOR (ex.: http://balcao1:8765).
+
+    A senha do servidor, se ele pedir uma, vem da variável MADEIREIRA_TOKEN.
+    """
+    endereco = os.environ.get("MADEIREIRA_SERVIDOR")
+    if endereco:
+        from remoto import NucleoRemoto
+
+        return NucleoRemoto(endereco, os.environ.get("MADEIREIRA_TOKEN"))
+    return NucleoOrcamento(arquivo_dados)
@@ -0,0 +1,115 @@
+"""Cálculo de preço, volume e lucro das linhas de orçamento.
+
+Valores em dinheiro são centavos inteiros e tamanhos são milímetros inteiros,
+então as contas são exatas e somar milhares de linhas não acumula erro de
+arredondamento. A mesma fórmula serve para uma linha (int) e para um orçamento
+inteiro (colunas NumPy int64). Sem NumPy instalado, as colunas são calculadas
+linha a linha. O NumPy só é importado no primeiro cálculo em colunas: ele é a
+maior parte do tempo de carga do núcleo, e uma linha de orçamento não precisa dele.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+_np = False  # Ainda não importado
+
+
+def carregar_numpy():
+    """O módulo numpy, importado no primeiro uso; None se não estiver instalado."""
+    global _np
+    if _np is False:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _np = np
+    return _np
+
+
+def centavos(valor):
+    """Converte reais (float, str ou Decimal) em centavos, arredondando meio centavo para cima."""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def reais(valor_centavos):
+    """Valor em reais para gravar no JSON (exato com duas casas)."""
+    return valor_centavos / 100
+
+
+def formatar(valor_centavos):
+    """Formata centavos como "R$ 1234.56"."""
+    sinal = "-" if valor_centavos < 0 else ""
+    return f"R$ {sinal}{abs(valor_centavos) // 100}.{abs(valor_centavos) % 100:02d}"
+
+
+def milimetros(metros):
+    return int((Decimal(str(metros)) * 1000).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def _dividir(numerador, divisor):
+    # Divisão inteira arredondando a metade para cima; funciona com int e arrays int64
+    return (2 * numerador + divisor) // (2 * divisor)
+
+
+def custo_por_metro(largura, espessura, custo_m3):
+    """Custo em centavos de 1 metro linear: largura x espessura (cm) x custo por m³ (reais)."""
+    centimetros2 = Decimal(str(largura)) * Decimal(str(espessura))
+    return int((centimetros2 * centavos(custo_m3) / 10000).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def custo_metro_produto(produto, venda_m):
+    """Custo por metro linear do produto, em centavos.
+
+    Usa o fator guardado no cadastro. Produtos antigos não guardam o custo por m³
+    e usam o valor de venda no lugar, como o cálculo original fazia.
+    """
+    if "custo_metro" in produto:
+        return produto["custo_metro"]
+    return custo_por_metro(produto["largura"], produto["espessura"], produto.get("custo_m3", venda_m))
+
+
+def valores_venda(venda_m, tamanho_mm, quantidade):
+    """Valor unitário (peça de tamanho_mm) e total da linha, em centavos."""
+    valor_unitario = _dividir(venda_m * tamanho_mm, 1000)
+    return valor_unitario, valor_unitario * quantidade
+
+
+def calcular_linha(custo_metro, tamanho_mm, quantidade, venda_m):
+    """Retorna (valor unitário, total, lucro) em centavos.
+
+    custo_metro e venda_m em centavos por metro linear, tamanho_mm em milímetros.
+    Aceita inteiros ou arrays NumPy int64 do mesmo tamanho.
+    """
+    valor_unitario, total = valores_venda(venda_m, tamanho_mm, quantidade)
+    lucro = total - _dividir(custo_metro * tamanho_mm * quantidade, 1000)
+    return valor_unitario, total, lucro
+
+
+def volume_m3(largura, espessura, tamanho_mm, quantidade):
+    """Volume da linha em m³ (largura e espessura em cm)."""
+    return largura * espessura * tamanho_mm * quantidade / 10_000_000
+
+
+def precificar_centavos(custo_metro, tamanho_mm, quantidade, venda_m):
+    """Calcula todas as linhas de um orçamento de uma vez, a partir de colunas inteiras.
+
+    Retorna um dicionário com as colunas valor_unitario, total e lucro (centavos).
+    """
+    np = carregar_numpy()
+    if np is not None:
+        colunas = calcular_linha(*(np.asarray(coluna, dtype=np.int64) for coluna in
+                                   (custo_metro, tamanho_mm, quantidade, venda_m)))
+    else:
+        linhas = [calcular_linha(*linha) for linha in zip(custo_metro, tamanho_mm, quantidade, venda_m)]
+        colunas = tuple(map(list, zip(*linhas))) if linhas else ([], [], [])
+    return dict(zip(("valor_unitario", "total", "lucro"), colunas))
+
+
+def precificar(largura, espessura, tamanho, quantidade, custo_m3, venda_m):
+    """Calcula todas as linhas a partir dos valores do cadastro (cm, metros e reais).
+
+    Retorna as colunas valor_unitario, total e lucro (centavos) e m3.
+    """
+    tamanho_mm = [milimetros(valor) for valor in tamanho]
+    colunas = precificar_centavos([custo_por_metro(*linha) for linha in zip(largura, espessura, custo_m3)],
+                                  tamanho_mm, quantidade, [centavos(valor) for valor in venda_m])
+    colunas["m3"] = [volume_m3(*linha) for linha in zip(largura, espessura, tamanho_mm, quantidade)]
+    return colunas
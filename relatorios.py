@@ -0,0 +1,95 @@
+"""Totais de vendas agrupados por produto, cliente, madeira, dia e mês.
+
+Os totais são atualizados a cada venda gravada e salvos em um arquivo ao lado
+dos dados, então abrir um resumo não exige percorrer o histórico de vendas.
+A madeira e o volume de cada venda ficam no próprio registro (com_medidas):
+editar ou excluir o produto depois não muda o que já foi vendido.
+"""
+import json
+import os
+
+from precificacao import centavos, milimetros, volume_m3
+
+DIMENSOES = ("produto", "cliente", "madeira", "dia", "mes")
+VERSAO = 1
+
+# Posições dos valores de cada grupo: [itens, quantidade, total (centavos), lucro (centavos), m³]
+ITENS, QUANTIDADE, TOTAL, LUCRO, M3 = range(5)
+
+
+def com_medidas(venda, produto):
+    """A venda com a madeira e o volume (m³) do produto vendido, para gravar no histórico."""
+    if "m3" in venda:
+        return venda
+    if produto is not None and "largura" in produto:
+        m3 = volume_m3(produto["largura"], produto["espessura"], milimetros(venda["tamanho"]),
+                       int(venda["quantidade"]))
+    else:
+        m3 = 0.0  # Produto excluído ou sem medidas
+    return dict(venda, madeira=produto.get("madeira", "") if produto else "", m3=m3)
+
+
+class AgregadosVendas:
+    """Totais por grupo, mantidos de forma incremental sobre o histórico de vendas.
+
+    O histórico só recebe inclusões, então basta lembrar quantas vendas já foram
+    somadas: ao carregar, apenas as vendas gravadas depois do último salvamento
+    são somadas de novo.
+    """
+
+    def __init__(self, arquivo, produto_por_rotulo=None):
+        self.arquivo = arquivo
+        self.produto_por_rotulo = produto_por_rotulo or (lambda rotulo: None)
+        self.grupos = {dimensao: {} for dimensao in DIMENSOES}
+        self.vendas = 0  # Quantas vendas do histórico já estão nos totais
+
+    def carregar(self, vendas):
+        """Lê os totais salvos e soma as vendas que ainda não estavam neles."""
+        salvo = None
+        if os.path.exists(self.arquivo):
+            try:
+                with open(self.arquivo, 'r') as arquivo:
+                    salvo = json.load(arquivo)
+            except json.JSONDecodeError:
+                salvo = None
+
+        if salvo is None or salvo.get("versao") != VERSAO or salvo["vendas"] > len(vendas):
+            # Sem arquivo ou histórico reescrito: refaz a partir de todas as vendas
+            self.grupos = {dimensao: {} for dimensao in DIMENSOES}
+            self.vendas = 0
+        else:
+            self.grupos = {dimensao: salvo["grupos"].get(dimensao, {}) for dimensao in DIMENSOES}
+            self.vendas = salvo["vendas"]
+        self.adicionar(vendas[self.vendas:])
+
+    def adicionar(self, vendas):
+        """Soma vendas recém-gravadas em todos os agrupamentos."""
+        for venda in vendas:
+            if "m3" not in venda:  # Gravada antes das medidas irem para o registro: usa o produto atual
+                venda = com_medidas(venda, self.produto_por_rotulo(venda["descricao"]))
+            valores = (1, int(venda["quantidade"]), centavos(venda["total"]), centavos(venda.get("lucro", 0)),
+                       venda["m3"])
+
+            data = venda.get("data", "")
+            chaves = (venda["descricao"], venda.get("cliente", ""), venda["madeira"], data[:10], data[:7])
+            for dimensao, chave in zip(DIMENSOES, chaves):
+                grupo = self.grupos[dimensao].get(chave)
+                if grupo is None:
+                    self.grupos[dimensao][chave] = list(valores)
+                else:
+                    for posicao, valor in enumerate(valores):
+                        grupo[posicao] += valor
+        self.vendas += len(vendas)
+
+    def linhas(self, dimensao):
+        """[(chave, [itens, quantidade, total, lucro, m³]), ...] ordenado pela chave."""
+        return sorted(self.grupos[dimensao].items())
+
+    def salvar(self):
+        """Grava os totais em um arquivo temporário e o troca pelo atual."""
+        temporario = f"{self.arquivo}.{os.getpid()}.tmp"  # Cada processo com o seu
+        with open(temporario, 'w') as arquivo:
+            json.dump({"versao": VERSAO, "vendas": self.vendas, "grupos": self.grupos}, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.arquivo)
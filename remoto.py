@@ -0,0 +1,173 @@
+"""Núcleo de orçamento ligado ao servidor.py, para o balcão trabalhar com o catálogo compartilhado.
+
+NucleoRemoto tem a mesma interface do NucleoOrcamento. As consultas (busca,
+preços, tickets, relatórios) usam uma cópia local dos dados; cada alteração é
+enviada ao servidor, que valida e grava, e a cópia recebe em seguida as
+alterações de todos os balcões (sincronizar). O orçamento em andamento fica só
+neste balcão.
+"""
+import http.client
+import json
+from urllib.parse import urlsplit
+
+from catalogo import Catalogo
+from nucleo import NucleoOrcamento
+from relatorios import AgregadosVendas
+
+PORTA_PADRAO = 8765
+
+
+class Desatualizado(Exception):
+    """A cópia local ficou para trás da fila de alterações do servidor e precisa ser recarregada."""
+
+
+class ServidorIndisponivel(ValueError):
+    """O pedido não chegou ao servidor (ou a resposta não voltou); a janela mostra a mensagem como um ValueError."""
+
+
+class ConexaoServidor:
+    """Requisições JSON ao servidor por uma conexão HTTP mantida aberta."""
+
+    def __init__(self, endereco, tempo_limite=10, token=None):
+        partes = urlsplit(endereco if "//" in endereco else "http://" + endereco)
+        self.host = partes.hostname
+        self.porta = partes.port or PORTA_PADRAO
+        self.tempo_limite = tempo_limite
+        self.autorizacao = {"Authorization": f"Bearer {token}"} if token else {}
+        self.conexao = None
+
+    def requisitar(self, metodo, caminho, dados=None):
+        """Retorna a resposta decodificada; ValueError com a mensagem do servidor se ele recusar o pedido.
+
+        Falhas de rede viram ServidorIndisponivel, e a conexão é descartada para
+        que o próximo pedido abra outra.
+        """
+        corpo = json.dumps(dados).encode("utf-8") if dados is not None else None
+        cabecalhos = dict(self.autorizacao)
+        if corpo is not None:
+            cabecalhos["Content-Type"] = "application/json"
+        for tentativa in range(2):
+            if self.conexao is None:
+                self.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=self.tempo_limite)
+            try:
+                self.conexao.request(metodo, caminho, corpo, cabecalhos)
+                resposta = self.conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (OSError, http.client.HTTPException) as erro:
+                self.conexao.close()
+                self.conexao = None
+                # O servidor fechou a conexão ociosa: tenta uma vez com uma nova
+                ocioso = isinstance(erro, (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError))
+                if tentativa or not ocioso:
+                    raise ServidorIndisponivel(f"Servidor indisponível ({self.host}:{self.porta}): {erro}") from erro
+
+        if resposta.getheader("Content-Type", "").startswith("application/json"):
+            conteudo = json.loads(conteudo)
+        if resposta.status == 410:
+            raise Desatualizado()
+        if resposta.status >= 400:
+            raise ValueError(conteudo.get("erro") if isinstance(conteudo, dict) else f"HTTP {resposta.status}")
+        return conteudo
+
+
+class CopiaLocal:
+    """Coleções recebidas do servidor; só mudam por NucleoRemoto.sincronizar, nunca por gravação local."""
+
+    def __init__(self):
+        self.dados = {"produtos": [], "clientes": [], "vendas": []}
+
+
+class NucleoRemoto(NucleoOrcamento):
+    """NucleoOrcamento cujas gravações são feitas pelo servidor."""
+
+    def __init__(self, endereco, token=None):
+        self.arquivo_dados = None
+        self.servidor = ConexaoServidor(endereco, token=token)
+        self.armazenamento = CopiaLocal()
+        self.catalogo = Catalogo(self.armazenamento)
+        self.relatorios = AgregadosVendas(None, self.catalogo.produto_por_rotulo)
+        self.orcamento_produtos = []
+        self.pendentes = []
+        self.instancia = None
+        self.seq = 0
+
+    def carregar(self):
+        """Baixa as coleções e os totais dos relatórios; o orçamento em andamento é mantido."""
+        resposta = self.servidor.requisitar("GET", "/dados")
+        self.instancia = resposta["instancia"]
+        self.seq = resposta["seq"]
+        dados = self.armazenamento.dados = resposta["dados"]
+        self.catalogo.carregar(dados)
+        self.relatorios.grupos = resposta["relatorios"]["grupos"]
+        self.relatorios.vendas = resposta["relatorios"]["vendas"]
+        self.pendentes += [(colecao, None, None) for colecao in dados]
+        return dados
+
+    def sincronizar(self):
+        """Aplica à cópia local as alterações feitas no servidor desde a última sincronização."""
+        try:
+            resposta = self.servidor.requisitar("GET", f"/alteracoes?desde={self.seq}&instancia={self.instancia}")
+        except Desatualizado:
+            self.carregar()
+            return True
+        self._aplicar_alteracoes(resposta["alteracoes"])
+        self.seq = resposta["seq"]
+        return True
+
+    def registrar_produto(self, produto, em_edicao=None):
+        resposta = self._enviar("POST", "/produtos",
+                                {"produto": produto, "em_edicao": em_edicao["id"] if em_edicao is not None else None})
+        return self.catalogo.produto_por_id(resposta["produto"]["id"]) or resposta["produto"]
+
+    def registrar_cliente(self, cliente, tipo_documento=None, em_edicao=None):
+        resposta = self._enviar("POST", "/clientes", {"cliente": cliente, "tipo_documento": tipo_documento,
+                                                      "em_edicao": em_edicao["id"] if em_edicao is not None else None})
+        return self.catalogo.cliente_atual(resposta["cliente"]) or resposta["cliente"]
+
+    def remover_produto(self, produto):
+        self._enviar("DELETE", f"/produtos/{produto['id']}")
+
+    def remover_cliente(self, cliente):
+        self._enviar("DELETE", f"/clientes/{cliente['id']}")
+
+    def atualizar_produtos(self, alteracoes):
+        resposta = self._enviar("POST", "/produtos/lote",
+                                {"alteracoes": [[produto["id"], novos_dados] for produto, novos_dados in alteracoes]})
+        return [self.catalogo.produto_por_id(produto["id"]) or produto for produto in resposta["produtos"]]
+
+    def adicionar_produtos(self, produtos):
+        return self._enviar("POST", "/produtos/importacao", {"registros": produtos})["registros"]
+
+    def adicionar_clientes(self, clientes):
+        return self._enviar("POST", "/clientes/importacao", {"registros": clientes})["registros"]
+
+    def registrar_vendas(self, vendas):
+        vendas = self.com_medidas(vendas)  # Iguais às que o servidor grava, para reconhecê-las ao sincronizar
+        if vendas:
+            # Reenviar as de um ticket é seguro: o servidor reconhece o id e não grava de novo
+            self._enviar("POST", "/vendas", {"vendas": vendas})  # Os totais são somados ao sincronizar
+            # A janela já mostra as próprias vendas: só as de outros balcões ficam pendentes
+            self.pendentes = [pendente for pendente in self.pendentes if pendente != ("vendas", [], vendas)]
+        return vendas
+
+    def salvar(self):
+        """O servidor grava os dados; não há nada a salvar no balcão."""
+
+    def _enviar(self, metodo, caminho, dados=None):
+        try:
+            resposta = self.servidor.requisitar(metodo, caminho, dados)
+        except ServidorIndisponivel:
+            raise  # Não chegou ao servidor: não há o que sincronizar
+        except ValueError:
+            self._sincronizar_se_possivel()  # Recusada: a alteração pode ter esbarrado em uma de outro balcão
+            raise
+        self._sincronizar_se_possivel()  # Já gravada: uma falha agora não pode ser tomada pela da gravação
+        return resposta
+
+    def _sincronizar_se_possivel(self):
+        """Se o servidor não responder, a cópia local alcança as alterações na próxima sincronização."""
+        try:
+            self.sincronizar()
+        except ServidorIndisponivel:
+            pass
@@ -0,0 +1,437 @@
+"""Serviço HTTP/JSON de orçamento, para vários balcões usarem o mesmo catálogo.
+
+Uso: python servidor.py [--endereco 127.0.0.1] [--porta 8765] [--dados dados.json] [--tickets PASTA] [--token T]
+
+Por padrão só atende a própria máquina. Para escutar em outras interfaces é
+preciso uma senha compartilhada (--token ou a variável MADEIREIRA_TOKEN), que os
+balcões enviam no cabeçalho Authorization; sem ela a resposta é 401.
+
+As requisições são atendidas em um único laço de eventos e cada alteração roda
+inteira antes da próxima, então as gravações deste processo nunca concorrem
+entre si; o catálogo e os índices de busca ficam carregados durante toda a
+execução. Só a renderização de tickets sai do laço, para um processo auxiliar.
+O que outros processos gravarem no mesmo arquivo de dados entra na fila antes
+de cada resposta a GET /dados e GET /alteracoes (ou, se eles compactaram o
+arquivo, muda a instância e os balcões recarregam tudo).
+
+Cada alteração de produtos, clientes ou vendas recebe um número de sequência e
+fica em uma fila, no mesmo formato do journal. Os balcões (remoto.py) carregam
+GET /dados uma vez e depois aplicam GET /alteracoes à sua cópia.
+
+Rotas (corpo e resposta em JSON; dados inválidos voltam como 400 {"erro": "..."}, falhas
+do próprio servidor como 500 e corpos maiores que TAMANHO_MAXIMO_CORPO como 413):
+    GET    /dados                          coleções, totais dos relatórios e sequência atual
+    GET    /alteracoes?desde=N&instancia=I alterações após N (410 se não estão mais na fila)
+    GET    /produtos?busca=TEXTO&limite=N  rótulos encontrados (sem busca: todos os produtos)
+    GET    /clientes?busca=TEXTO&limite=N  nomes encontrados (sem busca: todos os clientes)
+    POST   /produtos                       {"produto": {...}, "em_edicao": id}
+    POST   /produtos/lote                  {"alteracoes": [[id, novos_dados], ...]}
+    POST   /produtos/importacao            {"registros": [...]}
+    DELETE /produtos/ID
+    POST   /clientes                       {"cliente": {...}, "tipo_documento": "CPF", "em_edicao": id}
+    POST   /clientes/importacao            {"registros": [...]}
+    DELETE /clientes/ID
+    POST   /orcamento/itens                {"rotulo", "tamanho", "quantidade", "venda_m"} -> linha calculada
+    POST   /vendas                         {"vendas": [...]} (as de um ticket já gravado não são gravadas de novo)
+    POST   /tickets                        {"cliente": nome, "itens": [{"descricao", "tamanho", "quantidade",
+                                            "vl_m"}, ...], "vendedor", "forma_pagamento", "condicao_pagamento"}
+    GET    /tickets/ARQUIVO.pdf
+"""
+import argparse
+import asyncio
+import hmac
+import inspect
+import ipaddress
+import json
+import os
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from armazenamento import criar_armazenamento
+from nucleo import NucleoOrcamento
+
+COLECOES = ("produtos", "clientes", "vendas")  # O orçamento em andamento é de cada balcão
+TAMANHO_FILA = 10_000
+TICKETS_LEMBRADOS = 10_000  # Vendas recentes cujo ticket é reconhecido se for reenviado
+INTERVALO_COMPACTACAO = 300  # segundos
+TAMANHO_MAXIMO_CORPO = 16 * 1024 * 1024  # Folga para importar planilhas grandes
+
+
+class Desatualizado(Exception):
+    """O balcão pediu alterações que já saíram da fila (ou de outra execução do servidor)."""
+
+
+class ArmazenamentoPublicado:
+    """Repassa as gravações ao armazenamento e publica as das coleções compartilhadas na fila."""
+
+    def __init__(self, armazenamento, tamanho_fila=TAMANHO_FILA):
+        self.armazenamento = armazenamento
+        self.alteracoes = deque(maxlen=tamanho_fila)
+        self.seq = 0
+        self.instancia = uuid.uuid4().hex  # Balcões com a sequência de outra execução recarregam tudo
+
+    def __getattr__(self, nome):
+        return getattr(self.armazenamento, nome)
+
+    @property
+    def alcancar(self):
+        return self.armazenamento.alcancar
+
+    @alcancar.setter
+    def alcancar(self, alcancar):
+        self.armazenamento.alcancar = alcancar  # As transações são do armazenamento repassado
+
+    @property
+    def compactado(self):
+        return self.armazenamento.compactado
+
+    @compactado.setter
+    def compactado(self, compactado):
+        self.armazenamento.compactado = compactado  # A compactação automática também é do repassado
+
+    def adicionar(self, colecao, registro):
+        self.armazenamento.adicionar(colecao, registro)
+        self._publicar({"op": "adicionar", "colecao": colecao, "registro": registro})
+
+    def adicionar_varios(self, colecao, registros):
+        self.armazenamento.adicionar_varios(colecao, registros)
+        self._publicar({"op": "adicionar_varios", "colecao": colecao, "registros": registros})
+
+    def remover(self, colecao, indice):
+        self.armazenamento.remover(colecao, indice)
+        self._publicar({"op": "remover", "colecao": colecao, "indice": indice})
+
+    def atualizar(self, colecao, indice, registro):
+        self.armazenamento.atualizar(colecao, indice, registro)
+        self._publicar({"op": "atualizar", "colecao": colecao, "indice": indice, "registro": registro})
+
+    def atualizar_varios(self, colecao, alteracoes):
+        self.armazenamento.atualizar_varios(colecao, alteracoes)
+        self._publicar({"op": "atualizar_varios", "colecao": colecao, "alteracoes": alteracoes})
+
+    def limpar(self, colecao):
+        self.armazenamento.limpar(colecao)
+        self._publicar({"op": "limpar", "colecao": colecao})
+
+    def novas_entradas(self):
+        """As de armazenamento.novas_entradas(), publicadas: vêm de outros processos com o mesmo arquivo."""
+        entradas = self.armazenamento.novas_entradas()
+        if entradas is not None:
+            for entrada in entradas:
+                self._publicar(dict(entrada))  # A sequência da fila não é a do journal
+        return entradas
+
+    def adotar(self, recarregado):
+        """Adota os dados recarregados; como não há entradas para publicar, os balcões recarregam tudo."""
+        self.armazenamento.adotar(recarregado)
+        self.instancia = uuid.uuid4().hex
+        self.alteracoes.clear()
+
+    def desde(self, seq):
+        """Alterações posteriores a seq; Desatualizado se parte delas não está mais na fila."""
+        primeira = self.seq - len(self.alteracoes) + 1
+        if seq < primeira - 1 or seq > self.seq:
+            raise Desatualizado()
+        return list(islice(self.alteracoes, seq - primeira + 1, None))
+
+    def _publicar(self, entrada):
+        if entrada["colecao"] in COLECOES:
+            self.seq += 1
+            entrada["seq"] = self.seq
+            self.alteracoes.append(entrada)
+
+
+class ServidorOrcamento:
+    """NucleoOrcamento atendendo requisições HTTP em um laço asyncio."""
+
+    def __init__(self, arquivo_dados="dados.json", pasta_tickets="tickets", token=None):
+        self.armazenamento = ArmazenamentoPublicado(criar_armazenamento(arquivo_dados))
+        self.nucleo = NucleoOrcamento(arquivo_dados, self.armazenamento)
+        self.catalogo = self.nucleo.catalogo
+        self.pasta_tickets = pasta_tickets
+        self.autorizacao = f"Bearer {token}".encode("utf-8") if token else None
+        self.seq_salvo = 0
+        self.numero_ticket = 0
+        self.tickets_registrados = {}  # id do ticket -> None, do mais antigo ao mais recente
+        self.executor = None
+        self.rotas = {
+            ("GET", "dados"): self.dados,
+            ("GET", "alteracoes"): self.alteracoes,
+            ("GET", "produtos"): self.listar_produtos,
+            ("GET", "clientes"): self.listar_clientes,
+            ("POST", "produtos"): self.registrar_produto,
+            ("POST", "produtos/lote"): self.atualizar_produtos,
+            ("POST", "produtos/importacao"): self.importar_produtos,
+            ("DELETE", "produtos/*"): self.remover_produto,
+            ("POST", "clientes"): self.registrar_cliente,
+            ("POST", "clientes/importacao"): self.importar_clientes,
+            ("DELETE", "clientes/*"): self.remover_cliente,
+            ("POST", "orcamento/itens"): self.item_orcamento,
+            ("POST", "vendas"): self.registrar_vendas,
+            ("POST", "tickets"): self.gerar_ticket,
+            ("GET", "tickets/*"): self.baixar_ticket,
+        }
+
+    def carregar(self):
+        dados = self.nucleo.carregar()
+        self.catalogo.preparar_busca()
+        for venda in dados["vendas"][-TICKETS_LEMBRADOS:]:
+            self._lembrar_ticket(venda.get("ticket"))
+
+    def salvar(self):
+        """Compacta o journal e grava os totais, se algo mudou desde a última vez."""
+        if self.armazenamento.seq != self.seq_salvo:
+            self.nucleo.salvar()
+            self.seq_salvo = self.armazenamento.seq
+
+    # Rotas: recebem a query string, o corpo JSON e o trecho final do caminho (rotas com "*")
+
+    def dados(self, consulta, corpo):
+        self.nucleo.alcancar()
+        relatorios = self.nucleo.relatorios
+        return {"instancia": self.armazenamento.instancia, "seq": self.armazenamento.seq,
+                "dados": {colecao: self.armazenamento.dados[colecao] for colecao in COLECOES},
+                "relatorios": {"vendas": relatorios.vendas, "grupos": relatorios.grupos}}
+
+    def alteracoes(self, consulta, corpo):
+        self.nucleo.alcancar()  # Inclui na fila o que outros processos gravaram no mesmo arquivo
+        if consulta.get("instancia") != self.armazenamento.instancia:
+            raise Desatualizado()
+        return {"seq": self.armazenamento.seq, "alteracoes": self.armazenamento.desde(int(consulta.get("desde", 0)))}
+
+    def listar_produtos(self, consulta, corpo):
+        if "busca" in consulta:
+            return self.catalogo.buscar_produtos(consulta["busca"], int(consulta.get("limite", 20)))
+        return self.catalogo.produtos
+
+    def listar_clientes(self, consulta, corpo):
+        if "busca" in consulta:
+            return self.catalogo.buscar_clientes(consulta["busca"], int(consulta.get("limite", 20)))
+        return self.catalogo.clientes
+
+    def registrar_produto(self, consulta, corpo):
+        em_edicao = corpo.get("em_edicao")
+        if em_edicao is not None:
+            em_edicao = self._produto(em_edicao)
+        produto = self.nucleo.registrar_produto(corpo["produto"], em_edicao)
+        return {"seq": self.armazenamento.seq, "produto": produto}
+
+    def atualizar_produtos(self, consulta, corpo):
+        alteracoes = [(self._produto(produto_id), novos_dados) for produto_id, novos_dados in corpo["alteracoes"]]
+        produtos = self.nucleo.atualizar_produtos(alteracoes)
+        return {"seq": self.armazenamento.seq, "produtos": produtos}
+
+    def importar_produtos(self, consulta, corpo):
+        # A planilha foi conferida contra a cópia do balcão; o catálogo descarta o que outro balcão cadastrou depois
+        produtos = self.nucleo.adicionar_produtos(corpo["registros"])
+        return {"seq": self.armazenamento.seq, "registros": produtos}
+
+    def remover_produto(self, consulta, corpo, produto_id):
+        self.nucleo.remover_produto(self._produto(int(produto_id)))
+        return {"seq": self.armazenamento.seq}
+
+    def registrar_cliente(self, consulta, corpo):
+        em_edicao = corpo.get("em_edicao")
+        if em_edicao is not None:
+            em_edicao = {"id": em_edicao}  # O núcleo confere se ainda existe ("Cliente excluído por outro usuário!")
+        cliente = self.nucleo.registrar_cliente(corpo["cliente"], corpo.get("tipo_documento"), em_edicao)
+        return {"seq": self.armazenamento.seq, "cliente": cliente}
+
+    def importar_clientes(self, consulta, corpo):
+        clientes = self.nucleo.adicionar_clientes(corpo["registros"])
+        return {"seq": self.armazenamento.seq, "registros": clientes}
+
+    def remover_cliente(self, consulta, corpo, cliente_id):
+        self.nucleo.remover_cliente({"id": int(cliente_id)})  # Já excluído: nada a fazer
+        return {"seq": self.armazenamento.seq}
+
+    def item_orcamento(self, consulta, corpo):
+        return self.nucleo.item_orcamento(corpo.get("rotulo"), corpo.get("tamanho", ""), corpo.get("quantidade", ""),
+                                          corpo.get("venda_m", ""))
+
+    def registrar_vendas(self, consulta, corpo):
+        """Um reenvio das vendas de um ticket já gravado (o balcão não recebeu a resposta) não grava de novo."""
+        vendas = corpo["vendas"]
+        ticket = vendas[0].get("ticket") if vendas else None
+        if ticket not in self.tickets_registrados:
+            vendas = self.nucleo.registrar_vendas(vendas)
+            self._lembrar_ticket(ticket)
+        return {"seq": self.armazenamento.seq, "vendas": len(vendas)}
+
+    async def gerar_ticket(self, consulta, corpo):
+        """Calcula os itens com os preços do catálogo, renderiza o PDF e grava as vendas."""
+        from ticket import criar_ticket, renderizar_ticket  # Carrega o fpdf só quando um ticket é gerado
+
+        cliente = self.catalogo.cliente_por_nome(corpo.get("cliente"))
+        if cliente is None:
+            raise ValueError("Selecione um cliente válido!")
+        itens = [self.nucleo.item_orcamento(item.get("descricao"), item.get("tamanho", ""), item.get("quantidade", ""),
+                                            item.get("vl_m", "")) for item in corpo.get("itens", [])]
+        ticket = criar_ticket(cliente, itens, corpo.get("vendedor", ""), corpo.get("forma_pagamento", ""),
+                              corpo.get("condicao_pagamento", ""))
+
+        self.numero_ticket += 1
+        nome_pdf = f"Ticket_Venda_{ticket.data:%Y%m%d_%H%M%S}_{self.numero_ticket}.pdf"
+        os.makedirs(self.pasta_tickets, exist_ok=True)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=1)
+        # O laço continua atendendo os outros balcões enquanto o PDF é desenhado
+        await asyncio.get_running_loop().run_in_executor(self.executor, renderizar_ticket, ticket,
+                                                         os.path.join(self.pasta_tickets, nome_pdf))
+        vendas = self.nucleo.registrar_venda(ticket)
+        self._lembrar_ticket(ticket.id)
+        return {"seq": self.armazenamento.seq, "pdf": nome_pdf, "vendas": vendas}
+
+    def baixar_ticket(self, consulta, corpo, nome_pdf):
+        caminho = os.path.join(self.pasta_tickets, os.path.basename(nome_pdf))
+        if not nome_pdf.endswith(".pdf") or not os.path.isfile(caminho):
+            raise LookupError(nome_pdf)
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    def _lembrar_ticket(self, ticket):
+        if ticket is not None:
+            self.tickets_registrados[ticket] = None
+            if len(self.tickets_registrados) > TICKETS_LEMBRADOS:
+                del self.tickets_registrados[next(iter(self.tickets_registrados))]
+
+    def _produto(self, produto_id):
+        produto = self.catalogo.produto_por_id(produto_id)
+        if produto is None:
+            raise ValueError("Produto não encontrado!")
+        return produto
+
+    # HTTP
+
+    async def responder(self, metodo, alvo, corpo):
+        """Executa a rota e retorna (status, tipo do conteúdo, conteúdo)."""
+        partes = urlsplit(alvo)
+        caminho = [unquote(parte) for parte in partes.path.strip("/").split("/")]
+        consulta = {nome: valores[-1] for nome, valores in parse_qs(partes.query).items()}
+        rota = self.rotas.get((metodo, "/".join(caminho)))
+        parametros = ()
+        if rota is None and len(caminho) > 1:
+            rota = self.rotas.get((metodo, "/".join(caminho[:-1] + ["*"])))
+            parametros = (caminho[-1],)
+        if rota is None:
+            return HTTPStatus.NOT_FOUND, {"erro": "Rota não encontrada"}
+
+        try:
+            dados = json.loads(corpo) if corpo else {}
+            if not isinstance(dados, dict):
+                raise ValueError("O corpo da requisição deve ser um objeto JSON")
+            resultado = rota(consulta, dados, *parametros)
+            if inspect.isawaitable(resultado):
+                resultado = await resultado
+        except Desatualizado:
+            return HTTPStatus.GONE, {"erro": "Recarregue os dados"}
+        except (ValueError, KeyError, TypeError) as e:  # Inclui JSON inválido e campos ausentes
+            return HTTPStatus.BAD_REQUEST, {"erro": str(e)}
+        except LookupError as e:
+            return HTTPStatus.NOT_FOUND, {"erro": f"Não encontrado: {e}"}
+        except Exception as e:  # Ex.: falha ao gravar no disco; a conexão e o servidor continuam atendendo
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"Erro no servidor: {e}"}
+        return HTTPStatus.OK, resultado
+
+    async def atender(self, leitor, escritor):
+        """Atende as requisições de uma conexão (mantida aberta entre requisições, como no HTTP/1.1)."""
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                metodo, alvo, versao = linha.decode("latin-1").split()
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                tamanho = int(cabecalhos.get("content-length", 0))
+                fechar = cabecalhos.get("connection", "").lower() == "close" or versao == "HTTP/1.0"
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    # O corpo não é lido, então a conexão não pode ser reaproveitada
+                    status, resultado = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"erro": "Requisição grande demais"}
+                    fechar = True
+                else:
+                    corpo = await leitor.readexactly(tamanho) if tamanho else b""
+                    if self.autorizacao is not None and not hmac.compare_digest(
+                            cabecalhos.get("authorization", "").encode("utf-8"), self.autorizacao):
+                        status, resultado = HTTPStatus.UNAUTHORIZED, {"erro": "Token do servidor inválido"}
+                    else:
+                        status, resultado = await self.responder(metodo, alvo, corpo)
+                if isinstance(resultado, bytes):
+                    tipo, conteudo = "application/pdf", resultado
+                else:
+                    # default=list: as vendas do snapshot compacto são uma sequência decodificada sob demanda
+                    conteudo = json.dumps(resultado, ensure_ascii=False, default=list).encode("utf-8")
+                    tipo = "application/json"
+                escritor.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                               f"Content-Type: {tipo}\r\nContent-Length: {len(conteudo)}\r\n"
+                               f"Connection: {'close' if fechar else 'keep-alive'}\r\n\r\n".encode("latin-1") + conteudo)
+                await escritor.drain()
+                if fechar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Conexão encerrada ou requisição malformada: só fecha
+        except asyncio.CancelledError:
+            pass  # Servidor encerrando com a conexão ociosa
+        finally:
+            escritor.close()
+
+    async def executar(self, endereco, porta, intervalo_compactacao=INTERVALO_COMPACTACAO):
+        servidor = await asyncio.start_server(self.atender, endereco, porta)
+        print(f"Atendendo em http://{endereco}:{porta} ({len(self.catalogo.produtos)} produtos, "
+              f"{len(self.catalogo.clientes)} clientes)")
+        async with servidor:
+            while True:
+                await asyncio.sleep(intervalo_compactacao)
+                self.salvar()
+
+    def encerrar(self):
+        self.salvar()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def endereco_local(endereco):
+    """Se o endereço de escuta só aceita conexões da própria máquina."""
+    if endereco == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(endereco).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON de orçamento para vários balcões.")
+    parser.add_argument("--endereco", default="127.0.0.1", help="endereço de escuta (padrão: só esta máquina)")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--dados", default="dados.json", help="arquivo de dados do sistema")
+    parser.add_argument("--tickets", default="tickets", help="pasta dos PDFs gerados por POST /tickets")
+    parser.add_argument("--token", default=os.environ.get("MADEIREIRA_TOKEN"),
+                        help="senha compartilhada com os balcões (padrão: variável MADEIREIRA_TOKEN)")
+    args = parser.parse_args()
+    if not args.token and not endereco_local(args.endereco):
+        parser.error("para escutar em outras interfaces, informe --token ou defina MADEIREIRA_TOKEN")
+
+    servidor = ServidorOrcamento(args.dados, args.tickets, args.token)
+    servidor.carregar()
+    try:
+        asyncio.run(servidor.executar(args.endereco, args.porta))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.encerrar()
+
+
+if __name__ == "__main__":
+    main()
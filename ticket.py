@@ -0,0 +1,256 @@
+from collections import namedtuple
+from datetime import datetime
+from uuid import uuid4
+
+from fpdf import FPDF
+
+from precificacao import centavos, formatar, milimetros, valores_venda
+
+# Cópias imutáveis dos dados do orçamento, para renderizar fora da thread da interface
+ClienteTicket = namedtuple("ClienteTicket", "nome endereco cidade cpf_cnpj telefone")
+ItemTicket = namedtuple("ItemTicket", "descricao tamanho quantidade vl_m total lucro", defaults=(0.0,))
+# id identifica as vendas do ticket, para o servidor reconhecer um reenvio
+Ticket = namedtuple("Ticket", "cliente itens vendedor forma_pagamento condicao_pagamento data id")
+
+
+def criar_ticket(cliente, orcamento_produtos, vendedor, forma_pagamento, condicao_pagamento):
+    """Tira um snapshot do cliente e dos itens do orçamento."""
+    return Ticket(
+        cliente=ClienteTicket(cliente["nome"], cliente["endereco"], cliente["cidade"], cliente["cpf_cnpj"], cliente["telefone"]),
+        itens=tuple(ItemTicket(item["descricao"], item["tamanho"], item["quantidade"], item["vl_m"], item["total"],
+                               item.get("lucro", 0.0))
+                    for item in orcamento_produtos),
+        vendedor=vendedor,
+        forma_pagamento=forma_pagamento,
+        condicao_pagamento=condicao_pagamento,
+        data=datetime.now(),
+        id=uuid4().hex,
+    )
+
+
+# Bloco de totais: (estilo da fonte, avanço da linha, células). Cada célula é
+# (largura, texto); textos com {campo} variam por ticket, os demais são fixos.
+LINHAS_TOTAIS = (
+    ("", 6, ((17, "Vendedor:"), (29, ""), (30, "{vendedor}"), (130, ""),
+             (30, "Outros:"), (30, "R$ 00.00"), (30, "Total:"), (10, "{total}"))),
+    ("", 6, ((36, "Forma de Pagamento:"), (10, ""), (30, "{forma_pagamento}"), (130, ""),
+             (30, "Seguro:"), (30, "R$ 00.00"), (30, "Acréscimos:"), (10, "R$ 00.00"))),
+    ("", 6, ((36, "Condição de Pagamento:"), (10, ""), (30, "{condicao_pagamento}"), (130, ""),
+             (30, "Frete:"), (30, "R$ 00.00"), (30, "Descontos:"), (10, "R$ 00.00"))),
+    ("", 6, ((43, "Limite de Crédito Utilizado:"), (3, ""), (30, "R$ 00.00"), (190, ""),
+             (30, "Total Líquido:"), (10, "{total}"))),
+    ("B", 5, ((40, "Composição Pgto"), (30, "Parcela"), (50, "Numerário"), (30, "Valor"), (30, "Data Pgto"))),
+    ("", None, ((40, ""), (30, "1"), (50, "Dinheiro"), (30, "{total}"), (30, "{data}"))),
+)
+ALTURA_TOTAIS = sum(avanco or 5 for _, avanco, _ in LINHAS_TOTAIS)
+
+ALTURA_LINHA = 10  # Linha da tabela (7) mais o espaço até a próxima
+LARGURA_TABELA = 310
+
+
+def _novo_pdf():
+    pdf = FPDF(orientation='L', unit='mm', format=(500, 350))  # Landscape orientation
+    pdf.add_page()
+    pdf.set_font("Arial", size=10)
+    return pdf
+
+
+def _desenhar_cabecalho(pdf):
+    pdf.set_font("Arial", style="B", size=12)
+    pdf.cell(0, 5, "TICKET DE VENDA", ln=True, align="C")
+    pdf.set_font("Arial", size=10)
+    pdf.cell(0, 5, "TIGELA MADEIRAS E ARTEFATOS LTDA", ln=True, align="C")
+    pdf.cell(0, 5, "TIGELA MADEIREIRA E ARTEFATOS", ln=True, align="C")
+    pdf.cell(0, 5, "Telefone: (44) 9754-8463 - Celular:", ln=True, align="C")
+    pdf.cell(0, 5, "Endereco: AVENIDA BRASIL, No 1621, DISTRITO CASA BRANCA, XAMBRE - PR", ln=True, align="C")
+    pdf.cell(0, 5, "CNPJ: 39.594.567/0001-79    IE: 9086731905", ln=True, align="C")
+    pdf.ln(5)
+
+
+def _desenhar_cliente(pdf, cliente):
+    pdf.set_font("Arial", style="", size=10)
+    pdf.cell(0, 5, f"Cliente: {cliente.nome}", ln=True)
+    pdf.cell(0, 5, f"Endereco: {cliente.endereco}", ln=True)
+    pdf.cell(0, 5, f"Cidade: {cliente.cidade}", ln=True)
+    pdf.cell(0, 5, f"CPF/CNPJ: {cliente.cpf_cnpj}", ln=True)
+    pdf.cell(0, 5, f"Telefone: {cliente.telefone}", ln=True)
+    pdf.ln(5)
+
+
+def _desenhar_cabecalho_tabela(pdf):
+    pdf.set_fill_color(200, 200, 200)
+    pdf.cell(10, 7, txt="N\u00ba", border=1, align="C", fill=True)
+    pdf.cell(80, 7, txt="Produto", border=1, align="C", fill=True)
+    pdf.cell(30, 7, txt="Un. Com.", border=1, align="C", fill=True)  # Add "Un. Com." column
+    pdf.cell(30, 7, txt="Vlr. Frete", border=1, align="C", fill=True)
+    pdf.cell(30, 7, txt="Vlr. Outros", border=1, align="C", fill=True)
+    pdf.cell(30, 7, txt="Vlr. Seguro", border=1, align="C", fill=True)
+    pdf.cell(20, 7, txt="Qtd", border=1, align="C", fill=True)  # Quantity
+    pdf.cell(20, 7, txt="Vlr. M.", border=1, align="C", fill=True)  # Add "Vlr. M." column
+    pdf.cell(30, 7, txt="Vlr UN.", border=1, align="C", fill=True)  # Unit Price
+    pdf.cell(30, 7, txt="Vlr Total", border=1, align="C", fill=True)  # Total
+    pdf.ln()
+
+
+def _linhas_itens(itens):
+    """Gera (número, item, valor unitário, total) sob demanda, um item por vez."""
+    for index, item in enumerate(itens):
+        valor_unitario, total = valores_venda(centavos(item.vl_m), milimetros(item.tamanho), int(item.quantidade))
+        yield index + 1, item, valor_unitario, total
+
+
+def _desenhar_item(pdf, numero, item, valor_unitario, total):
+    # Preenchendo produtos com o novo formato
+    pdf.cell(10, 7, txt=str(numero), border=1, align="C")
+    pdf.cell(80, 7, txt=f"{item.descricao} - {item.tamanho}M", border=1, align="L")  # Concatenate description and size
+    pdf.cell(30, 7, txt="UNID", border=1, align="C")  # Display "Un. Com."
+    pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
+    pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
+    pdf.cell(30, 7, txt="R$ 00,00", border=1, align="C")
+    pdf.cell(20, 7, txt=str(item.quantidade), border=1, align="C")  # Display quantity
+    pdf.cell(20, 7, txt=f"R$ {item.vl_m:.2f}", border=1, align="C")  # Display value per meter
+    pdf.cell(30, 7, txt=formatar(valor_unitario), border=1, align="C")  # Display calculated unit price
+    pdf.cell(30, 7, txt=formatar(total), border=1, align="C")  # Display total
+    pdf.ln(ALTURA_LINHA)
+
+
+def _desenhar_transporte(pdf, rotulo, subtotal):
+    pdf.cell(LARGURA_TABELA - 30, 7, txt=rotulo, border=1, align="R")
+    pdf.cell(30, 7, txt=formatar(subtotal), border=1, align="C")
+    pdf.ln(ALTURA_LINHA)
+
+
+def _quebrar_pagina(pdf, subtotal):
+    """Fecha a página com o subtotal e abre outra repetindo o cabeçalho da tabela."""
+    _desenhar_transporte(pdf, "A transportar:", subtotal)
+    pdf.add_page()
+    _desenhar_cabecalho_tabela(pdf)
+    _desenhar_transporte(pdf, "Transporte:", subtotal)
+
+
+def _desenhar_totais(pdf, valores=None, estaticos=True):
+    """Desenha o bloco de totais; só os textos fixos, só os variáveis (valores) ou ambos."""
+    for estilo, avanco, celulas in LINHAS_TOTAIS:
+        if estaticos:
+            pdf.set_font("Arial", style=estilo, size=10)
+        for largura, texto in celulas:
+            variavel = "{" in texto
+            if variavel and valores is not None:
+                pdf.cell(largura, 5, txt=texto.format(**valores), border=0, align="L")
+            elif not variavel and estaticos:
+                pdf.cell(largura, 5, txt=texto, border=0, align="L")
+            else:
+                pdf.set_x(pdf.get_x() + largura)  # Espaço reservado para a outra passada
+        if avanco is not None:
+            pdf.ln(avanco)
+
+
+class TemplateTicket:
+    """Partes fixas do ticket (cabeçalho, cabeçalho da tabela e rótulos dos totais)
+    desenhadas uma única vez e copiadas para cada PDF.
+
+    Guarda os comandos PDF gerados pelo FPDF para essas partes; o bloco de totais
+    é deslocado até a altura certa com uma translação (operador cm).
+    """
+
+    def __init__(self):
+        pdf = _novo_pdf()
+
+        inicio = len(pdf.pages[pdf.page])
+        _desenhar_cabecalho(pdf)
+        self.y_cliente = pdf.get_y()
+        self.cabecalho = pdf.pages[pdf.page][inicio:]
+
+        _desenhar_cliente(pdf, ClienteTicket("", "", "", "", ""))  # Só para medir a altura
+        self.y_tabela = pdf.get_y()
+        inicio = len(pdf.pages[pdf.page])
+        _desenhar_cabecalho_tabela(pdf)
+        self.y_itens = pdf.get_y()
+        self.cabecalho_tabela = pdf.pages[pdf.page][inicio:]
+
+        self.y_totais = pdf.get_y()
+        inicio = len(pdf.pages[pdf.page])
+        _desenhar_totais(pdf)
+        self.totais = pdf.pages[pdf.page][inicio:]
+
+    @staticmethod
+    def suportado(pdf):
+        # Depende do FPDF guardar o conteúdo da página como texto (PyFPDF 1.7)
+        return isinstance(getattr(pdf, "pages", {}).get(pdf.page), str)
+
+    def aplicar_cabecalho(self, pdf, cliente):
+        # Registra as fontes na mesma ordem do template (F1 normal, F2 negrito)
+        pdf.set_font("Arial", style="B", size=12)
+        pdf.set_font("Arial", size=10)
+        pdf.pages[pdf.page] += self.cabecalho
+        pdf.set_y(self.y_cliente)
+        _desenhar_cliente(pdf, cliente)
+        pdf.pages[pdf.page] += self.cabecalho_tabela
+        pdf.set_fill_color(200, 200, 200)  # Mantém o estado do FPDF igual ao do PDF
+        pdf.set_y(self.y_itens)
+
+    def aplicar_totais(self, pdf, valores):
+        y = pdf.get_y()
+        deslocamento = (self.y_totais - y) * pdf.k
+        pdf.pages[pdf.page] += f"q 1 0 0 1 0 {deslocamento:.2f} cm\n{self.totais}Q\n"
+        pdf.set_xy(pdf.l_margin, y)
+        _desenhar_totais(pdf, valores, estaticos=False)
+
+
+_template = None
+
+
+def template_ticket():
+    """Template compartilhado, criado no primeiro uso."""
+    global _template
+    if _template is None:
+        _template = TemplateTicket()
+    return _template
+
+
+def renderizar_ticket(ticket, nome_pdf, progresso=None, usar_template=True):
+    """Gera o PDF do ticket de venda, com quantas páginas forem necessárias.
+
+    ticket.itens pode ser qualquer iterável (inclusive um gerador). progresso(atual, total)
+    é chamado a cada item; total é 0 quando a quantidade de itens não é conhecida.
+    """
+    pdf = _novo_pdf()
+    template = template_ticket() if usar_template and TemplateTicket.suportado(pdf) else None
+
+    if template is not None:
+        template.aplicar_cabecalho(pdf, ticket.cliente)
+    else:
+        _desenhar_cabecalho(pdf)
+        _desenhar_cliente(pdf, ticket.cliente)
+        _desenhar_cabecalho_tabela(pdf)
+
+    total_final = 0  # Initialize total (centavos)
+    total_itens = len(ticket.itens) if hasattr(ticket.itens, "__len__") else 0
+
+    # Itens consumidos um a um; cada página fecha com o subtotal a transportar
+    for numero, item, valor_unitario, total in _linhas_itens(ticket.itens):
+        if pdf.get_y() + 2 * ALTURA_LINHA > pdf.page_break_trigger:
+            _quebrar_pagina(pdf, total_final)
+        _desenhar_item(pdf, numero, item, valor_unitario, total)
+
+        total_final += total  # Add to final total
+        if progresso is not None:
+            progresso(numero, total_itens)
+
+    # Totais e informações adicionais
+    valores = {
+        "vendedor": ticket.vendedor,
+        "forma_pagamento": ticket.forma_pagamento,
+        "condicao_pagamento": ticket.condicao_pagamento,
+        "total": formatar(total_final),
+        "data": ticket.data.strftime("%d/%m/%Y"),
+    }
+    if pdf.get_y() + ALTURA_TOTAIS > pdf.page_break_trigger:
+        pdf.add_page()  # O bloco de totais não é dividido entre páginas
+    if template is not None:
+        template.aplicar_totais(pdf, valores)
+    else:
+        _desenhar_totais(pdf, valores)
+
+    # Salvar PDF
+    pdf.output(nome_pdf)
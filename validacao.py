@@ -0,0 +1,41 @@
+"""Regras de validação de clientes e produtos, usadas pelo formulário e pela importação."""
+
+CAMPOS_CLIENTE = ("nome", "cpf_cnpj", "endereco", "cidade", "telefone")
+CAMPOS_PRODUTO = ("descricao", "madeira", "largura", "espessura", "custo_m3")
+
+
+def somente_digitos(texto):
+    """Mesmo filtro dos campos de CPF/CNPJ e telefone do formulário."""
+    return ''.join(filter(str.isdigit, texto))
+
+
+def erro_cliente(cliente, tipo_documento=None):
+    """Motivo pelo qual o cliente não pode ser registrado, ou None se estiver válido.
+
+    tipo_documento é "CPF" ou "CNPJ", como escolhido no formulário; sem ele o
+    tipo é deduzido pelo número de dígitos.
+    """
+    if not all(cliente.get(campo) for campo in CAMPOS_CLIENTE):
+        return "Preencha todos os campos para adicionar um cliente!"
+
+    if not all(char.isalpha() or char.isspace() for char in cliente["nome"]):
+        return "O nome não pode conter números ou símbolos!"
+
+    documento = cliente["cpf_cnpj"]
+    if tipo_documento is None:
+        tipo_documento = "CNPJ" if len(documento) == 14 else "CPF"
+    if tipo_documento == "CPF" and (not documento.isdigit() or len(documento) != 11):
+        return "CPF deve conter apenas números e ter 11 dígitos!"
+    if tipo_documento == "CNPJ" and (not documento.isdigit() or len(documento) != 14):
+        return "CNPJ deve conter apenas números e ter 14 dígitos!"
+
+    if not cliente["telefone"].isdigit():
+        return "Telefone deve conter apenas números!"
+    return None
+
+
+def erro_produto(produto):
+    """Motivo pelo qual o produto não pode ser registrado, ou None (largura, espessura e custo já convertidos)."""
+    if not produto.get("descricao") or produto["custo_m3"] <= 0 or produto["largura"] <= 0 or produto["espessura"] <= 0:
+        return "Preencha os campos corretamente!"
+    return None